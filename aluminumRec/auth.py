@@ -0,0 +1,194 @@
+"""
+Stateless access tokens and a per-process cache of the users behind them.
+
+login issues a token signed with SECRET_KEY (django.core.signing) that
+carries the user's id and role and the time it was issued; verifying one is a
+signature check and an age check against ACCESS_TOKEN_TTL, no query. Clients
+send it as `Authorization: Bearer <token>`. A token that is sent but doesn't
+verify (tampered, expired, or its user is gone, unapproved or has another
+role) raises InvalidToken, which the views answer with 401 instead of
+falling back to the email field.
+
+The AluminumUser rows that predictions need are kept in a small TTL cache
+(PRINCIPAL_CACHE_TTL seconds, PRINCIPAL_CACHE_SIZE entries), looked up by id
+for token holders and by email for clients that still send one, so repeat
+requests from the same agent don't query the user table. Misses are cached
+too. Anything that changes who may act as whom (register, approve, reject,
+password reset) clears this process's cache; other processes catch up within
+the TTL, and a token whose user is gone or no longer approved stops
+authenticating at that point.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+
+from .models import AluminumUser
+
+TOKEN_SALT = "aluminumRec.access"
+TOKEN_TTL = getattr(settings, "ACCESS_TOKEN_TTL", 12 * 3600)
+# When set, predictions are only attributed to token holders, never to a bare email.
+TOKEN_REQUIRED = getattr(settings, "ACCESS_TOKEN_REQUIRED", False)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def issue_token(user):
+    return signing.dumps({"id": user.id, "role": user.role}, salt=TOKEN_SALT)
+
+
+def read_token(request):
+    """
+    The (id, role) a request's bearer token was issued for, or None when it
+    sends none; no database access. Raises InvalidToken for a bad or expired one.
+    """
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = signing.loads(token.strip(), salt=TOKEN_SALT, max_age=TOKEN_TTL)
+    except signing.SignatureExpired:
+        raise InvalidToken("Access token expired")
+    except signing.BadSignature:
+        raise InvalidToken("Invalid access token")
+    return payload["id"], payload["role"]
+
+
+class PrincipalCache:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, user = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, user
+                del self._entries[key]
+            self.misses += 1
+        return False, None
+
+    def _store(self, key, user):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def user(self, user_id):
+        """The AluminumUser with this id, or None."""
+        found, user = self._get(("id", user_id))
+        if not found:
+            user = AluminumUser.objects.filter(pk=user_id).first()
+            self._store(("id", user_id), user)
+        return user
+
+    def agent(self, email):
+        """The agent with this email, or None (the lookup predictions used to make per request)."""
+        found, user = self._get(("agent", email))
+        if not found:
+            user = AluminumUser.objects.filter(email=email, role="agent").first()
+            self._store(("agent", email), user)
+        return user
+
+    def agents(self, emails):
+        """{email: agent} for the emails that belong to an agent, fetching all misses in one query."""
+        found, missing = {}, []
+        for email in emails:
+            cached, user = self._get(("agent", email))
+            if not cached:
+                missing.append(email)
+            elif user is not None:
+                found[email] = user
+        if missing:
+            fetched = {u.email: u for u in AluminumUser.objects.filter(email__in=missing, role="agent")}
+            for email in missing:
+                self._store(("agent", email), fetched.get(email))
+            found.update(fetched)
+        return found
+
+    async def auser(self, user_id):
+        found, user = self._get(("id", user_id))
+        if not found:
+            user = await AluminumUser.objects.filter(pk=user_id).afirst()
+            self._store(("id", user_id), user)
+        return user
+
+    async def aagent(self, email):
+        found, user = self._get(("agent", email))
+        if not found:
+            user = await AluminumUser.objects.filter(email=email, role="agent").afirst()
+            self._store(("agent", email), user)
+        return user
+
+    def clear(self, *args):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principals = PrincipalCache(
+    max_entries=getattr(settings, "PRINCIPAL_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "PRINCIPAL_CACHE_TTL", 60),
+)
+
+
+def _check(claims, user):
+    # A token only stands for an approved user who still has the role it was issued with.
+    if user is None or not user.is_approved or user.role != claims[1]:
+        raise InvalidToken("Access token no longer valid")
+    return user
+
+
+def authenticate(request):
+    """The approved AluminumUser a request's bearer token belongs to, or None without one."""
+    claims = read_token(request)
+    return _check(claims, principals.user(claims[0])) if claims else None
+
+
+async def aauthenticate(request):
+    claims = read_token(request)
+    return _check(claims, await principals.auser(claims[0])) if claims else None
+
+
+async def arequest_agent(request, email):
+    """
+    The agent a prediction is recorded for: the token holder when a valid
+    token is sent (None unless they are an agent), otherwise the agent named
+    by `email`, for clients that don't send tokens yet. Raises InvalidToken
+    when a token is sent but doesn't verify.
+    """
+    user = await aauthenticate(request)
+    if user is not None:
+        return user if user.role == "agent" else None
+    if TOKEN_REQUIRED or not email:
+        return None
+    return await principals.aagent(email)
+
+
+def request_agents(request, emails):
+    """arequest_agent() for many runs at once, as {email: agent}."""
+    user = authenticate(request)
+    if user is not None:
+        return {email: user if user.role == "agent" else None for email in emails}
+    if TOKEN_REQUIRED:
+        return {}
+    return principals.agents({email for email in emails if email})
@@ -0,0 +1,132 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+
+from django.conf import settings
+
+from .predictor import predict_yield, predict_yield_batch, row as prediction_row
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one batched model call.
+
+    Callers block in submit() while a background thread collects rows for up
+    to `window_ms` (or until `max_rows` are queued), runs them through
+    `predict_batch` as one matrix and hands each caller its own row back.
+    """
+
+    def __init__(self, predict_batch, window_ms=2.0, max_rows=64):
+        self.predict_batch = predict_batch
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+        self._batch_sizes = {}
+        self._batches = 0
+        self._rows = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def enqueue(self, row):
+        """Queue `row` and return the Future its result is set on (for callers that can't block)."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, time.perf_counter(), future))
+        return future
+
+    def submit(self, row):
+        return self.enqueue(row).result()
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so each worker process starts its own.
+        if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid() or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="prediction-microbatcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            try:
+                result = self.predict_batch([row for row, _, _ in batch])
+            except Exception as e:
+                result = {"error": str(e)}
+
+            self._record(batch, dispatched)
+
+            for i, (_, _, future) in enumerate(batch):
+                if "error" in result:
+                    future.set_result({"error": result["error"]})
+                else:
+                    future.set_result(prediction_row(result, i))
+
+    def _record(self, batch, dispatched):
+        waits = [dispatched - queued_at for _, queued_at, _ in batch]
+        with self._lock:
+            size = len(batch)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._batches += 1
+            self._rows += size
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": self._rows / self._batches if self._batches else 0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "mean_wait_ms": 1000 * self._wait_total / self._rows if self._rows else 0,
+                "max_wait_ms": 1000 * self._wait_max,
+            }
+
+
+# Served predictions always carry their per-tree spread; it is stored with the record.
+batcher = MicroBatcher(
+    partial(predict_yield_batch, uncertainty=True),
+    window_ms=getattr(settings, "PREDICTION_BATCH_WINDOW_MS", 2.0),
+    max_rows=getattr(settings, "PREDICTION_BATCH_MAX_ROWS", 64),
+)
+
+
+def enabled():
+    return getattr(settings, "PREDICTION_MICROBATCH", False)
+
+
+def predict(bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time):
+    """
+    Same contract as predictor.predict_yield(..., uncertainty=True), routed
+    through the micro-batcher when PREDICTION_MICROBATCH is enabled.
+    """
+    run = (bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time)
+    if not enabled():
+        return predict_yield(*run, uncertainty=True)
+    return batcher.submit(run)
@@ -0,0 +1,282 @@
+"""
+By-product change feed behind the byproducts/events/ SSE endpoint.
+
+save_predictions() and update_byproduct publish an event once their
+transaction commits: "byproduct.created" for every new ByProduct and
+"byproduct.status" when one changes status. Each event carries the row as
+byproducts/last/ returns it and an increasing id. Connected dashboards are
+pushed events as they happen instead of polling, so the number of open
+dashboards no longer adds queries.
+
+Where events live is EVENT_BACKEND:
+
+    "memory"  a ring buffer of the last EVENT_BUFFER events in this process.
+              Enough for a single server process; ids start from the
+              current time in microseconds so they keep increasing across
+              restarts.
+    "sqlite"  a small SQLite file (EVENT_SQLITE_PATH) shared by every worker
+              on the host. Publishers append to it; each process runs one
+              thread that tails it every EVENT_POLL_INTERVAL seconds while
+              anyone is subscribed and fans new events out to its
+              subscribers. Ids are the table's, so they are the same in every
+              worker.
+
+A reconnecting client sends the last id it saw (Last-Event-ID) and gets
+everything after it from the buffer. If that is older than the buffer reaches
+back, it is told to "resync" (refetch the lists) instead. A subscriber that
+stops reading is dropped once EVENT_QUEUE_SIZE events are waiting for it;
+its stream ends and the browser reconnects with its Last-Event-ID.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .serializers import BYPRODUCT_COLUMNS, byproduct_row
+
+# A save that creates more by-products than this (a historical import)
+# publishes one "byproduct.bulk" event instead of one event per row.
+MAX_EVENTS_PER_SAVE = getattr(settings, "EVENT_MAX_PER_SAVE", 500)
+
+
+class Event(NamedTuple):
+    id: int
+    kind: str
+    data: dict
+
+
+class MemoryBackend:
+    tails = False
+
+    def __init__(self, size=1000):
+        self._events = deque(maxlen=size)
+        self._next_id = time.time_ns() // 1000
+        self._lock = threading.Lock()
+
+    def append(self, items):
+        with self._lock:
+            events = []
+            for kind, data in items:
+                events.append(Event(self._next_id, kind, data))
+                self._next_id += 1
+            self._events.extend(events)
+        return events
+
+    def since(self, last_id, limit=None):
+        """(events after last_id, whether nothing between last_id and them was dropped)."""
+        with self._lock:
+            events = [e for e in self._events if e.id > last_id]
+            complete = not self._events or last_id >= self._events[0].id - 1
+        return events[:limit], complete
+
+    def latest_id(self):
+        with self._lock:
+            return self._events[-1].id if self._events else self._next_id - 1
+
+
+class SQLiteBackend:
+    tails = True
+
+    def __init__(self, path, size=10000):
+        self.path = str(path)
+        self.size = size
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, data TEXT)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def append(self, items):
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM events").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO events (id, kind, data) VALUES (?, ?, ?)",
+                [(first + i, kind, json.dumps(data)) for i, (kind, data) in enumerate(items)],
+            )
+            conn.execute("DELETE FROM events WHERE id <= ?", (first + len(items) - 1 - self.size,))
+        return [Event(first + i, kind, data) for i, (kind, data) in enumerate(items)]
+
+    def since(self, last_id, limit=None):
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT id, kind, data FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit or -1)
+        ).fetchall()
+        oldest = conn.execute("SELECT MIN(id) FROM events").fetchone()[0]
+        complete = oldest is None or last_id >= oldest - 1
+        return [Event(i, kind, json.loads(data)) for i, kind, data in rows], complete
+
+    def latest_id(self):
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+
+class Subscription:
+    """One client's queue of events, filled from whichever thread publishes."""
+
+    def __init__(self, hub, max_queued):
+        self.hub = hub
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.dropped = False
+
+    def deliver(self, events):
+        # Runs on the subscriber's event loop.
+        for event in events:
+            if self.dropped:
+                return
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.drop()
+
+    def drop(self):
+        # Ends the stream; the client reconnects and resumes from its last id.
+        self.dropped = True
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout):
+        """The next event, None once dropped; raises TimeoutError after `timeout` seconds without one."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    def __init__(self, backend, max_queued=1000, poll_interval=0.25):
+        self.backend = backend
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._tailer = None
+
+    # ------------------------------
+    # publishing
+    # ------------------------------
+    def publish(self, items):
+        """Store [(kind, data), ...] and push them to this process's subscribers."""
+        if not items:
+            return []
+        events = self.backend.append(items)
+        if not self.backend.tails:
+            self._fan_out(events)
+        return events
+
+    def publish_on_commit(self, items):
+        # robust: a feed failure must not fail a request whose data is already committed.
+        transaction.on_commit(lambda: self.publish(items), robust=True)
+
+    def _fan_out(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, events)
+            except RuntimeError:  # its loop has closed
+                self.unsubscribe(sub)
+
+    # ------------------------------
+    # subscribing
+    # ------------------------------
+    def subscribe(self):
+        """A Subscription for the calling event loop; call close() when done."""
+        sub = Subscription(self, self.max_queued)
+        with self._lock:
+            self._subscribers.add(sub)
+            if self.backend.tails and (self._tailer is None or not self._tailer.is_alive()):
+                self._tailer = threading.Thread(target=self._tail, name="event-tail", daemon=True)
+                self._tailer.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def since(self, last_id, limit=None):
+        return self.backend.since(last_id, limit)
+
+    def _tail(self):
+        # One reader per process, and only while someone is listening.
+        last_id = self.backend.latest_id()
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._tailer = None
+                    return
+            events, complete = self.backend.since(last_id, limit=self.max_queued)
+            if not complete:
+                # Pruned before this process read them: everyone resumes
+                # (or is told to resync) from their own last id.
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for sub in subscribers:
+                    try:
+                        sub.loop.call_soon_threadsafe(sub.drop)
+                    except RuntimeError:  # its loop has closed
+                        self.unsubscribe(sub)
+            if events:
+                last_id = events[-1].id
+                self._fan_out(events)
+
+    def stats(self):
+        with self._lock:
+            return {"subscribers": len(self._subscribers), "backend": type(self.backend).__name__}
+
+
+def _backend():
+    if getattr(settings, "EVENT_BACKEND", "memory") == "sqlite":
+        return SQLiteBackend(
+            getattr(settings, "EVENT_SQLITE_PATH", os.path.join(settings.BASE_DIR, "events.sqlite3")),
+            size=getattr(settings, "EVENT_BUFFER", 10000),
+        )
+    return MemoryBackend(size=getattr(settings, "EVENT_BUFFER", 10000))
+
+
+hub = Hub(
+    _backend(),
+    max_queued=getattr(settings, "EVENT_QUEUE_SIZE", 1000),
+    poll_interval=getattr(settings, "EVENT_POLL_INTERVAL", 0.25),
+)
+
+
+# ==============================
+# BY-PRODUCT EVENTS
+# ==============================
+def byproduct_data(item):
+    """A saved ByProduct as byproduct_row() renders it."""
+    return byproduct_row({column: getattr(item, column) for column in BYPRODUCT_COLUMNS})
+
+
+def byproducts_created(items):
+    """Publish creation events for `items` when the current transaction commits."""
+    if len(items) > MAX_EVENTS_PER_SAVE:
+        hub.publish_on_commit([("byproduct.bulk", {"created": len(items)})])
+    else:
+        hub.publish_on_commit([("byproduct.created", byproduct_data(item)) for item in items])
+
+
+def byproduct_status_changed(item, old_status):
+    data = byproduct_data(item)
+    data["old_status"] = old_status
+    hub.publish_on_commit([("byproduct.status", data)])
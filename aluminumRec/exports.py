@@ -0,0 +1,148 @@
+"""
+Bulk export of prediction history (ProductionRecord + agent + ByProduct).
+
+Rows are read in fixed-size keyset chunks on the record id, so memory stays
+bounded by the chunk size on every backend (mysqlclient buffers whole result
+sets, so .iterator() alone would not be enough there). Each chunk becomes one
+CSV block, one Parquet row group or one Arrow record batch, and the writers
+hand back bytes as soon as a chunk is encoded, so HTTP responses stream.
+
+Parquet and Arrow output need pyarrow; CSV has no extra dependency.
+"""
+import csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for parquet / arrow
+    pa = None
+
+from .models import ProductionRecord
+
+EXPORT_CHUNK_SIZE = 10000
+
+# (output column, ORM lookup, arrow type name)
+EXPORT_COLUMNS = (
+    ("id", "id", "int64"),
+    ("created_at", "created_at", "timestamp"),
+    ("agent_email", "agent__email", "string"),
+    ("agent_name", "agent__name", "string"),
+    ("bauxite_mass", "bauxite_mass", "float64"),
+    ("caustic_soda_conc", "caustic_soda_conc", "float64"),
+    ("temperature", "temperature", "float64"),
+    ("pressure", "pressure", "float64"),
+    ("purity", "ore_quality", "float64"),
+    ("reaction_time", "reaction_time", "float64"),
+    ("predicted_aluminum", "predicted_aluminum", "float64"),
+    ("predicted_byproduct", "predicted_byproduct", "float64"),
+    ("predicted_aluminum_std", "predicted_aluminum_std", "float64"),
+    ("predicted_aluminum_low", "predicted_aluminum_low", "float64"),
+    ("predicted_aluminum_high", "predicted_aluminum_high", "float64"),
+    ("model_version", "model_version", "string"),
+    ("byproduct_id", "byproduct__id", "int64"),
+    ("byproduct_name", "byproduct__name", "string"),
+    ("byproduct_quantity_kg", "byproduct__quantity_kg", "float64"),
+    ("byproduct_status", "byproduct__status", "string"),
+)
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+
+def export_chunks(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of row tuples (EXPORT_COLUMNS order), ordered by record id."""
+    qs = (queryset if queryset is not None else ProductionRecord.objects.all())
+    qs = qs.order_by("id", "byproduct__id").values_list(*(lookup for _, lookup, _ in EXPORT_COLUMNS))
+
+    last_id = 0
+    while True:
+        rows = list(qs.filter(id__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        full = len(rows) == chunk_size
+        if full:
+            # A record with several by-products may straddle the chunk edge;
+            # leave its rows for the next chunk so none are skipped.
+            tail_id = rows[-1][0]
+            rows = [r for r in rows if r[0] != tail_id] or rows
+        last_id = rows[-1][0]
+        yield rows
+        if not full:
+            return
+
+
+class _Sink:
+    """Write-only file object whose contents are drained after every chunk."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class _Echo:
+    """csv.writer target that returns each formatted line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(chunks):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _, _ in EXPORT_COLUMNS])
+    for rows in chunks:
+        yield "".join(
+            writer.writerow([r.isoformat() if hasattr(r, "isoformat") else r for r in row]) for row in rows
+        )
+
+
+def _arrow_schema():
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, _, kind in EXPORT_COLUMNS])
+
+
+def _arrow_batch(schema, rows):
+    columns = list(zip(*rows))
+    return pa.record_batch([pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema)
+
+
+def iter_arrow(chunks, fmt):
+    """Yield encoded bytes for `fmt` ("parquet" or "arrow"), one row group / batch per chunk."""
+    if pa is None:
+        raise RuntimeError(f"{fmt} export requires pyarrow")
+
+    schema = _arrow_schema()
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_file(sink, schema)
+
+    for rows in chunks:
+        writer.write_batch(_arrow_batch(schema, rows))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def iter_export(fmt, queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    chunks = export_chunks(queryset, chunk_size)
+    if fmt == "csv":
+        return iter_csv(chunks)
+    return iter_arrow(chunks, fmt)
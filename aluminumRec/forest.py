@@ -0,0 +1,201 @@
+"""
+Flat-array evaluation of a fitted RandomForestRegressor.
+
+export_forest() copies every tree of the ensemble into one set of contiguous
+node arrays; CompiledForest walks all trees over a whole batch at once and
+reproduces RandomForestRegressor.predict bit for bit (same float32 input
+cast, same threshold comparison, same tree-by-tree accumulation order).
+"""
+import joblib
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # optional, the NumPy path is used without it
+    numba = None
+
+
+def export_forest(model):
+    """Flatten a fitted single-output forest into a dict of NumPy arrays."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+        own = np.arange(offset, offset + n, dtype=np.int64)
+
+        # Leaves point at themselves so extra traversal steps are no-ops.
+        lefts.append(np.where(is_leaf, own, left + offset))
+        rights.append(np.where(is_leaf, own, right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        thresholds.append(tree.threshold.astype(np.float64))
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        roots.append(offset)
+
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "max_depth": np.int64(max_depth),
+        "n_features": np.int64(model.n_features_in_),
+    }
+
+
+def save_forest(model, path):
+    joblib.dump(export_forest(model), path)
+
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True)
+    def _tree_leaves_numba(X, feature, threshold, left, right, value, roots):
+        out = np.empty((roots.shape[0], X.shape[0]), dtype=np.float64)
+        for t in range(roots.shape[0]):
+            for i in range(X.shape[0]):
+                node = roots[t]
+                while left[node] != node:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                out[t, i] = value[node]
+        return out
+
+    @numba.njit(cache=True, nogil=True)
+    def _spread_numba(per_tree, positions):
+        n_trees, n = per_tree.shape
+        std = np.empty(n, dtype=np.float64)
+        quantiles = np.empty((positions.shape[0], n), dtype=np.float64)
+        column = np.empty(n_trees, dtype=np.float64)
+        for i in range(n):
+            column[:] = per_tree[:, i]
+            mean = column.mean()
+            std[i] = np.sqrt(((column - mean) ** 2).mean())
+            column.sort()
+            for k in range(positions.shape[0]):
+                lo = int(np.floor(positions[k]))
+                hi = min(lo + 1, n_trees - 1)
+                quantiles[k, i] = column[lo] + (column[hi] - column[lo]) * (positions[k] - lo)
+        return std, quantiles
+else:
+    _tree_leaves_numba = None
+    _spread_numba = None
+
+
+class CompiledForest:
+    """Vectorized predictor over the arrays produced by export_forest()."""
+
+    def __init__(self, arrays, use_numba=True):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+        self.n_features = int(arrays["n_features"])
+        self.n_trees = len(self.roots)
+        # Feature schema the trees were trained on (schema.describe()), if stored
+        self.schema = arrays.get("schema")
+        self.use_numba = use_numba and _tree_leaves_numba is not None
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        return cls(export_forest(model), **kwargs)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None, **kwargs):
+        return cls(joblib.load(path, mmap_mode=mmap_mode), **kwargs)
+
+    def arrays(self):
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "max_depth": np.int64(self.max_depth),
+            "n_features": np.int64(self.n_features),
+        }
+        if self.schema is not None:
+            arrays["schema"] = self.schema
+        return arrays
+
+    def _check_input(self, X, check=True):
+        # The trees were fitted on float32 inputs; sklearn casts the same way.
+        X = np.asarray(X, dtype=np.float32)
+        if not check:
+            return X
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity.")
+        return X
+
+    def tree_predictions(self, X, check=True):
+        """
+        Leaf value of every tree for every row, shape (n_trees, n_samples).
+        check=False skips the shape and finiteness checks for rows that were
+        already validated against the feature schema.
+        """
+        X = self._check_input(X, check)
+
+        if self.use_numba:
+            return _tree_leaves_numba(
+                X, self.feature, self.threshold, self.left, self.right, self.value, self.roots
+            )
+
+        rows = np.arange(X.shape[0])
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def _mean(self, per_tree):
+        # cumsum adds tree by tree in order, matching sklearn's accumulation
+        # exactly (np.sum would use pairwise summation and drift in the last bit).
+        y_hat = np.cumsum(per_tree, axis=0)[-1]
+        y_hat /= self.n_trees
+        return y_hat
+
+    def predict(self, X, check=True):
+        return self._mean(self.tree_predictions(X, check))
+
+    def predict_spread(self, X, quantiles=(0.05, 0.95), check=True):
+        """
+        (mean, std, quantiles) of the per-tree predictions from one evaluation
+        of all trees; mean is identical to predict() and quantiles has shape
+        (len(quantiles), n_samples).
+        """
+        per_tree = self.tree_predictions(X, check)
+        if self.use_numba:
+            positions = np.asarray(quantiles, dtype=np.float64) * (per_tree.shape[0] - 1)
+            std, q = _spread_numba(per_tree, positions)
+            return self._mean(per_tree), std, q
+        return self._mean(per_tree), per_tree.std(axis=0), tree_quantiles(per_tree, quantiles)
+
+
+def tree_quantiles(per_tree, quantiles):
+    """
+    np.quantile(per_tree, quantiles, axis=0) (linear interpolation) from a
+    single np.partition on just the order statistics needed, which is several
+    times cheaper for the small batches the API serves.
+    """
+    positions = np.asarray(quantiles, dtype=np.float64) * (per_tree.shape[0] - 1)
+    lo = np.floor(positions).astype(np.int64)
+    hi = np.minimum(lo + 1, per_tree.shape[0] - 1)
+    part = np.partition(per_tree, np.unique(np.concatenate([lo, hi])), axis=0)
+    frac = (positions - lo)[:, None]
+    return part[lo] + (part[hi] - part[lo]) * frac
@@ -0,0 +1,103 @@
+"""
+Password hashing off the request thread, with a bound on how much of it can
+be waiting.
+
+PBKDF2 and scrypt spend their time inside OpenSSL with the GIL released, so a
+small thread pool (PASSWORD_HASH_WORKERS) keeps every core busy while the
+request threads just wait on a future. At most PASSWORD_HASH_MAX_PENDING
+hashes may be running or queued at once; beyond that submit() raises
+Overloaded immediately, which the login and register views turn into a 429
+with Retry-After instead of letting a shift-change burst pile up behind the
+pool and time out.
+
+check_password() also reports when a correct password is stored with an old
+hasher or cost (anything but the first entry of PASSWORD_HASHERS with its
+current parameters) and returns the replacement hash, computed in the pool as
+well, so login can save it.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+# Seconds a client is told to wait after a 429
+RETRY_AFTER = getattr(settings, "PASSWORD_HASH_RETRY_AFTER", 1)
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """Django's scrypt hasher with its cost taken from PASSWORD_SCRYPT_* settings."""
+
+    work_factor = getattr(settings, "PASSWORD_SCRYPT_WORK_FACTOR", 2**14)
+    block_size = getattr(settings, "PASSWORD_SCRYPT_BLOCK_SIZE", 8)
+    parallelism = getattr(settings, "PASSWORD_SCRYPT_PARALLELISM", 1)
+
+
+class HashPool:
+    def __init__(self, workers=4, max_pending=32):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in the pool and wait for it; Overloaded when too much is already waiting."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise Overloaded(f"{self._pending} password hashes already in progress")
+            self._pending += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    def make_password(self, password):
+        return self.submit(hashers.make_password, password)
+
+    def check_password(self, password, encoded):
+        """
+        Return (is_correct, new_encoded). new_encoded is the password hashed
+        with the preferred hasher when it is correct but stored with another
+        hasher or cost, else None.
+        """
+        is_correct, new_encoded = self.submit(_verify, password, encoded)
+        if new_encoded is not None:
+            with self._lock:
+                self._rehashed += 1
+        return is_correct, new_encoded
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "rehashed": self._rehashed,
+            }
+
+
+def _verify(password, encoded):
+    is_correct, must_update = hashers.verify_password(password, encoded)
+    return is_correct, hashers.make_password(password) if is_correct and must_update else None
+
+
+pool = HashPool(
+    workers=getattr(settings, "PASSWORD_HASH_WORKERS", 4),
+    max_pending=getattr(settings, "PASSWORD_HASH_MAX_PENDING", 32),
+)
+
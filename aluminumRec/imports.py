@@ -0,0 +1,208 @@
+"""
+Bulk import of historical plant runs from CSV.
+
+The file is read with pandas in chunks of IMPORT_CHUNK_SIZE rows. Each chunk
+is validated column-wise, predicted as one matrix and written with
+bulk_create inside a single transaction that also advances the file's
+ImportCheckpoint, so a crash loses at most the chunk in flight and
+re-running the import (same file contents) continues after the last
+committed chunk. The checkpoint is re-read under select_for_update() before
+each chunk is written, so two workers resuming the same file never import a
+row twice.
+
+Required columns: bauxite_mass, caustic_soda_conc, temperature, pressure,
+purity (or ore_quality), reaction_time, email (an existing agent).
+Optional: created_at.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import schema
+from .models import AluminumUser, ImportCheckpoint
+from .predictor import FEATURES, predict_yield_batch, row as prediction_row
+from .production import build_record, save_predictions
+
+IMPORT_CHUNK_SIZE = 5000
+INSERT_BATCH_SIZE = 1000
+MAX_STORED_ERRORS = 100
+IMPORT_REMARKS = "Imported historical run"
+
+IMPORT_DIR = getattr(settings, "IMPORT_DIR", os.path.join(settings.BASE_DIR, "imports"))
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import")
+
+
+class ImportFailed(Exception):
+    pass
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _columns(header):
+    """Map file columns onto FEATURES (schema aliases such as ore_quality are accepted)."""
+    renames = {}
+    for column, name in schema.ALIASES.items():
+        if column in header and name not in header and name not in renames.values():
+            renames[column] = name
+    missing = [name for name in (*FEATURES, "email") if name not in header and name not in renames.values()]
+    if missing:
+        raise ImportFailed(f"Missing columns: {', '.join(missing)}")
+    return renames
+
+
+def _validate(chunk, first_line):
+    """
+    Vectorized checks over one chunk. Returns (line numbers, features matrix,
+    emails, created_at) for the valid rows, plus the errors for the others.
+    """
+    numeric = chunk[list(FEATURES)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    schema.normalize(numeric)
+    out_of_range = schema.invalid(numeric)
+    bad = out_of_range.any(axis=1)
+
+    created_at = None
+    if "created_at" in chunk:
+        raw = chunk["created_at"].str.strip()
+        created_at = pd.to_datetime(raw, errors="coerce", utc=True, format="mixed")
+        bad_dates = ((raw != "") & created_at.isna()).to_numpy()
+        bad |= bad_dates
+    else:
+        bad_dates = np.zeros(len(chunk), dtype=bool)
+
+    errors = []
+    for i in np.flatnonzero(bad):
+        columns = [FEATURES[j] for j in np.flatnonzero(out_of_range[i])]
+        if bad_dates[i]:
+            columns.append("created_at")
+        errors.append({"line": first_line + int(i), "error": f"Invalid {', '.join(columns)}"})
+
+    valid = ~bad
+    emails = chunk["email"].str.strip().to_numpy()[valid]
+    if created_at is not None:
+        created_at = [None if pd.isna(t) else t.to_pydatetime() for t in created_at[valid]]
+    lines = first_line + np.flatnonzero(valid)
+    return lines, numeric[valid], emails, created_at, errors
+
+
+def import_runs(path, chunk_size=IMPORT_CHUNK_SIZE, byproduct_status="used", progress=None, source=None):
+    """
+    Import (or resume importing) one CSV file; returns its ImportCheckpoint.
+    `progress(checkpoint)` is called after every committed chunk.
+    """
+    source = source or file_fingerprint(path)
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+        source=source, defaults={"filename": os.path.basename(path)}
+    )
+    if checkpoint.finished:
+        return checkpoint
+
+    renames = _columns(pd.read_csv(path, nrows=0).columns)
+    offset = checkpoint.rows_done
+    reader = pd.read_csv(
+        path,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        skiprows=range(1, checkpoint.rows_done + 1),
+    )
+
+    for chunk in reader:
+        chunk = chunk.rename(columns=renames)
+        # Line 1 is the header, so data row n sits on line n + 1.
+        lines, features, emails, created_at, errors = _validate(chunk, offset + 2)
+
+        agents = {u.email: u for u in AluminumUser.objects.filter(email__in=set(emails), role="agent")}
+        known = np.array([email in agents for email in emails], dtype=bool)
+        if not known.all():
+            errors += [{"line": int(lines[i]), "error": f"Unknown agent {emails[i]!r}"} for i in np.flatnonzero(~known)]
+            errors.sort(key=lambda e: e["line"])
+            lines, features, emails = lines[known], features[known], emails[known]
+            if created_at is not None:
+                created_at = [t for t, ok in zip(created_at, known) if ok]
+
+        records = []
+        if len(features):
+            prediction = predict_yield_batch(features, uncertainty=True)
+            if "error" in prediction:
+                raise ImportFailed(prediction["error"])
+
+            records = [
+                build_record(agents[email], run, prediction_row(prediction, i))
+                for i, (run, email) in enumerate(zip(features.tolist(), emails))
+            ]
+
+        with transaction.atomic():
+            # Another import of the same file may have committed some or all of
+            # this chunk since it was read: only rows past its rows_done are new.
+            checkpoint = ImportCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+            first_new = checkpoint.rows_done + 2
+            if first_new > offset + 2:
+                new = lines >= first_new
+                records = [r for r, ok in zip(records, new) if ok]
+                if created_at is not None:
+                    created_at = [t for t, ok in zip(created_at, new) if ok]
+                errors = [e for e in errors if e["line"] >= first_new]
+
+            offset += len(chunk)
+            if offset > checkpoint.rows_done:
+                if records:
+                    save_predictions(
+                        records, created_at=created_at, batch_size=INSERT_BATCH_SIZE,
+                        status=byproduct_status, remarks=IMPORT_REMARKS,
+                    )
+                checkpoint.rows_done = offset
+                checkpoint.rows_imported += len(records)
+                checkpoint.rows_rejected += len(errors)
+                checkpoint.errors = (checkpoint.errors + errors)[:MAX_STORED_ERRORS]
+                checkpoint.save()
+
+        if progress:
+            progress(checkpoint)
+
+    checkpoint.finished = True
+    checkpoint.save(update_fields=["finished", "updated_at"])
+    return checkpoint
+
+
+def store_upload(uploaded):
+    """Save an uploaded file under IMPORT_DIR, named by its SHA-256; returns (path, digest)."""
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=IMPORT_DIR, suffix=".tmp", delete=False) as tmp:
+        for block in uploaded.chunks():
+            digest.update(block)
+            tmp.write(block)
+    source = digest.hexdigest()
+    path = os.path.join(IMPORT_DIR, f"{source}.csv")
+    shutil.move(tmp.name, path)
+    return path, source
+
+
+def import_in_background(path, source, **options):
+    """Run import_runs() on the import worker thread; a failure is kept on the checkpoint."""
+    def run():
+        try:
+            return import_runs(path, source=source, **options)
+        except Exception as e:
+            checkpoint = ImportCheckpoint.objects.get(source=source)
+            checkpoint.errors = checkpoint.errors[:MAX_STORED_ERRORS - 1] + [{"line": None, "error": str(e)}]
+            checkpoint.save(update_fields=["errors", "updated_at"])
+            raise
+        finally:
+            connection.close()
+
+    return _executor.submit(run)
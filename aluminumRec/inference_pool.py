@@ -0,0 +1,187 @@
+"""
+Optional process-pool backend for forest inference.
+
+With PREDICTION_PROCESS_WORKERS > 0, predictor.predict_yield_batch sends the
+feature matrix to a pool of worker processes instead of running the forest
+in the calling thread, so a threaded server is no longer serialized on the
+GIL. Each worker loads the model once through its own registry (the forest
+arrays are memory-mapped, so all workers share one page-cache copy) and keeps
+re-checking for new versions the same way the web process does.
+
+Rows never travel through pickles: the parent owns a fixed set of
+shared-memory slots, each holding an input matrix of PREDICTION_PROCESS_SLOT_ROWS
+rows and the matching outputs (mean, std, interval low, interval high). A call copies its rows into a slot, the
+worker predicts in place and only the slot name, the row count and the model
+version cross the process boundary. A large batch is spread over as many
+free slots (and therefore workers) as it can get.
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from .registry import MODEL_MISSING, registry
+from .schema import NAMES
+
+N_FEATURES = len(NAMES)
+N_OUTPUTS = 4
+
+
+class _Slot:
+    """One shared-memory block: inputs (rows x N_FEATURES) followed by outputs (rows x N_OUTPUTS)."""
+
+    def __init__(self, rows, name=None):
+        size = rows * (N_FEATURES + N_OUTPUTS) * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        self.rows = rows
+        self.inputs = np.ndarray((rows, N_FEATURES), dtype=np.float64, buffer=self.shm.buf)
+        self.outputs = np.ndarray(
+            (rows, N_OUTPUTS), dtype=np.float64, buffer=self.shm.buf, offset=rows * N_FEATURES * 8
+        )
+
+    def close(self, unlink=False):
+        self.inputs = self.outputs = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+# ==============================
+# WORKER SIDE
+# ==============================
+_attached = {}
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+    # Load (and JIT-compile) the model before the first real request arrives.
+    loaded = registry.get()
+    if loaded is not None:
+        loaded.predict(np.zeros((1, N_FEATURES)))
+
+
+def _predict_slot(name, rows, n, quantiles=None):
+    slot = _attached.get(name)
+    if slot is None:
+        slot = _attached[name] = _Slot(rows, name=name)
+
+    loaded = registry.get()
+    if loaded is None:
+        raise RuntimeError(MODEL_MISSING)
+    if quantiles:
+        mean, std, q = loaded.predict_spread(slot.inputs[:n], quantiles)
+        slot.outputs[:n] = np.column_stack([mean, std, q[0], q[-1]])
+    else:
+        slot.outputs[:n, 0] = loaded.predict(slot.inputs[:n])
+    return loaded.version
+
+
+# ==============================
+# PARENT SIDE
+# ==============================
+class InferencePool:
+    def __init__(self, workers=0, slot_rows=4096, start_method="forkserver"):
+        self.workers = workers
+        self.slot_rows = slot_rows
+        self.start_method = start_method
+
+        self._executor = None
+        self._slots = None
+        self._all_slots = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _ensure_started(self):
+        # Pools and slots belong to the process that created them; a forked
+        # server worker builds its own.
+        if self._executor is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "backend.settings"),),
+            )
+            # Two slots per worker keeps every worker busy while results are copied out.
+            self._all_slots = [_Slot(self.slot_rows) for _ in range(2 * self.workers)]
+            self._slots = queue.SimpleQueue()
+            for slot in self._all_slots:
+                self._slots.put(slot)
+            self._pid = os.getpid()
+
+    def predict(self, X, quantiles=None):
+        """
+        Return (predictions, model_version) for an (n, N_FEATURES) matrix. With
+        (low, high) quantiles, predictions is (n, N_OUTPUTS): mean, std, low, high.
+        """
+        self._ensure_started()
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        starts = list(range(0, len(X), self.slot_rows))
+
+        # Block for one slot only, then take whatever else is free: a caller
+        # never waits while holding slots, so concurrent calls cannot deadlock.
+        held = [self._slots.get()]
+        while len(held) < len(starts):
+            try:
+                held.append(self._slots.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            for _ in range(2):
+                out, versions = self._run(X, starts, held, quantiles)
+                if len(versions) <= 1:
+                    return out if quantiles else out[:, 0], versions.pop() if versions else None
+            # The model was swapped twice while this batch was in flight.
+            raise RuntimeError("Model version changed during prediction, retry")
+        finally:
+            for slot in held:
+                self._slots.put(slot)
+
+    def _run(self, X, starts, held, quantiles):
+        out = np.empty((len(X), N_OUTPUTS), dtype=np.float64)
+        versions = set()
+        for wave in range(0, len(starts), len(held)):
+            jobs = []
+            for slot, start in zip(held, starts[wave:wave + len(held)]):
+                n = min(self.slot_rows, len(X) - start)
+                slot.inputs[:n] = X[start:start + n]
+                jobs.append((slot, start, n, self._executor.submit(_predict_slot, slot.name, slot.rows, n, quantiles)))
+            for slot, start, n, future in jobs:
+                versions.add(future.result())
+                out[start:start + n] = slot.outputs[:n]
+        return out, versions
+
+    def shutdown(self):
+        if self._executor is None or self._pid != os.getpid():
+            return
+        self._executor.shutdown(wait=True)
+        for slot in self._all_slots:
+            slot.close(unlink=True)
+        self._executor = None
+        self._all_slots = []
+
+
+pool = InferencePool(
+    workers=getattr(settings, "PREDICTION_PROCESS_WORKERS", 0),
+    slot_rows=getattr(settings, "PREDICTION_PROCESS_SLOT_ROWS", 4096),
+    start_method=getattr(settings, "PREDICTION_PROCESS_START_METHOD", "forkserver"),
+)
+atexit.register(pool.shutdown)
@@ -0,0 +1,325 @@
+"""
+Precomputed response surface for fast approximate predictions.
+
+With PREDICTION_LOOKUP enabled, every model version gets a lookup table: the
+forest evaluated once over a regular grid of the six inputs
+(PREDICTION_LOOKUP_POINTS per input), stored as a float32 array in
+    artifacts/aluminum_yield_lookup-<version>.npy   (the grid values)
+    artifacts/aluminum_yield_lookup-<version>.json  (bounds, points, error)
+and memory-mapped, so every worker shares one copy. Requests with approx=true
+are then answered by multilinear interpolation between the 64 grid points
+around each row instead of walking every tree.
+
+The grid spans the range between the lowest and highest split threshold of
+each input (PREDICTION_LOOKUP_BOUNDS can narrow or widen it). Inside, the
+interpolation smooths the trees' steps; the build measures the absolute
+error against the exact model at PREDICTION_LOOKUP_CHECK_POINTS random points
+and every approximate prediction reports it. Rows outside the grid on any
+input are predicted by the forest instead, since the error was never
+measured there (beyond the last threshold the trees take the other branch,
+so the value on the grid's face is not the forest's).
+
+Tables are built in a background thread the first time a version is asked
+for (or ahead of time with `manage.py build_lookup_table`); until the table
+is ready, approx requests get exact predictions.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+from . import schema
+from .predictor import BYPRODUCT_RATIO, predict_yield_batch
+from .registry import registry
+
+try:
+    import numba
+except ImportError:  # optional, the NumPy path is used without it
+    numba = None
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = len(schema.NAMES)
+BUILD_CHUNK_ROWS = 65536
+
+# Offsets (0 or 1 along each input) of the 2**6 grid points around a row
+CORNERS = ((np.arange(2 ** N_FEATURES)[:, None] >> np.arange(N_FEATURES)[::-1]) & 1).astype(np.int64)
+
+
+def table_path_for(version, directory):
+    return os.path.join(directory, f"aluminum_yield_lookup-{version}.npy")
+
+
+def meta_path_for(version, directory):
+    return os.path.join(directory, f"aluminum_yield_lookup-{version}.json")
+
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True)
+    def _interpolate_numba(X, table, lows, steps, sizes, strides, corners):
+        out = np.empty(X.shape[0], dtype=np.float64)
+        base = np.empty(X.shape[1], dtype=np.int64)
+        frac = np.empty(X.shape[1], dtype=np.float64)
+        for i in range(X.shape[0]):
+            for d in range(X.shape[1]):
+                pos = min(max((X[i, d] - lows[d]) / steps[d], 0.0), sizes[d] - 1.0)
+                base[d] = min(int(pos), sizes[d] - 2)
+                frac[d] = pos - base[d]
+            total = 0.0
+            for c in range(corners.shape[0]):
+                weight = 1.0
+                index = 0
+                for d in range(X.shape[1]):
+                    if corners[c, d]:
+                        weight *= frac[d]
+                        index += (base[d] + 1) * strides[d]
+                    else:
+                        weight *= 1.0 - frac[d]
+                        index += base[d] * strides[d]
+                total += weight * table[index]
+            out[i] = total
+        return out
+else:
+    _interpolate_numba = None
+
+
+class LookupTable:
+    """One model version's grid of predictions and the interpolation over it."""
+
+    def __init__(self, version, table, lows, highs, error=None, use_numba=True):
+        self.version = version
+        self.table = table
+        self.lows = np.asarray(lows, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.sizes = np.asarray(table.shape, dtype=np.int64)
+        self.steps = (self.highs - self.lows) / (self.sizes - 1)
+        self.strides = np.asarray(table.strides, dtype=np.int64) // table.itemsize
+        self.flat = table.reshape(-1)
+        self.error = error or {}
+        self.use_numba = use_numba and _interpolate_numba is not None
+
+    @classmethod
+    def build(cls, loaded, points=8, bounds=None, check_points=4096, seed=0):
+        """Evaluate `loaded` over the grid and measure the interpolation error."""
+        lows, highs = grid_bounds(loaded, bounds)
+        sizes = _grid_points(points)
+        axes = [np.linspace(lo, hi, n) for lo, hi, n in zip(lows, highs, sizes)]
+
+        total = int(np.prod(sizes))
+        values = np.empty(total, dtype=np.float32)
+        for start in range(0, total, BUILD_CHUNK_ROWS):
+            stop = min(start + BUILD_CHUNK_ROWS, total)
+            coords = np.unravel_index(np.arange(start, stop), sizes)
+            X = np.column_stack([axis[c] for axis, c in zip(axes, coords)])
+            values[start:stop] = loaded.predict(X)
+
+        lookup = cls(loaded.version, values.reshape(sizes), lows, highs)
+        rng = np.random.default_rng(seed)
+        X = lows + rng.random((check_points, N_FEATURES)) * (highs - lows)
+        errors = np.abs(lookup.predict(X) - loaded.predict(X))
+        lookup.error = {
+            "max": float(errors.max()),
+            "p99": float(np.quantile(errors, 0.99)),
+            "mean": float(errors.mean()),
+            "points": check_points,
+        }
+        return lookup
+
+    def save(self, directory):
+        """Write the table and its metadata, each via a temporary file and a rename."""
+        table_path = table_path_for(self.version, directory)
+        meta_path = meta_path_for(self.version, directory)
+        with open(table_path + ".tmp", "wb") as f:
+            np.save(f, self.table)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(self.describe(), f, indent=2)
+        os.replace(table_path + ".tmp", table_path)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def load(cls, version, directory, mmap_mode="r"):
+        """The saved table for `version`, or None if there is none."""
+        meta_path = meta_path_for(version, directory)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        table = np.load(table_path_for(version, directory), mmap_mode=mmap_mode)
+        return cls(version, table, meta["lows"], meta["highs"], meta.get("error"))
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "features": list(schema.NAMES),
+            "points": self.sizes.tolist(),
+            "lows": self.lows.tolist(),
+            "highs": self.highs.tolist(),
+            "error": self.error,
+        }
+
+    def matches(self, points, bounds, loaded):
+        """Whether this table was built with the given settings."""
+        lows, highs = grid_bounds(loaded, bounds)
+        return (
+            self.sizes.tolist() == _grid_points(points).tolist()
+            and np.allclose(self.lows, lows) and np.allclose(self.highs, highs)
+        )
+
+    def outside(self, X):
+        """Rows of an (n, 6) matrix that lie beyond the grid on some input."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        return ((X < self.lows) | (X > self.highs)).any(axis=1)
+
+    def predict(self, X):
+        """Interpolated predictions for an (n, 6) matrix in schema.NAMES order (clamped to the grid)."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        if self.use_numba:
+            return _interpolate_numba(X, self.flat, self.lows, self.steps, self.sizes, self.strides, CORNERS)
+
+        pos = np.clip((X - self.lows) / self.steps, 0.0, self.sizes - 1.0)
+        base = np.minimum(pos.astype(np.int64), self.sizes - 2)
+        frac = pos - base
+        out = np.zeros(len(X))
+        for corner in CORNERS:
+            weight = np.prod(np.where(corner, frac, 1.0 - frac), axis=1)
+            out += weight * self.flat[(base + corner) @ self.strides]
+        return out
+
+
+def _grid_points(points):
+    """PREDICTION_LOOKUP_POINTS (one count, or a count per input) as an array."""
+    if isinstance(points, dict):
+        sizes = [int(points.get(name, 8)) for name in schema.NAMES]
+    else:
+        sizes = [int(points)] * N_FEATURES
+    if min(sizes) < 2:
+        raise ValueError("A lookup table needs at least 2 points per input")
+    return np.asarray(sizes, dtype=np.int64)
+
+
+def grid_bounds(loaded, bounds=None):
+    """
+    Per-input (lows, highs) of the grid: the span of the forest's thresholds
+    on that input unless PREDICTION_LOOKUP_BOUNDS gives (low, high).
+    """
+    forest = loaded.forest
+    split = forest.left != np.arange(len(forest.left))
+    # Column j of the model is input loaded.columns[j] (or j when in NAMES order).
+    inputs = forest.feature[split] if loaded.columns is None else np.asarray(loaded.columns)[forest.feature[split]]
+    thresholds = forest.threshold[split]
+
+    lows, highs = schema.LOW.copy(), schema.HIGH.copy()
+    for j, name in enumerate(schema.NAMES):
+        used = thresholds[inputs == j]
+        if len(used):
+            lows[j], highs[j] = used.min(), used.max()
+        if bounds and name in bounds:
+            lows[j], highs[j] = bounds[name]
+        if highs[j] <= lows[j]:
+            highs[j] = lows[j] + 1.0
+    return lows, highs
+
+
+class LookupTables:
+    """Loads, builds and caches the table of the current model version."""
+
+    def __init__(self, enabled=False, points=8, bounds=None, check_points=4096):
+        self.enabled = enabled
+        self.points = points
+        self.bounds = bounds
+        self.check_points = check_points
+
+        self._current = None
+        self._building = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lookup-build")
+
+    def get(self, loaded):
+        """The table for `loaded`, or None while it is still being built."""
+        current = self._current
+        if current is not None and current.version == loaded.version:
+            return current
+        with self._lock:
+            if self._current is not None and self._current.version == loaded.version:
+                return self._current
+            table = LookupTable.load(loaded.version, registry.directory)
+            if table is not None and table.matches(self.points, self.bounds, loaded):
+                self._current = table
+                return table
+            if loaded.version not in self._building:
+                self._building.add(loaded.version)
+                self._executor.submit(self._build, loaded)
+        return None
+
+    def build(self, loaded):
+        """Build, save and install the table for `loaded` in the calling thread."""
+        table = LookupTable.build(loaded, self.points, self.bounds, self.check_points)
+        table.save(registry.directory)
+        self._current = LookupTable.load(loaded.version, registry.directory)
+        return self._current
+
+    def _build(self, loaded):
+        try:
+            self.build(loaded)
+            logger.info("Lookup table for model %s ready: %s", loaded.version, self._current.error)
+        except Exception:
+            logger.exception("Could not build the lookup table for model %s", loaded.version)
+        finally:
+            self._building.discard(loaded.version)
+
+
+tables = LookupTables(
+    enabled=getattr(settings, "PREDICTION_LOOKUP", False),
+    points=getattr(settings, "PREDICTION_LOOKUP_POINTS", 8),
+    bounds=getattr(settings, "PREDICTION_LOOKUP_BOUNDS", None),
+    check_points=getattr(settings, "PREDICTION_LOOKUP_CHECK_POINTS", 4096),
+)
+
+
+def _on_new_model(loaded):
+    # Start on the next version's table as soon as it is swapped in.
+    if tables.enabled:
+        tables.get(loaded)
+
+
+registry.add_listener(_on_new_model)
+
+
+def predict_approx(rows):
+    """
+    predict_yield_batch() answered from the lookup table: the same result
+    shape plus "approximate" and, when it is true, "approx_error" (absolute
+    error against the exact model measured when the table was built) and
+    "exact_rows" (indices of the rows outside the grid, which the forest
+    predicted). Falls back to exact predictions while the table is unavailable.
+    """
+    loaded = registry.get() if tables.enabled else None
+    table = tables.get(loaded) if loaded is not None else None
+    if table is None:
+        result = predict_yield_batch(rows)
+        if "error" not in result:
+            result["approximate"] = False
+        return result
+
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, N_FEATURES)
+    predictions = table.predict(rows)
+    outside = table.outside(rows)
+    if outside.any():
+        exact = predict_yield_batch(rows[outside])
+        if "error" in exact:
+            return exact
+        predictions[outside] = exact["predicted_yield"]
+
+    predictions = predictions.tolist()
+    return {
+        "predicted_yield": predictions,
+        "predicted_byproduct": [round(p * BYPRODUCT_RATIO, 2) for p in predictions],
+        "model_version": table.version,
+        "approximate": True,
+        "approx_error": table.error,
+        "exact_rows": np.flatnonzero(outside).tolist(),
+    }
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from aluminumRec.inference_pool import InferencePool
+from aluminumRec.registry import MODEL_MISSING, registry
+
+
+def _throughput(predict, X, threads, seconds):
+    """Rows/s with `threads` callers each predicting X back to back for `seconds`."""
+    done = []
+    stop = time.perf_counter() + seconds
+
+    def caller():
+        rows = 0
+        while time.perf_counter() < stop:
+            predict(X)
+            rows += len(X)
+        done.append(rows)
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(done) / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = "Compare in-process inference with the process pool at increasing pool sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-workers", type=int, default=os.cpu_count(), help="Largest pool size tried.")
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent callers.")
+        parser.add_argument("--rows", type=int, default=256, help="Rows per call.")
+        parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each run.")
+
+    def handle(self, *args, **options):
+        loaded = registry.get()
+        if loaded is None:
+            raise CommandError(MODEL_MISSING)
+
+        rng = np.random.default_rng(0)
+        n = options["rows"]
+        X = np.column_stack([
+            rng.uniform(100, 500, n),
+            rng.uniform(30, 60, n),
+            rng.uniform(700, 900, n),
+            rng.uniform(1, 10, n),
+            rng.uniform(0.7, 1.0, n),
+            rng.uniform(3, 7, n),
+        ])
+        expected = loaded.predict(X)
+
+        self.stdout.write(
+            f"Model {loaded.version}, {os.cpu_count()} CPUs, {options['threads']} callers x {n} rows"
+        )
+        baseline = _throughput(loaded.predict, X, options["threads"], options["seconds"])
+        self.stdout.write(f"{'in-process':>12}: {baseline:12,.0f} rows/s")
+
+        for workers in range(1, options["max_workers"] + 1):
+            pool = InferencePool(workers=workers, slot_rows=n)
+            try:
+                actual, _ = pool.predict(X)
+                if not np.array_equal(actual, expected):
+                    raise CommandError(f"Pool of {workers} differs from in-process predictions")
+                rate = _throughput(lambda rows: pool.predict(rows), X, options["threads"], options["seconds"])
+            finally:
+                pool.shutdown()
+            self.stdout.write(f"{f'{workers} worker(s)':>12}: {rate:12,.0f} rows/s ({rate / baseline:5.2f}x)")
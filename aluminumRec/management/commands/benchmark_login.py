@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+
+import numpy as np
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+from aluminumRec.hashing import HashPool, Overloaded
+
+PASSWORD = "shift-change-42"
+
+
+def _load(check, threads, seconds):
+    """(logins/s, p50 ms, p99 ms, rejected) with `threads` clients calling check() back to back."""
+    latencies = []
+    rejected = []
+    stop = time.perf_counter() + seconds
+
+    def client():
+        mine, turned_away = [], 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                check()
+            except Overloaded:
+                turned_away += 1
+                time.sleep(0.01)  # a client backing off after its 429
+                continue
+            mine.append(time.perf_counter() - start)
+        latencies.extend(mine)
+        rejected.append(turned_away)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ms = 1000 * np.asarray(latencies or [0.0])
+    return len(latencies) / elapsed, np.percentile(ms, 50), np.percentile(ms, 99), sum(rejected)
+
+
+class Command(BaseCommand):
+    help = "Simulate a login burst: logins/s and p99 latency per hasher, inline and through the hashing pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=64, help="Concurrent clients logging in.")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument("--max-workers", type=int, default=os.cpu_count(), help="Largest pool size tried.")
+        parser.add_argument("--max-pending", type=int, default=32, help="Pool queue-depth limit.")
+
+    def handle(self, *args, **options):
+        preferred = hashers.get_hasher()
+        encoded = {
+            "pbkdf2_sha256": hashers.make_password(PASSWORD, hasher="pbkdf2_sha256"),
+            preferred.algorithm: hashers.make_password(PASSWORD),
+        }
+        self.stdout.write(f"{os.cpu_count()} CPUs, {options['threads']} clients, {options['seconds']:g}s per run")
+        self.stdout.write(f"{'hasher':>14} {'mode':>16} {'logins/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'429s':>7}")
+
+        for algorithm, stored in encoded.items():
+            runs = [("inline", lambda: hashers.check_password(PASSWORD, stored), None)]
+            for workers in range(1, options["max_workers"] + 1):
+                pool = HashPool(workers=workers, max_pending=options["max_pending"])
+                runs.append((f"pool {workers}/{options['max_pending']}", lambda p=pool: p.check_password(PASSWORD, stored), pool))
+
+            for mode, check, pool in runs:
+                rate, p50, p99, rejected = _load(check, options["threads"], options["seconds"])
+                self.stdout.write(f"{algorithm:>14} {mode:>16} {rate:10.1f} {p50:9.1f} {p99:9.1f} {rejected:7d}")
+                if pool is not None:
+                    pool.shutdown()
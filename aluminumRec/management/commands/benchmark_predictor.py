@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from aluminumRec.forest import CompiledForest
+from aluminumRec.registry import MODEL_MISSING, registry
+
+
+def _p50_us(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return 1e6 * float(np.median(timings))
+
+
+class Command(BaseCommand):
+    help = "Check the compiled forest against sklearn and time both predictors (with and without the per-tree spread)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows used for the parity check and batch timing.")
+        parser.add_argument("--repeat", type=int, default=200, help="Timed single-row calls per backend.")
+
+    def handle(self, *args, **options):
+        loaded = registry.get()
+        if loaded is None:
+            raise CommandError(MODEL_MISSING)
+
+        self.stdout.write(f"Model version {loaded.version}")
+        model = loaded.load_estimator()
+        model.set_params(n_jobs=None)  # sklearn only accumulates in tree order single-threaded
+
+        rng = np.random.default_rng(0)
+        n = options["rows"]
+        X = np.column_stack([
+            rng.uniform(100, 500, n),
+            rng.uniform(30, 60, n),
+            rng.uniform(700, 900, n),
+            rng.uniform(1, 10, n),
+            rng.uniform(0.7, 1.0, n),
+            rng.uniform(3, 7, n),
+        ])
+
+        backends = [("sklearn", model.predict)]
+        for use_numba in (False, True):
+            compiled = CompiledForest(loaded.forest.arrays(), use_numba=use_numba)
+            if use_numba and not compiled.use_numba:
+                continue
+            name = "compiled[numba]" if use_numba else "compiled[numpy]"
+
+            expected = model.predict(X)
+            actual = compiled.predict(X)
+            if not np.array_equal(expected, actual):
+                mismatches = int((expected != actual).sum())
+                raise CommandError(f"{name} differs from sklearn on {mismatches} of {n} rows")
+            self.stdout.write(self.style.SUCCESS(f"{name}: {n} rows bit-identical to sklearn"))
+            backends.append((name, compiled.predict))
+            backends.append((f"{name}+spread", compiled.predict_spread))
+
+        for name, fn in backends:
+            single = _p50_us(fn, X[:1], options["repeat"])
+            start = time.perf_counter()
+            fn(X)
+            batch = time.perf_counter() - start
+            self.stdout.write(
+                f"{name:>23}: p50 single row {single:10.1f} us | "
+                f"{n} rows in {batch * 1000:8.1f} ms ({n / batch:,.0f} rows/s)"
+            )
@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+
+from aluminumRec import serializers
+from aluminumRec.serializers import (
+    BYPRODUCT_COLUMNS, PREDICTION_COLUMNS, PREDICTION_FIELDS, SOURCE_COLUMNS,
+    OrjsonEncoder, StdlibEncoder, byproduct_row, prediction_row,
+)
+
+
+def _best_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return 1000 * min(timings)
+
+
+def _prediction_rows(n, rng):
+    """values_list(*PREDICTION_COLUMNS) tuples as the database returns them."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    floats = rng.uniform(0, 900, (n, 11)).tolist()
+    return [
+        (i, f"agent{i % 50}@plant.com", f"Agent {i % 50}", *values[:8], *values[8:],
+         start + timedelta(seconds=37 * i, microseconds=i))
+        for i, values in enumerate(floats)
+    ]
+
+
+def _byproduct_rows(n, rng):
+    """values_list() tuples of byproduct_values(include_source=True)."""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    floats = rng.uniform(0, 900, (n, 10)).tolist()
+    rows = []
+    for i, values in enumerate(floats):
+        created = start + timedelta(seconds=37 * i, microseconds=i)
+        source = None if i % 10 == 0 else i
+        rows.append((
+            i, "Red Mud", values[0], values[1], "pending", source, None, None, "", created, created,
+            *((f"agent{i % 50}@plant.com", *values[2:], created) if source else (None,) * len(SOURCE_COLUMNS)),
+        ))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Time the agent-predictions and byproducts list serialization: per-row dicts + JsonResponse vs the column path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Rows per response.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported).")
+
+    def handle(self, *args, **options):
+        n, repeat = options["rows"], options["repeat"]
+        rng = np.random.default_rng(0)
+        encoders = [StdlibEncoder()] + ([OrjsonEncoder()] if serializers.orjson is not None else [])
+
+        predictions = _prediction_rows(n, rng)
+        byproducts = _byproduct_rows(n, rng)
+        # What the views used to get from .values()
+        prediction_dicts = [dict(zip(PREDICTION_COLUMNS, r)) for r in predictions]
+        byproduct_dicts = [dict(zip(BYPRODUCT_COLUMNS + tuple(SOURCE_COLUMNS.values()), r)) for r in byproducts]
+
+        cases = {
+            "predictions": (
+                lambda: JsonResponse([prediction_row(r) for r in prediction_dicts], safe=False).content,
+                lambda fmt: serializers.render(PREDICTION_FIELDS, serializers.prediction_columns(predictions), fmt),
+            ),
+            "byproducts+source": (
+                lambda: JsonResponse([byproduct_row(r, True) for r in byproduct_dicts], safe=False).content,
+                lambda fmt: (
+                    serializers.byproduct_objects(serializers.byproduct_columns(byproducts, True), True)
+                    if fmt == "objects" else
+                    serializers.render(serializers.byproduct_fields(True), serializers.byproduct_columns(byproducts, True), fmt)
+                ),
+            ),
+        }
+
+        self.stdout.write(f"{n} rows, best of {repeat}")
+        self.stdout.write(f"{'endpoint':>18} {'path':>24} {'ms':>9} {'speedup':>8} {'MB':>6}")
+        for name, (baseline, shape) in cases.items():
+            expected = baseline()
+            base_ms = _best_ms(baseline, repeat)
+            self.stdout.write(f"{name:>18} {'dicts + JsonResponse':>24} {base_ms:9.1f} {1:8.1f} {len(expected) / 1e6:6.1f}")
+
+            for encoder in encoders:
+                serializers.encoder = encoder
+                for fmt in serializers.FORMATS:
+                    # "objects" is always encoded as JsonResponse did; the other formats by `encoder`.
+                    if fmt == "objects" and encoder is not encoders[0]:
+                        continue
+                    dumps = serializers.dumps_objects if fmt == "objects" else encoder.dumps
+                    body = dumps(shape(fmt))
+                    if fmt == "objects" and body != expected:
+                        raise CommandError(f"{name}: objects differ from the per-row output")
+                    ms = _best_ms(lambda: dumps(shape(fmt)), repeat)
+                    path = "objects" if fmt == "objects" else f"{encoder.name} {fmt}"
+                    self.stdout.write(f"{name:>18} {path:>24} {ms:9.1f} {base_ms / ms:8.1f} {len(body) / 1e6:6.1f}")
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from aluminumRec.lookup import tables
+from aluminumRec.registry import MODEL_MISSING, registry
+
+
+def _us_per_row(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return 1e6 * float(np.median(timings)) / len(X)
+
+
+class Command(BaseCommand):
+    help = "Build the approximate-prediction lookup table for the current model and compare it with the forest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows used for the batch timing.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed calls per predictor.")
+
+    def handle(self, *args, **options):
+        loaded = registry.get()
+        if loaded is None:
+            raise CommandError(MODEL_MISSING)
+
+        start = time.perf_counter()
+        table = tables.build(loaded)
+        meta = table.describe()
+        self.stdout.write(
+            f"Model {loaded.version}: {table.table.size:,} grid points {meta['points']} "
+            f"({table.table.nbytes / 1e6:.1f} MB) built in {time.perf_counter() - start:.1f}s"
+        )
+        for name, low, high in zip(meta["features"], meta["lows"], meta["highs"]):
+            self.stdout.write(f"  {name:>18}: {low:g} .. {high:g}")
+        error = table.error
+        self.stdout.write(
+            f"Absolute error vs. the forest over {error['points']} random points: "
+            f"max {error['max']:.4f}, p99 {error['p99']:.4f}, mean {error['mean']:.4f}"
+        )
+
+        rng = np.random.default_rng(1)
+        X = table.lows + rng.random((options["rows"], len(meta["features"]))) * (table.highs - table.lows)
+        for label, rows in (("1 row", X[:1]), (f"{len(X)} rows", X)):
+            exact = _us_per_row(loaded.predict, rows, options["repeat"])
+            approx = _us_per_row(table.predict, rows, options["repeat"])
+            self.stdout.write(
+                f"{label:>12}: forest {exact:9.3f} us/row, table {approx:9.3f} us/row ({exact / approx:6.1f}x)"
+            )
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from aluminumRec.query_plans import explain, problems, query_shapes, seed
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every dashboard query shape and fail if one falls back to a full scan or a sort."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", type=int, default=0,
+            help="Insert this many synthetic rows first (rolled back afterwards) so the planner sees real volumes.",
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        try:
+            with transaction.atomic():
+                if options["seed"]:
+                    seed(options["seed"])
+                for name, queryset, lookup in query_shapes():
+                    plan = explain(queryset)
+                    bad = problems(plan, queryset, lookup)
+                    status = self.style.ERROR("FAIL") if bad else self.style.SUCCESS("ok")
+                    self.stdout.write(f"{status} {name}")
+                    if bad or options["verbosity"] > 1:
+                        self.stdout.write("    " + plan.replace("\n", "\n    "))
+                    if bad:
+                        failures.append(name)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"Unindexed plans: {', '.join(failures)}")
@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from aluminumRec import exports
+
+
+class Command(BaseCommand):
+    help = "Export ProductionRecord history (with agent and by-product) as CSV, Parquet or Arrow."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="Destination file (default: stdout).")
+        parser.add_argument(
+            "--chunk-size", type=int, default=exports.EXPORT_CHUNK_SIZE,
+            help="Rows fetched per query; also the Parquet row group / Arrow batch size.",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        if fmt != "csv" and exports.pa is None:
+            raise CommandError(f"{fmt} export requires pyarrow")
+
+        start = time.perf_counter()
+        written = 0
+        binary = fmt != "csv"
+        if options["output"]:
+            out = open(options["output"], "wb" if binary else "w", newline=None if binary else "")
+        else:
+            out = sys.stdout.buffer if binary else sys.stdout
+
+        try:
+            for part in exports.iter_export(fmt, chunk_size=options["chunk_size"]):
+                out.write(part)
+                written += len(part)
+        finally:
+            if options["output"]:
+                out.close()
+
+        if options["output"]:
+            self.stderr.write(f"Wrote {written:,} {'bytes' if binary else 'characters'} to "
+                              f"{options['output']} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from aluminumRec import imports
+from aluminumRec.models import ByProduct
+
+
+class Command(BaseCommand):
+    help = "Import historical plant runs from CSV with predictions attached (resumes interrupted imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file of runs.")
+        parser.add_argument("--chunk-size", type=int, default=imports.IMPORT_CHUNK_SIZE,
+                            help="Rows validated, predicted and committed together.")
+        parser.add_argument("--byproduct-status", choices=[s for s, _ in ByProduct.STATUS], default="used",
+                            help="Status given to the imported by-products (historical ones are usually used).")
+
+    def handle(self, *args, **options):
+        def progress(checkpoint):
+            self.stdout.write(
+                f"{checkpoint.rows_done:,} rows read, {checkpoint.rows_imported:,} imported, "
+                f"{checkpoint.rows_rejected:,} rejected"
+            )
+
+        try:
+            checkpoint = imports.import_runs(
+                options["path"],
+                chunk_size=options["chunk_size"],
+                byproduct_status=options["byproduct_status"],
+                progress=progress,
+            )
+        except (OSError, imports.ImportFailed) as e:
+            raise CommandError(str(e))
+
+        for error in checkpoint.errors:
+            self.stdout.write(f"  line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{checkpoint.filename}: {checkpoint.rows_imported:,} imported, {checkpoint.rows_rejected:,} rejected"
+        ))
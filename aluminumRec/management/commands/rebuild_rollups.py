@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from aluminumRec import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the production and by-product rollup tables from the raw records."
+
+    def handle(self, *args, **options):
+        buckets = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} production rollup rows and by-product status totals."))
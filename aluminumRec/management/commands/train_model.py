@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from aluminumRec import training
+from aluminumRec.registry import MODEL_MISSING, registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Train a new yield model version and publish it. --source history fits recorded production runs "
+        "against a measured-yield column named with --target; ProductionRecord has no such column yet "
+        "(predicted_aluminum is the model's own output and is refused), so only synthetic training is "
+        "possible until one is added."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=["synthetic", "history"], default="synthetic",
+                            help="Training rows: the simulated dataset or recorded production runs.")
+        parser.add_argument("--target",
+                            help="History only, required: ProductionRecord column holding measured yields.")
+        parser.add_argument("--since", help="History only: ISO datetime of the oldest record used.")
+        parser.add_argument("--chunk-size", type=int, default=training.HISTORY_CHUNK_SIZE,
+                            help="History rows read per query.")
+        parser.add_argument("--trees", type=int, default=training.N_ESTIMATORS,
+                            help="Trees to fit (added to the current model with --warm-start).")
+        parser.add_argument("--warm-start", action="store_true",
+                            help="Grow the currently served model instead of fitting a new one.")
+        parser.add_argument("--n-jobs", type=int, default=-1, help="Cores used for fitting (-1: all).")
+        parser.add_argument("--max-samples", type=float, default=None,
+                            help="Fraction of rows bootstrapped per tree; speeds up very large histories.")
+        parser.add_argument("--holdout", type=float, default=0.1, help="Fraction of rows kept back for metrics.")
+
+    def handle(self, *args, **options):
+        base = None
+        if options["warm_start"]:
+            base = registry.get()
+            if base is None:
+                raise CommandError(MODEL_MISSING)
+            if base.columns is not None:
+                raise CommandError(
+                    f"Model {base.version} was trained on another feature order; cannot warm-start from it"
+                )
+
+        if options["source"] == "history":
+            since = parse_datetime(options["since"]) if options["since"] else None
+            if options["since"] and since is None:
+                raise CommandError(f"Invalid --since: {options['since']}")
+            if not options["target"]:
+                raise CommandError(
+                    "--source history needs --target, a ProductionRecord column of measured yields. "
+                    "There is none yet: the stored predictions are the model's own output, and training "
+                    "on them would only reproduce it."
+                )
+            try:
+                X, y = training.history_dataset(options["target"], since=since, chunk_size=options["chunk_size"])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            X, y = training.synthetic_dataset()
+        if len(X) < 2:
+            raise CommandError("Not enough rows to train on")
+
+        self.stdout.write(f"Training on {len(X):,} {options['source']} rows" +
+                          (f", warm-starting from {base.version}" if base else ""))
+        try:
+            metadata = training.train(
+                X, y, options["source"],
+                n_estimators=options["trees"],
+                n_jobs=options["n_jobs"],
+                max_samples=options["max_samples"],
+                holdout=options["holdout"],
+                base=base,
+            )
+        except FileExistsError as e:
+            raise CommandError(str(e))
+
+        metrics = metadata["metrics"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Aluminum yield model {metadata['version']} trained and saved successfully: "
+            f"{metadata['n_estimators']} trees in {metadata['training_seconds']:.1f}s, "
+            f"{metrics['split']} R2 {metrics['r2']:.3f}, MAE {metrics['mae']:.3f}, RMSE {metrics['rmse']:.3f}"
+        ))
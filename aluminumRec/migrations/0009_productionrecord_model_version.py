@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-16 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0008_byproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productionrecord',
+            name='model_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
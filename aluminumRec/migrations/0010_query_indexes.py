@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-16 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0009_productionrecord_model_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aluminumuser',
+            index=models.Index(fields=['is_approved', 'role'], name='user_approved_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aluminumuser',
+            index=models.Index(fields=['is_approved', '-id'], name='user_approved_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aluminumuser',
+            index=models.Index(fields=['role'], name='user_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aluminumuser',
+            index=models.Index(fields=['reset_token'], name='user_reset_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productionrecord',
+            index=models.Index(fields=['-created_at', '-id'], name='record_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productionrecord',
+            index=models.Index(fields=['agent', '-created_at', '-id'], name='record_agent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='byproduct',
+            index=models.Index(fields=['-created_at'], name='byproduct_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='byproduct',
+            index=models.Index(fields=['status', '-created_at'], name='byproduct_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='byproduct',
+            index=models.Index(fields=['status', '-updated_at'], name='byproduct_status_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2 on 2026-10-16 11:27
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# rollups.ROLLUP_FIELDS / NO_AGENT as of this migration
+ROLLUP_FIELDS = (
+    "bauxite_mass", "caustic_soda_conc", "temperature", "pressure", "ore_quality",
+    "reaction_time", "predicted_aluminum", "predicted_byproduct",
+)
+NO_AGENT = "none"
+
+
+def backfill_rollups(apps, schema_editor):
+    """rollups.rebuild() over the existing history, so the dashboards are right from the first request."""
+    ProductionRecord = apps.get_model("aluminumRec", "ProductionRecord")
+    ByProduct = apps.get_model("aluminumRec", "ByProduct")
+    ProductionRollup = apps.get_model("aluminumRec", "ProductionRollup")
+    ByProductStatusRollup = apps.get_model("aluminumRec", "ByProductStatusRollup")
+
+    sums = {f"sum_{field}": Sum(field) for field in ROLLUP_FIELDS}
+
+    def totals(values):
+        return {name: value or 0 for name, value in values.items()}
+
+    rows = []
+    overall = ProductionRecord.objects.aggregate(count=Count("id"), **sums)
+    if overall["count"]:
+        rows.append(ProductionRollup(period="all", key="all", **totals(overall)))
+    for day in ProductionRecord.objects.annotate(day=TruncDate("created_at")).values("day").annotate(
+        count=Count("id"), **sums
+    ).order_by():
+        rows.append(ProductionRollup(period="day", key=day.pop("day").isoformat(), **totals(day)))
+    for agent in ProductionRecord.objects.values("agent_id").annotate(count=Count("id"), **sums).order_by():
+        agent_id = agent.pop("agent_id")
+        rows.append(ProductionRollup(period="agent", key=str(agent_id) if agent_id else NO_AGENT, **totals(agent)))
+    ProductionRollup.objects.bulk_create(rows)
+
+    ByProductStatusRollup.objects.bulk_create([
+        ByProductStatusRollup(status=row["status"], count=row["count"], quantity_kg=row["kg"] or 0)
+        for row in ByProduct.objects.values("status").annotate(count=Count("id"), kg=Sum("quantity_kg")).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0010_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('all', 'All time'), ('day', 'Day'), ('agent', 'Agent')], max_length=10)),
+                ('key', models.CharField(max_length=32)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('sum_bauxite_mass', models.FloatField(default=0)),
+                ('sum_caustic_soda_conc', models.FloatField(default=0)),
+                ('sum_temperature', models.FloatField(default=0)),
+                ('sum_pressure', models.FloatField(default=0)),
+                ('sum_ore_quality', models.FloatField(default=0)),
+                ('sum_reaction_time', models.FloatField(default=0)),
+                ('sum_predicted_aluminum', models.FloatField(default=0)),
+                ('sum_predicted_byproduct', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'key'), name='unique_production_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ByProductStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('received', 'Received'), ('in_process', 'In Process'), ('used', 'Used')], max_length=20, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('quantity_kg', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
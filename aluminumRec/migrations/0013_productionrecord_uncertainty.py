@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-16 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0012_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productionrecord',
+            name='predicted_aluminum_std',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productionrecord',
+            name='predicted_aluminum_low',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productionrecord',
+            name='predicted_aluminum_high',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
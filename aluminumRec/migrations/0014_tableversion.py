@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-16 23:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+TABLES = ("users", "production", "byproducts")
+
+
+def create_versions(apps, schema_editor):
+    TableVersion = apps.get_model("aluminumRec", "TableVersion")
+    for table in TABLES:
+        TableVersion.objects.get_or_create(table=table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0013_productionrecord_uncertainty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=32, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-17 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0014_tableversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productionrecord',
+            name='agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='aluminumRec.aluminumuser'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-17 14:05
+
+from django.db import migrations
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+# rollups.NO_AGENT as of this migration
+NO_AGENT = "none"
+
+
+def _resum_ore_quality(apps):
+    """Recompute ProductionRollup.sum_ore_quality after the column changed unit."""
+    ProductionRecord = apps.get_model("aluminumRec", "ProductionRecord")
+    ProductionRollup = apps.get_model("aluminumRec", "ProductionRollup")
+
+    sums = {("all", "all"): ProductionRecord.objects.aggregate(total=Sum("ore_quality"))["total"]}
+    for row in ProductionRecord.objects.annotate(day=TruncDate("created_at")).values("day").annotate(
+        total=Sum("ore_quality")
+    ).order_by():
+        sums[("day", row["day"].isoformat())] = row["total"]
+    for row in ProductionRecord.objects.values("agent_id").annotate(total=Sum("ore_quality")).order_by():
+        sums[("agent", str(row["agent_id"]) if row["agent_id"] else NO_AGENT)] = row["total"]
+
+    for rollup in ProductionRollup.objects.all():
+        rollup.sum_ore_quality = sums.get((rollup.period, rollup.key)) or 0
+        rollup.save(update_fields=["sum_ore_quality"])
+
+
+def percent_to_fraction(apps, schema_editor):
+    """Rows saved before purity was normalized hold percentages; store them as the fraction new rows use."""
+    ProductionRecord = apps.get_model("aluminumRec", "ProductionRecord")
+    ProductionRecord.objects.filter(ore_quality__gt=1, ore_quality__lte=100).update(ore_quality=F("ore_quality") / 100)
+    _resum_ore_quality(apps)
+
+
+def fraction_to_percent(apps, schema_editor):
+    """Back to percentages, the unit the column was labelled with before (every in-range row is scaled)."""
+    ProductionRecord = apps.get_model("aluminumRec", "ProductionRecord")
+    ProductionRecord.objects.filter(ore_quality__gte=0, ore_quality__lte=1).update(ore_quality=F("ore_quality") * 100)
+    _resum_ore_quality(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aluminumRec', '0015_alter_productionrecord_agent'),
+    ]
+
+    operations = [
+        migrations.RunPython(percent_to_fraction, fraction_to_percent),
+    ]
@@ -35,6 +35,15 @@ class AluminumUser(models.Model):
     reset_token = models.CharField(max_length=100, null=True, blank=True)
     token_created_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # pending/approved lists and per-role counts
+            models.Index(fields=["is_approved", "role"], name="user_approved_role_idx"),
+            models.Index(fields=["is_approved", "-id"], name="user_approved_id_idx"),
+            models.Index(fields=["role"], name="user_role_idx"),
+            models.Index(fields=["reset_token"], name="user_reset_token_idx"),
+        ]
+
     def create_reset_token(self):
         token = uuid.uuid4().hex
         self.reset_token = token
@@ -63,9 +72,21 @@ class ProductionRecord(models.Model):
 
     predicted_aluminum = models.FloatField()
     predicted_byproduct = models.FloatField()
+    # Spread of the per-tree predictions (std and PREDICTION_INTERVAL quantiles)
+    predicted_aluminum_std = models.FloatField(null=True, blank=True)
+    predicted_aluminum_low = models.FloatField(null=True, blank=True)
+    predicted_aluminum_high = models.FloatField(null=True, blank=True)
+    model_version = models.CharField(max_length=64, blank=True, default="")
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # newest-first dashboards and keyset pagination on (created_at, id)
+            models.Index(fields=["-created_at", "-id"], name="record_created_idx"),
+            models.Index(fields=["agent", "-created_at", "-id"], name="record_agent_created_idx"),
+        ]
+
     def __str__(self):
         return f"Record {self.id} - {self.agent}"
 
@@ -101,5 +122,98 @@ class ByProduct(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="byproduct_created_idx"),
+            # scrap team lists filtered by status, newest created / updated first
+            models.Index(fields=["status", "-created_at"], name="byproduct_status_created_idx"),
+            models.Index(fields=["status", "-updated_at"], name="byproduct_status_updated_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.quantity_kg}kg"
+
+
+# ==============================
+# ROLLUPS
+# ==============================
+class ProductionRollup(models.Model):
+    """
+    Running totals over ProductionRecord, maintained by aluminumRec/rollups.py.
+    One row for everything ("all"), one per day and one per agent; means are
+    sum_<field> / count.
+    """
+    PERIODS = [
+        ("all", "All time"),
+        ("day", "Day"),
+        ("agent", "Agent"),
+    ]
+
+    period = models.CharField(max_length=10, choices=PERIODS)
+    key = models.CharField(max_length=32)
+
+    count = models.PositiveIntegerField(default=0)
+    sum_bauxite_mass = models.FloatField(default=0)
+    sum_caustic_soda_conc = models.FloatField(default=0)
+    sum_temperature = models.FloatField(default=0)
+    sum_pressure = models.FloatField(default=0)
+    sum_ore_quality = models.FloatField(default=0)
+    sum_reaction_time = models.FloatField(default=0)
+    sum_predicted_aluminum = models.FloatField(default=0)
+    sum_predicted_byproduct = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "key"], name="unique_production_rollup"),
+        ]
+
+    def __str__(self):
+        return f"{self.period}:{self.key} ({self.count})"
+
+
+class ByProductStatusRollup(models.Model):
+    status = models.CharField(max_length=20, choices=ByProduct.STATUS, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    quantity_kg = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.status}: {self.count} ({self.quantity_kg}kg)"
+
+
+class TableVersion(models.Model):
+    """
+    Change counter of one table, bumped in the same transaction as every write
+    to it (aluminumRec/versions.py); the list and summary endpoints derive
+    their ETag / Last-Modified from it.
+    """
+    table = models.CharField(max_length=32, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+
+# ==============================
+# HISTORICAL IMPORTS
+# ==============================
+class ImportCheckpoint(models.Model):
+    """
+    Progress of one historical-runs file (aluminumRec/imports.py), identified
+    by the SHA-256 of its contents. rows_done is committed together with each
+    chunk's records, so an interrupted import resumes exactly where it stopped.
+    """
+    source = models.CharField(max_length=64, unique=True)
+    filename = models.CharField(max_length=255)
+
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_imported = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    finished = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.rows_done} rows)"
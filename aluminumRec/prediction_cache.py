@@ -0,0 +1,208 @@
+"""
+Result cache in front of the predictor.
+
+Inputs are snapped to a per-feature quantum (PREDICTION_CACHE_QUANTA) and,
+together with the model version, form the cache key, so resubmitting the same
+or nearly the same run skips the forest entirely. Entries live in a bounded
+in-process LRU with a TTL; when PREDICTION_CACHE_ALIAS names a Django cache
+(e.g. a shared file or memcached cache) that backend is consulted as a second
+level. The local LRU is emptied whenever the registry swaps models, and shared
+entries age out on their own because the version is part of the key.
+
+Async views call apredict(). Cache lookups run on a small bounded thread pool
+(PREDICTION_ASYNC_WORKERS), since the shared cache and a cold registry do I/O;
+a miss is then queued on the micro-batcher and awaited without holding a pool
+thread, so every waiting request can join the same batch. With micro-batching
+off, predict() runs on the pool instead so the event loop never waits on the
+forest. apredict_approx() runs approx=true previews on the pool too, since
+they fall back to the forest while no lookup table is available.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import batching, lookup
+from .predictor import FEATURES, predict_yield_batch, row as prediction_row
+from .registry import registry
+
+
+class PredictionCache:
+    def __init__(self, max_entries=4096, ttl=300, quanta=None, alias=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quanta = [(quanta or {}).get(name) for name in FEATURES]
+        self.alias = alias
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def key(self, version, row):
+        snapped = []
+        for value, quantum in zip(row, self.quanta):
+            value = float(value)
+            if quantum and math.isfinite(value):
+                snapped.append(str(round(value / quantum)))
+            else:
+                snapped.append(repr(value))
+        return f"prediction:{version}:{','.join(snapped)}"
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.alias:
+            value = caches[self.alias].get(key)
+            if value is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store_local(key, value)
+        if self.alias:
+            caches[self.alias].set(key, value, timeout=self.ttl)
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, *args):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0,
+            }
+
+
+cache = PredictionCache(
+    max_entries=getattr(settings, "PREDICTION_CACHE_SIZE", 4096),
+    ttl=getattr(settings, "PREDICTION_CACHE_TTL", 300),
+    quanta=getattr(settings, "PREDICTION_CACHE_QUANTA", None),
+    alias=getattr(settings, "PREDICTION_CACHE_ALIAS", None),
+)
+registry.add_listener(cache.clear)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "PREDICTION_ASYNC_WORKERS", 4), thread_name_prefix="predict"
+)
+
+
+def _enabled():
+    return getattr(settings, "PREDICTION_CACHE", False)
+
+
+def _current_version():
+    loaded = registry.get()
+    return loaded.version if loaded is not None else None
+
+
+def _lookup(run):
+    """(whether results are cached, the cached result or None)."""
+    version = _current_version() if _enabled() else None
+    if version is None:
+        return False, None
+    return True, cache.get(cache.key(version, run))
+
+
+def _store(run, result):
+    if "error" not in result:
+        cache.set(cache.key(result["model_version"], run), result)
+
+
+def predict(bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time):
+    """Same contract as batching.predict, answered from the cache when possible."""
+    run = (bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time)
+    cached, result = _lookup(run)
+    if result is not None:
+        return result
+
+    result = batching.predict(*run)
+    if cached:
+        _store(run, result)
+    return result
+
+
+def predict_batch(rows):
+    """
+    Same contract as predictor.predict_yield_batch(rows, uncertainty=True);
+    only cache misses reach the model.
+    """
+    version = _current_version() if _enabled() else None
+    if version is None:
+        return predict_yield_batch(rows, uncertainty=True)
+
+    keys = [cache.key(version, row) for row in rows]
+    cached = [cache.get(key) for key in keys]
+    missing = [i for i, hit in enumerate(cached) if hit is None]
+
+    if missing:
+        result = predict_yield_batch([rows[i] for i in missing], uncertainty=True)
+        if "error" in result:
+            return result
+        if result["model_version"] != version:
+            # The model was swapped mid-request; hits belong to the old one.
+            return predict_yield_batch(rows, uncertainty=True)
+        for j, i in enumerate(missing):
+            cached[i] = prediction_row(result, j)
+            cache.set(keys[i], cached[i])
+
+    fields = cached[0].keys() if cached else ("predicted_yield", "predicted_byproduct")
+    batch = {key: [r.get(key) for r in cached] for key in fields if key != "model_version"}
+    batch["model_version"] = version
+    return batch
+
+
+async def apredict(bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time):
+    """predict() for async views; see the module docstring."""
+    run = (bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time)
+    loop = asyncio.get_running_loop()
+    if not batching.enabled():
+        return await loop.run_in_executor(_executor, predict, *run)
+
+    cached, result = await loop.run_in_executor(_executor, _lookup, run)
+    if result is not None:
+        return result
+
+    result = await asyncio.wrap_future(batching.batcher.enqueue(run))
+    if cached:
+        _executor.submit(_store, run, result)  # the response needn't wait for the cache write
+    return result
+
+
+async def apredict_approx(rows):
+    """lookup.predict_approx() for async views, run on the bounded prediction pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, lookup.predict_approx, rows)
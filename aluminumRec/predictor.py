@@ -1,34 +1,91 @@
-import joblib
 import numpy as np
-import os
+from django.conf import settings
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(BASE_DIR, "aluminum_yield_model.pkl")
+from . import inference_pool
+from .registry import MODEL_MISSING, registry
+from .schema import NAMES as FEATURES
 
-if not os.path.exists(model_path):
-    model = None
-else:
-    model = joblib.load(model_path)
+# By-product percentage estimated from the predicted yield
+BYPRODUCT_RATIO = 0.52
 
+# Keys added to a prediction when uncertainty is requested
+SPREAD_KEYS = ("predicted_yield_std", "predicted_yield_low", "predicted_yield_high")
 
-def predict_yield(bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time):
+
+def interval():
+    """Quantiles reported as predicted_yield_low / predicted_yield_high."""
+    return tuple(getattr(settings, "PREDICTION_INTERVAL", (0.05, 0.95)))
+
+
+def predict_yield(bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time, uncertainty=False):
     """
     Predict aluminum yield and byproduct using the trained model.
     """
-    if model is None:
-        return {"error": "Model file missing. Train the model first."}
+    result = predict_yield_batch(
+        [[bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time]], uncertainty
+    )
+    if "error" in result:
+        return result
+
+    return row(result, 0)
+
+
+def row(result, i):
+    """The i-th prediction of a predict_yield_batch() result, shaped like predict_yield()'s."""
+    return {key: value[i] if isinstance(value, list) else value for key, value in result.items()}
+
+
+class ModelMissing(Exception):
+    pass
+
+
+def predict_matrix(rows, uncertainty=False):
+    """
+    NumPy-level prediction: returns (outputs, model_version) where outputs is
+    the yield vector, or with uncertainty=True an (n, 4) matrix of mean, std,
+    interval low and interval high. Raises ModelMissing without a model.
+    """
+    features = np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+
+    if inference_pool.pool.enabled:
+        return inference_pool.pool.predict(features, interval() if uncertainty else None)
+
+    loaded = registry.get()
+    if loaded is None:
+        raise ModelMissing(MODEL_MISSING)
+    if uncertainty:
+        mean, std, quantiles = loaded.predict_spread(features, interval())
+        return np.column_stack([mean, std, quantiles[0], quantiles[-1]]), loaded.version
+    return loaded.predict(features), loaded.version
 
+
+def predict_yield_batch(rows, uncertainty=False):
+    """
+    Predict many runs at once. `rows` is an (n, 6) array-like in FEATURES order
+    whose values have passed the schema checks (schema.to_matrix); the whole
+    matrix goes through a single model call (in the worker processes when
+    PREDICTION_PROCESS_WORKERS is set).
+
+    With uncertainty=True the standard deviation and the interval() quantiles
+    of the individual trees' predictions are added, computed from the same
+    single evaluation of all trees.
+    """
     try:
-        features = np.array([[bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time]])
-        prediction = model.predict(features)[0]
+        outputs, version = predict_matrix(rows, uncertainty)
+        predictions = (outputs[:, 0] if uncertainty else outputs).tolist()
 
         # Simple derived estimate for byproduct amount
-        byproduct = round(prediction * 0.52, 2)
+        byproducts = [round(p * BYPRODUCT_RATIO, 2) for p in predictions]
 
-        return {
-            "predicted_yield": float(prediction),
-            "predicted_byproduct": byproduct
+        result = {
+            "predicted_yield": predictions,
+            "predicted_byproduct": byproducts,
+            "model_version": version
         }
+        if uncertainty:
+            for column, key in enumerate(SPREAD_KEYS, start=1):
+                result[key] = outputs[:, column].tolist()
+        return result
 
     except Exception as e:
         return {"error": str(e)}
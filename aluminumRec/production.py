@@ -0,0 +1,92 @@
+"""
+Building and saving prediction rows.
+
+Every path that stores predictions (the single and batch endpoints and the
+historical importer) goes through save_predictions(), which writes the
+ProductionRecords, their ByProducts and the rollup updates in one transaction,
+and announces the new ByProducts on the event feed once it commits.
+"""
+from django.db import connection, transaction
+
+from . import events, rollups, versions
+from .models import ByProduct, ProductionRecord
+
+
+def build_record(user, run, prediction):
+    """`prediction` is one predictor result row (predictor.predict_yield / predictor.row)."""
+    bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time = run
+    return ProductionRecord(
+        agent=user,
+        bauxite_mass=bauxite_mass,
+        caustic_soda_conc=caustic_soda_conc,
+        temperature=temperature,
+        pressure=pressure,
+        ore_quality=purity,
+        reaction_time=reaction_time,
+        predicted_aluminum=prediction["predicted_yield"],
+        predicted_byproduct=prediction["predicted_byproduct"],
+        predicted_aluminum_std=prediction.get("predicted_yield_std"),
+        predicted_aluminum_low=prediction.get("predicted_yield_low"),
+        predicted_aluminum_high=prediction.get("predicted_yield_high"),
+        model_version=prediction.get("model_version", ""),
+    )
+
+
+def build_byproduct(record, status="received", remarks="Auto-created from agent prediction"):
+    # ALWAYS create a NEW ByProduct row for every prediction
+    # This preserves history and allows Scrap Team to see all predictions.
+    bauxite_mass = record.bauxite_mass
+    predicted_byproduct = record.predicted_byproduct
+    return ByProduct(
+        name="Red Mud",
+        quantity_kg=(predicted_byproduct / 100.0) * bauxite_mass if bauxite_mass else predicted_byproduct,
+        percent_of_total=predicted_byproduct,
+        status=status,
+        source_prediction=record,
+        assigned_to_email="",
+        assigned_to_name="",
+        remarks=remarks
+    )
+
+
+def save_predictions(records, created_at=None, batch_size=None, **byproduct_options):
+    """
+    Insert `records` plus one ByProduct each and update the rollups; returns
+    the saved ByProducts. Call inside transaction.atomic() to make it part of
+    a larger unit of work.
+
+    `created_at` optionally gives a timestamp per record (historical imports);
+    auto_now_add would otherwise stamp every row with the current time.
+    """
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            ProductionRecord.objects.bulk_create(records, batch_size=batch_size)
+        else:
+            # Backends without RETURNING (e.g. MySQL) leave bulk-created
+            # pks unset, and ByProduct needs them.
+            for record in records:
+                record.save()
+
+        if created_at is not None:
+            stamped = []
+            for record, when in zip(records, created_at):
+                if when is not None:
+                    record.created_at = when
+                    stamped.append(record)
+            ProductionRecord.objects.bulk_update(stamped, ["created_at"], batch_size=batch_size)
+
+        byproducts = ByProduct.objects.bulk_create(
+            [build_byproduct(r, **byproduct_options) for r in records], batch_size=batch_size
+        )
+        if byproducts and byproducts[0].pk is None:
+            # Backends without RETURNING: read the new ids back for the events.
+            ids = dict(
+                ByProduct.objects.filter(source_prediction__in=records).values_list("source_prediction_id", "id")
+            )
+            for byproduct in byproducts:
+                byproduct.pk = ids.get(byproduct.source_prediction_id)
+        rollups.record_production(records)
+        rollups.record_byproducts(byproducts)
+        versions.bump("production", "byproducts")
+        events.byproducts_created(byproducts)
+    return byproducts
@@ -0,0 +1,86 @@
+"""
+Querysets behind the dashboard list and lookup endpoints.
+
+The views build their reads here rather than inline, and query_plans.py
+EXPLAINs these same functions, so the index checks in the test suite and in
+manage.py check_query_plans follow any change to what a view queries.
+"""
+from django.db.models import Count, Q
+
+from .models import AluminumUser, ByProduct, ProductionRecord
+from .serializers import PREDICTION_COLUMNS
+
+ADMIN_RECENT_RECORDS = 20
+RECENT_APPROVED_USERS = 5
+
+# by-product statuses last_processed_byproduct reports on
+PROCESSED_STATUSES = ("in_process", "used")
+
+
+# ==============================
+# USERS
+# ==============================
+def pending_users():
+    return AluminumUser.objects.filter(is_approved=False).values("id", "name", "email", "role")
+
+
+def approved_users():
+    return AluminumUser.objects.filter(is_approved=True)
+
+
+def recent_approved_users():
+    return approved_users().order_by("-id").values("id", "name", "email", "role")[:RECENT_APPROVED_USERS]
+
+
+def users_by_role():
+    """Approved and pending counts per role, in one aggregate."""
+    return AluminumUser.objects.values("role").annotate(
+        approved=Count("id", filter=Q(is_approved=True)),
+        pending=Count("id", filter=Q(is_approved=False)),
+    ).order_by()
+
+
+def user_by_reset_token(token):
+    return AluminumUser.objects.filter(reset_token=token)
+
+
+# ==============================
+# PRODUCTION RECORDS
+# ==============================
+def recent_records():
+    return ProductionRecord.objects.select_related("agent").order_by("-created_at")[:ADMIN_RECENT_RECORDS]
+
+
+def predictions(email=None, since=None, until=None):
+    """values_list(*PREDICTION_COLUMNS) rows, newest first, for agent_predictions."""
+    qs = ProductionRecord.objects.order_by("-created_at", "-id").values_list(*PREDICTION_COLUMNS)
+    if email:
+        qs = qs.filter(agent__email=email)
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+    if until is not None:
+        qs = qs.filter(created_at__lt=until)
+    return qs
+
+
+def after_cursor(qs, cursor):
+    """The rows of `qs` after keyset `cursor`, a (created_at, id) pair."""
+    created_at, pk = cursor
+    return qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+
+# ==============================
+# BY-PRODUCTS
+# ==============================
+def byproducts(status=None):
+    items = ByProduct.objects.filter(status=status) if status else ByProduct.objects.all()
+    return items.order_by("-created_at")
+
+
+def latest_byproduct():
+    return ByProduct.objects.order_by("-created_at")
+
+
+def latest_with_status(status):
+    # One (status, -updated_at) index probe; an OR across statuses would have to sort every row.
+    return ByProduct.objects.filter(status=status).order_by("-updated_at")
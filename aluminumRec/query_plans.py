@@ -0,0 +1,103 @@
+"""
+EXPLAIN checks for the dashboard query shapes, shared by the test suite and
+manage.py check_query_plans (which runs them against a real database).
+
+Any sort step is a failure; a full scan only fails for point-lookup shapes,
+since scanning is the right plan for low-selectivity filters on small tables.
+"""
+import uuid
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from . import queries, rollups
+from .models import AluminumUser, ByProduct, ProductionRecord
+from .serializers import byproduct_values
+
+# Plan fragments for an unindexed read and for a sort step (MySQL JSON plans;
+# SQLite full scans are matched per table in problems()).
+SCAN_MARKERS = ('"access_type": "ALL"',)
+SORT_MARKERS = ("USE TEMP B-TREE FOR ORDER BY", '"using_filesort": true')
+
+
+# A page as agent_predictions slices it: `limit` rows and one more
+PAGE = 101
+
+
+def _first(queryset):
+    """The query queryset.first() runs."""
+    return (queryset if queryset.ordered else queryset.order_by("pk"))[:1]
+
+
+def query_shapes():
+    """
+    (name, queryset, lookup) for each query the dashboard views run, built by
+    the functions the views call (queries.py and rollups.py). `lookup` marks
+    the shapes that must not scan.
+    """
+    now = timezone.now()
+    agent = AluminumUser.objects.filter(role="agent").exclude(email="").first()
+    email = agent.email if agent else "nobody@plans.invalid"
+    return [
+        ("admin_summary.users", queries.approved_users(), False),
+        ("admin_summary.totals", _first(rollups.production_rows("all", "all")), True),
+        ("admin_summary.recent", queries.recent_records(), True),
+        ("production_rollups", rollups.production_rows("day"), True),
+        ("agent_predictions.page", queries.predictions()[:PAGE], True),
+        ("agent_predictions.keyset", queries.after_cursor(queries.predictions(), (now, 0))[:PAGE], True),
+        ("agent_predictions.agent", queries.predictions(email=email)[:PAGE], True),
+        ("agent_predictions.range", queries.predictions(since=now - timedelta(days=7), until=now)[:PAGE], True),
+        # The whole list is returned, so reading every row is the plan; sorting them is not.
+        ("byproducts.all", byproduct_values(queries.byproducts(), flat=True), False),
+        ("byproducts.source", byproduct_values(queries.byproducts(), include_source=True, flat=True), False),
+        ("byproducts.status", byproduct_values(queries.byproducts("received"), flat=True), True),
+        ("last_byproduct", _first(byproduct_values(queries.latest_byproduct())), True),
+        *(
+            (f"last_processed_byproduct.{status}", _first(byproduct_values(queries.latest_with_status(status))), True)
+            for status in queries.PROCESSED_STATUSES
+        ),
+        ("byproduct_summary", rollups.byproduct_rows(), False),
+        ("pending_users", queries.pending_users(), False),
+        ("users_count", queries.users_by_role(), False),
+        ("recent_approved_users", queries.recent_approved_users(), False),
+        ("reset_password.token", _first(queries.user_by_reset_token("x")), True),
+    ]
+
+
+def explain(queryset):
+    return queryset.explain(format="JSON") if connection.vendor == "mysql" else queryset.explain()
+
+
+def problems(plan, queryset, lookup):
+    """The parts of `plan` (from explain()) that make it unacceptable; empty when it is fine."""
+    bad = [m for m in SORT_MARKERS if m in plan]
+    if lookup:
+        bad += [m for m in SCAN_MARKERS if m in plan]
+    if lookup and connection.vendor == "sqlite":
+        table = queryset.model._meta.db_table
+        bad += [line.strip() for line in plan.splitlines() if line.strip().endswith(f"SCAN {table}")]
+    return bad
+
+
+def seed(rows):
+    """Insert `rows` synthetic records (and by-products, and a tenth as many users) so the planner sees volume."""
+    AluminumUser.objects.bulk_create([
+        AluminumUser(name=f"seed{i}", email=f"seed{i}@plans.invalid", password="-",
+                     role=("agent", "scrap_team", "admin")[i % 3], is_approved=bool(i % 2),
+                     reset_token=uuid.uuid4().hex if i % 10 == 0 else None)
+        for i in range(max(rows // 10, 3))
+    ])
+    agents = list(AluminumUser.objects.filter(email__endswith="@plans.invalid", role="agent"))
+    ProductionRecord.objects.bulk_create([
+        ProductionRecord(agent=agents[i % len(agents)], bauxite_mass=300, caustic_soda_conc=40, temperature=800,
+                         pressure=5, ore_quality=0.9, reaction_time=5, predicted_aluminum=30, predicted_byproduct=15)
+        for i in range(rows)
+    ])
+    ByProduct.objects.bulk_create([
+        ByProduct(quantity_kg=10, percent_of_total=15, status=("received", "in_process", "used")[i % 3])
+        for i in range(rows)
+    ])
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
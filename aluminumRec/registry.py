@@ -0,0 +1,215 @@
+"""
+Lazy, hot-reloadable registry for the trained yield model.
+
+Nothing is loaded at import time. The first prediction loads the newest
+artifact, and afterwards the artifact directory is re-checked at most every
+MODEL_RELOAD_INTERVAL seconds; a newer version is loaded in full and then
+swapped in with a single assignment, so in-flight predictions keep using the
+snapshot they started with.
+
+Artifacts are written by `manage.py train_model` (see training.py) as
+    artifacts/aluminum_yield_meta-<version>.json    (features, metrics, checksums)
+    artifacts/aluminum_yield_forest-<version>.pkl   (flat tree arrays)
+    artifacts/aluminum_yield_model-<version>.pkl    (sklearn estimator)
+When a version has metadata, the file it is loaded from must match the
+recorded SHA-256, and the feature schema stored with the model must match
+schema.FEATURES (up to column order); a version that fails either check is
+not swapped in.
+The forest arrays are loaded with joblib's mmap_mode, so forked workers share
+one page-cache copy instead of each unpickling 200 trees. The sklearn
+estimator is only unpickled when no forest export exists for a version.
+The unversioned files next to this module are used when no versioned
+artifact exists.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+from . import schema
+from .forest import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(BASE_DIR, "artifacts")
+
+LEGACY_VERSION = "legacy"
+LEGACY_MODEL_PATH = os.path.join(BASE_DIR, "aluminum_yield_model.pkl")
+LEGACY_FOREST_PATH = os.path.join(BASE_DIR, "aluminum_yield_forest.pkl")
+
+MODEL_MISSING = "Model file missing. Train the model first (manage.py train_model)."
+
+_ARTIFACT_RE = re.compile(r"^aluminum_yield_(model|forest)-(?P<version>[\w.]+)\.pkl$")
+
+
+def model_path_for(version, directory=ARTIFACT_DIR):
+    return os.path.join(directory, f"aluminum_yield_model-{version}.pkl")
+
+
+def forest_path_for(version, directory=ARTIFACT_DIR):
+    return os.path.join(directory, f"aluminum_yield_forest-{version}.pkl")
+
+
+def meta_path_for(version, directory=ARTIFACT_DIR):
+    return os.path.join(directory, f"aluminum_yield_meta-{version}.json")
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def _verify(path, metadata):
+    expected = metadata.get("sha256", {}).get(os.path.basename(path))
+    if expected is None:
+        return
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    if digest.hexdigest() != expected:
+        raise ChecksumMismatch(f"{os.path.basename(path)} does not match its recorded checksum")
+
+
+class LoadedModel:
+    """One immutable model version: the compiled forest plus where it came from."""
+
+    def __init__(self, version, forest, model_path, forest_path, metadata=None):
+        self.version = version
+        self.forest = forest
+        self.model_path = model_path
+        self.forest_path = forest_path
+        self.metadata = metadata or {}
+        # Checked once here; predict() then only reorders columns if needed.
+        self.columns = schema.column_order(forest.schema or self.metadata.get("features"))
+
+    def predict(self, X):
+        """Predict rows in schema.NAMES order that have been validated by the schema."""
+        X = np.asarray(X, dtype=np.float64)
+        if self.columns is not None:
+            X = X[:, self.columns]
+        return self.forest.predict(X, check=False)
+
+    def predict_spread(self, X, quantiles=(0.05, 0.95)):
+        """predict() plus the per-tree std and quantiles (see CompiledForest.predict_spread)."""
+        X = np.asarray(X, dtype=np.float64)
+        if self.columns is not None:
+            X = X[:, self.columns]
+        return self.forest.predict_spread(X, quantiles, check=False)
+
+    def load_estimator(self):
+        """Unpickle the full sklearn estimator (not needed for predictions)."""
+        _verify(self.model_path, self.metadata)
+        return joblib.load(self.model_path)
+
+
+class ModelRegistry:
+    def __init__(self, directory=ARTIFACT_DIR, mmap_mode="r", reload_interval=5.0):
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        self.reload_interval = reload_interval
+
+        self._current = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._rejected = set()
+
+    def add_listener(self, callback):
+        """Call `callback(loaded_model)` whenever a different model is swapped in."""
+        self._listeners.append(callback)
+
+    def get(self):
+        """Return the current LoadedModel, loading or swapping it if needed (None if no model)."""
+        current = self._current
+        if current is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            # Only one thread scans and loads; the others keep the current snapshot.
+            if current is None:
+                with self._lock:
+                    self._refresh()
+            elif self._lock.acquire(blocking=False):
+                try:
+                    self._refresh()
+                finally:
+                    self._lock.release()
+        return self._current
+
+    def reload(self):
+        """Force a rescan now, e.g. right after training."""
+        with self._lock:
+            self._checked_at = 0.0
+            self._refresh(force=True)
+        return self._current
+
+    def versions(self):
+        """Versions present on disk, oldest first."""
+        found = set()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                match = _ARTIFACT_RE.match(name)
+                if match:
+                    found.add(match.group("version"))
+        return sorted(found)
+
+    def _latest(self):
+        versions = self.versions()
+        if versions:
+            version = versions[-1]
+            return version, model_path_for(version, self.directory), forest_path_for(version, self.directory)
+        if os.path.exists(LEGACY_MODEL_PATH) or os.path.exists(LEGACY_FOREST_PATH):
+            return LEGACY_VERSION, LEGACY_MODEL_PATH, LEGACY_FOREST_PATH
+        return None
+
+    def _refresh(self, force=False):
+        self._checked_at = time.monotonic()
+        latest = self._latest()
+        if latest is None:
+            self._current = None
+            return
+
+        version, model_path, forest_path = latest
+        if not force and self._current is not None and (version == self._current.version or version in self._rejected):
+            return
+
+        previous = self._current
+        try:
+            loaded = self._load(version, model_path, forest_path)
+        except (ChecksumMismatch, schema.SchemaMismatch):
+            if previous is None:
+                raise
+            logger.exception("Not swapping in model %s; still serving %s", version, previous.version)
+            self._rejected.add(version)
+            return
+        self._current = loaded
+        if previous is not None:
+            for callback in self._listeners:
+                callback(self._current)
+
+    def _load(self, version, model_path, forest_path):
+        metadata = {}
+        meta_path = meta_path_for(version, self.directory)
+        if version != LEGACY_VERSION and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                metadata = json.load(f)
+
+        if os.path.exists(forest_path):
+            _verify(forest_path, metadata)
+            forest = CompiledForest.load(forest_path, mmap_mode=self.mmap_mode)
+        else:
+            _verify(model_path, metadata)
+            forest = CompiledForest.from_model(joblib.load(model_path))
+        return LoadedModel(version, forest, model_path, forest_path, metadata)
+
+
+registry = ModelRegistry(
+    directory=getattr(settings, "MODEL_ARTIFACT_DIR", ARTIFACT_DIR),
+    mmap_mode=getattr(settings, "MODEL_MMAP_MODE", "r"),
+    reload_interval=getattr(settings, "MODEL_RELOAD_INTERVAL", 5.0),
+)
@@ -0,0 +1,178 @@
+"""
+PDF reports rendered off the request thread and stored by content hash.
+
+Every report is identified by a key describing exactly what goes into it (the
+record values, or the filter plus a fingerprint of the matching rows). The
+SHA-256 of that key names the file under REPORT_DIR, so a report that has
+been rendered once is afterwards served straight from disk, and concurrent
+requests for the same report share one render in the worker pool.
+
+Since a stored file is served again for as long as its key matches, nothing
+that isn't in the key (such as the time of rendering) may appear in it.
+
+A render that raised stays pending for REPORT_FAILURE_TTL seconds, so the
+requests polling for it get the error instead of starting it over.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from reportlab.pdfgen import canvas
+
+# Bump when the layout changes so old files are not served for new requests.
+TEMPLATE_VERSION = 2
+
+REPORT_DIR = getattr(settings, "REPORT_DIR", os.path.join(settings.BASE_DIR, "reports"))
+REPORT_FAILURE_TTL = getattr(settings, "REPORT_FAILURE_TTL", 60)
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, "REPORT_WORKERS", 2), thread_name_prefix="report")
+_pending = {}
+_failed = {}  # path -> time.monotonic() when its pending render raised
+# Reentrant: add_done_callback() runs the callback at once if the render already finished.
+_lock = threading.RLock()
+
+
+def report_path(key):
+    digest = hashlib.sha256(json.dumps([TEMPLATE_VERSION, key], sort_keys=True, default=str).encode()).hexdigest()
+    return os.path.join(REPORT_DIR, digest[:2], f"{digest}.pdf")
+
+
+def submit(key, render, *args):
+    """
+    Return (path, future). `future` is None when the report is already on disk;
+    otherwise it resolves once `render(tmp_path, *args)` has produced the file.
+    """
+    path = report_path(key)
+    if os.path.exists(path):
+        return path, None
+
+    with _lock:
+        future = _pending.get(path)
+        if future is None or time.monotonic() - _failed.get(path, float("inf")) > REPORT_FAILURE_TTL:
+            future = _executor.submit(_render_to, path, render, *args)
+            _pending[path] = future
+            _failed.pop(path, None)
+            future.add_done_callback(lambda f: _finished(path, f))
+    return path, future
+
+
+def _finished(path, future):
+    with _lock:
+        if _pending.get(path) is not future:
+            return
+        if future.exception() is None:
+            del _pending[path]
+        else:
+            _failed[path] = time.monotonic()
+
+
+def _render_to(path, render, *args):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        render(tmp_path, *args)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        # Pool threads must not hold on to their own DB connections.
+        connection.close()
+    return path
+
+
+# ==============================
+# RENDERERS
+# ==============================
+def prediction_lines(email, bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time,
+                     predicted_yield, predicted_byproduct, aluminum_kg, byproduct_kg, byproduct_name):
+    return [
+        ("User", email),
+        ("Bauxite Mass (kg)", bauxite_mass),
+        ("Caustic Soda Concentration (%)", caustic_soda_conc),
+        ("Temperature (°C)", temperature),
+        ("Pressure (atm)", pressure),
+        ("Purity (%)", purity),
+        ("Reaction Time (hrs)", reaction_time),
+        None,
+        ("Predicted Aluminum Yield (%)", predicted_yield),
+        ("Predicted By-Product (%)", predicted_byproduct),
+        ("Aluminum Output (kg)", aluminum_kg),
+        ("By-Product Output (kg)", byproduct_kg),
+        ("By-Product Name", byproduct_name),
+    ]
+
+
+def render_prediction(path, lines):
+    """Single prediction, same layout as the original download_report."""
+    p = canvas.Canvas(path)
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, 800, "Aluminum Yield Prediction Report")
+
+    p.setFont("Helvetica", 12)
+    y = 770
+
+    for line in lines:
+        if line is None:
+            p.setFont("Helvetica-Bold", 12)
+            p.drawString(50, y, "----- Prediction Results -----: ")
+            p.setFont("Helvetica", 12)
+        else:
+            p.drawString(50, y, f"{line[0]}: {line[1]}")
+        y -= 22
+
+    p.showPage()
+    p.save()
+
+
+SUMMARY_COLUMNS = (
+    ("Date", 40), ("Agent", 130), ("Bauxite", 250), ("Temp", 300), ("Purity", 345),
+    ("Time", 390), ("Yield %", 430), ("By-prod %", 490),
+)
+
+
+def render_summary(path, title, rows):
+    """
+    One line per ProductionRecord, paging as it goes. `rows` is an iterator of
+    values() dicts, so records are pulled from the database chunk by chunk.
+    """
+    p = canvas.Canvas(path)
+    page = 1
+    y = 0
+    count = 0
+
+    def header():
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(40, 800, title)
+        p.setFont("Helvetica-Bold", 9)
+        for label, x in SUMMARY_COLUMNS:
+            p.drawString(x, 775, label)
+        p.setFont("Helvetica", 9)
+        return 760
+
+    y = header()
+    for r in rows:
+        if y < 50:
+            p.drawString(40, 30, f"Page {page}")
+            p.showPage()
+            page += 1
+            y = header()
+
+        values = (
+            r["created_at"].strftime("%Y-%m-%d %H:%M"), r["agent__email"] or "unknown",
+            f"{r['bauxite_mass']:.1f}", f"{r['temperature']:.1f}", f"{r['ore_quality']:.3f}",
+            f"{r['reaction_time']:.2f}", f"{r['predicted_aluminum']:.2f}", f"{r['predicted_byproduct']:.2f}",
+        )
+        for (_, x), value in zip(SUMMARY_COLUMNS, values):
+            p.drawString(x, y, value)
+        y -= 14
+        count += 1
+
+    p.drawString(40, 30, f"Page {page} - {count} records")
+    p.showPage()
+    p.save()
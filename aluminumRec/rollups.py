@@ -0,0 +1,164 @@
+"""
+Incrementally maintained statistics for the admin and scrap-team dashboards.
+
+Every write path that creates ProductionRecord / ByProduct rows, changes a
+by-product's status or deletes an agent calls into this module inside the
+same transaction, so the rollup tables always agree with the raw tables. rebuild() recomputes them
+from scratch (manage.py rebuild_rollups).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ByProduct, ByProductStatusRollup, ProductionRecord, ProductionRollup
+
+ROLLUP_FIELDS = (
+    "bauxite_mass", "caustic_soda_conc", "temperature", "pressure", "ore_quality",
+    "reaction_time", "predicted_aluminum", "predicted_byproduct",
+)
+NO_AGENT = "none"
+
+
+def _bucket_keys(record):
+    created_at = record.created_at or timezone.now()
+    return [
+        ("all", "all"),
+        ("day", timezone.localdate(created_at).isoformat()),
+        ("agent", str(record.agent_id) if record.agent_id else NO_AGENT),
+    ]
+
+
+def _add(model, lookup, deltas):
+    model.objects.get_or_create(**lookup)
+    model.objects.filter(**lookup).update(**{field: F(field) + value for field, value in deltas.items()})
+
+
+def record_production(records):
+    """Add freshly saved ProductionRecords to the day / agent / all-time totals."""
+    buckets = defaultdict(lambda: defaultdict(float))
+    for record in records:
+        for bucket in _bucket_keys(record):
+            totals = buckets[bucket]
+            totals["count"] += 1
+            for field in ROLLUP_FIELDS:
+                totals[f"sum_{field}"] += getattr(record, field)
+
+    for (period, key), totals in buckets.items():
+        totals["count"] = int(totals["count"])
+        _add(ProductionRollup, {"period": period, "key": key}, totals)
+
+
+def record_byproducts(byproducts):
+    """Add freshly saved ByProducts to their status totals."""
+    buckets = defaultdict(lambda: {"count": 0, "quantity_kg": 0.0})
+    for item in byproducts:
+        buckets[item.status]["count"] += 1
+        buckets[item.status]["quantity_kg"] += item.quantity_kg
+
+    for status, totals in buckets.items():
+        _add(ByProductStatusRollup, {"status": status}, totals)
+
+
+def record_status_change(quantity_kg, old_status, new_status):
+    if old_status == new_status:
+        return
+    _add(ByProductStatusRollup, {"status": old_status}, {"count": -1, "quantity_kg": -quantity_kg})
+    _add(ByProductStatusRollup, {"status": new_status}, {"count": 1, "quantity_kg": quantity_kg})
+
+
+def agent_removed(agent_id):
+    """
+    Fold a deleted agent's bucket into NO_AGENT, where their records
+    (agent=NULL after the delete) belong; call in the deleting transaction.
+    """
+    row = ProductionRollup.objects.filter(period="agent", key=str(agent_id)).first()
+    if row is None:
+        return
+    fields = ["count"] + [f"sum_{field}" for field in ROLLUP_FIELDS]
+    _add(ProductionRollup, {"period": "agent", "key": NO_AGENT}, {field: getattr(row, field) for field in fields})
+    row.delete()
+
+
+def production_rows(period, key=None):
+    """The rollup rows of `period` ordered by key, or its `key` bucket alone (also EXPLAINed by query_plans)."""
+    rows = ProductionRollup.objects.filter(period=period)
+    return rows.filter(key=key) if key is not None else rows.order_by("key")
+
+
+def production_totals(period="all", key="all"):
+    """count plus mean of every rollup field for one bucket (zeros when empty)."""
+    return _with_means(production_rows(period, key).first())
+
+
+async def aproduction_totals(period="all", key="all"):
+    return _with_means(await production_rows(period, key).afirst())
+
+
+def production_buckets(period):
+    return {row.key: _with_means(row) for row in production_rows(period)}
+
+
+def _with_means(row):
+    count = row.count if row else 0
+    data = {"count": count}
+    for field in ROLLUP_FIELDS:
+        total = getattr(row, f"sum_{field}") if row else 0
+        data[f"sum_{field}"] = total
+        data[f"mean_{field}"] = total / count if count else 0
+    return data
+
+
+def byproduct_rows():
+    return ByProductStatusRollup.objects.all()
+
+
+def byproduct_totals():
+    totals = {status: {"count": 0, "quantity_kg": 0} for status, _ in ByProduct.STATUS}
+    for row in byproduct_rows():
+        totals[row.status] = {"count": row.count, "quantity_kg": row.quantity_kg}
+    return totals
+
+
+async def abyproduct_totals():
+    totals = {status: {"count": 0, "quantity_kg": 0} for status, _ in ByProduct.STATUS}
+    async for row in byproduct_rows():
+        totals[row.status] = {"count": row.count, "quantity_kg": row.quantity_kg}
+    return totals
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute every rollup row from the raw tables."""
+    ProductionRollup.objects.all().delete()
+    ByProductStatusRollup.objects.all().delete()
+
+    sums = {f"sum_{field}": Sum(field) for field in ROLLUP_FIELDS}
+    rows = []
+
+    overall = ProductionRecord.objects.aggregate(count=Count("id"), **sums)
+    if overall["count"]:
+        rows.append(ProductionRollup(period="all", key="all", **_or_zero(overall)))
+
+    for day in ProductionRecord.objects.annotate(day=TruncDate("created_at")).values("day").annotate(
+        count=Count("id"), **sums
+    ).order_by():
+        rows.append(ProductionRollup(period="day", key=day.pop("day").isoformat(), **_or_zero(day)))
+
+    for agent in ProductionRecord.objects.values("agent_id").annotate(count=Count("id"), **sums).order_by():
+        agent_id = agent.pop("agent_id")
+        rows.append(ProductionRollup(period="agent", key=str(agent_id) if agent_id else NO_AGENT, **_or_zero(agent)))
+
+    ProductionRollup.objects.bulk_create(rows)
+
+    ByProductStatusRollup.objects.bulk_create([
+        ByProductStatusRollup(status=row["status"], count=row["count"], quantity_kg=row["kg"] or 0)
+        for row in ByProduct.objects.values("status").annotate(count=Count("id"), kg=Sum("quantity_kg")).order_by()
+    ])
+    return len(rows)
+
+
+def _or_zero(values):
+    return {name: value or 0 for name, value in values.items()}
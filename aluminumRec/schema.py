@@ -0,0 +1,136 @@
+"""
+The model's input contract, shared by the trainer, the predictor and every
+path that turns requests or files into feature rows.
+
+FEATURES fixes the name, order, dtype, accepted range and request default of
+each input. The trainer fits on exactly this column order and stores
+describe() inside every artifact; at load time the registry compares the
+stored schema with this one and derives the column order the model expects
+(column_order()), so old artifacts trained on another order keep working and
+incompatible ones are refused before they serve a single request.
+
+Requests are converted with to_matrix(), which fills one preallocated float64
+matrix in a single pass, scales percentage inputs (PERCENT_INPUTS) to
+fractions and range-checks it vectorized; rows that come out of it need no
+further validation on the way to the forest.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+
+class Feature(NamedTuple):
+    name: str
+    dtype: str
+    low: float
+    high: float
+    default: float
+
+
+FEATURES = (
+    Feature("bauxite_mass", "float64", 0.0, 1e6, 0.0),        # kg
+    Feature("caustic_soda_conc", "float64", 0.0, 100.0, 0.0),  # %
+    Feature("temperature", "float64", 0.0, 1500.0, 0.0),       # °C
+    Feature("pressure", "float64", 0.0, 100.0, 0.0),           # atm
+    Feature("purity", "float64", 0.0, 1.0, 0.0),               # fraction
+    Feature("reaction_time", "float64", 0.0, 48.0, 1.0),       # hrs
+)
+
+NAMES = tuple(f.name for f in FEATURES)
+LOW = np.array([f.low for f in FEATURES])
+HIGH = np.array([f.high for f in FEATURES])
+
+# Other names the same inputs go by (older artifacts, ProductionRecord, CSV files)
+ALIASES = {"purity_factor": "purity", "ore_quality": "purity"}
+
+# Inputs clients have always been free to send as a percentage: values above 1
+# (up to 100) are read as percent and scaled to the fraction the model uses.
+# 1 itself stays 1.0 (100 %).
+PERCENT_INPUTS = ("purity",)
+_PERCENT_COLUMNS = [NAMES.index(name) for name in PERCENT_INPUTS]
+
+# Order of the artifacts written before the schema was stored with them
+LEGACY_ORDER = ("bauxite_mass", "caustic_soda_conc", "temperature", "pressure", "reaction_time", "purity_factor")
+
+
+class SchemaMismatch(Exception):
+    pass
+
+
+def describe():
+    """The schema as stored in artifacts."""
+    return [f._asdict() for f in FEATURES]
+
+
+def column_order(stored):
+    """
+    Indices that turn a NAMES-ordered matrix into the column order of a model
+    trained with `stored` (a describe() list or plain names; None means the
+    pre-schema order). Returns None when no reordering is needed.
+    """
+    if stored is None:
+        stored = LEGACY_ORDER
+    names = [ALIASES.get(n, n) for n in (s["name"] if isinstance(s, dict) else s for s in stored)]
+    if sorted(names) != sorted(NAMES):
+        raise SchemaMismatch(f"Model features {names} do not match {list(NAMES)}")
+    for s in stored:
+        if isinstance(s, dict) and s.get("dtype", "float64") != "float64":
+            raise SchemaMismatch(f"Model feature {s['name']} has dtype {s['dtype']}")
+
+    order = np.array([NAMES.index(n) for n in names])
+    return None if (order == np.arange(len(NAMES))).all() else order
+
+
+def normalize(X):
+    """Scale percentage inputs in a NAMES-ordered matrix to fractions, in place; returns X."""
+    for j in _PERCENT_COLUMNS:
+        column = X[:, j]
+        with np.errstate(invalid="ignore"):
+            percent = (column > 1) & (column <= 100)
+        column[percent] /= 100
+    return X
+
+
+def invalid(X):
+    """Boolean matrix marking values that are NaN, infinite or out of range."""
+    with np.errstate(invalid="ignore"):
+        return ~((X >= LOW) & (X <= HIGH))
+
+
+def _error(row):
+    return "Invalid or out of range: " + ", ".join(
+        f"{NAMES[j]} (expected {LOW[j]:g}..{HIGH[j]:g}{' or a percentage' if NAMES[j] in PERCENT_INPUTS else ''})"
+        for j in np.flatnonzero(row)
+    )
+
+
+def to_matrix(runs):
+    """
+    Convert request dicts into a (len(runs), n_features) float64 matrix in one
+    pass. Returns (X, errors) where errors maps row index to a message; those
+    rows must not be predicted.
+    """
+    X = np.empty((len(runs), len(FEATURES)), dtype=np.float64)
+    errors = {}
+    for i, run in enumerate(runs):
+        try:
+            if not isinstance(run, dict):
+                raise TypeError("Run must be a JSON object")
+            for j, f in enumerate(FEATURES):
+                X[i, j] = run.get(f.name, f.default)
+        except (TypeError, ValueError) as e:
+            errors[i] = str(e)
+            X[i] = LOW
+
+    bad = invalid(normalize(X))
+    for i in np.flatnonzero(bad.any(axis=1)):
+        errors.setdefault(int(i), _error(bad[i]))
+    return X, errors
+
+
+def parse_run(data):
+    """One request dict as a tuple in NAMES order; raises ValueError when invalid."""
+    X, errors = to_matrix([data])
+    if errors:
+        raise ValueError(errors[0])
+    return tuple(X[0].tolist())
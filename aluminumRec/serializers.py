@@ -0,0 +1,226 @@
+"""
+Row projections shared by the list and "latest" endpoints.
+
+Each endpoint selects only the columns below through .values(), so a response
+costs one query however many rows it holds: foreign keys are read as *_id
+columns and related fields come from a single JOIN, never a per-row lookup.
+
+The list endpoints read .values_list() tuples instead and shape them a column
+at a time (prediction_columns / byproduct_columns): fallbacks are applied to
+whole columns and timestamps are formatted in one pass by the encoder, with no
+per-row dict or strftime. render() then lays the columns out as
+
+    "objects"  a list of objects, the shape prediction_row() / byproduct_row() give
+    "rows"     {"columns": [...], "rows": [[...], ...]}
+    "columns"  {column: [values...], ...}
+
+and json_response() encodes the result. "objects" bodies are encoded exactly
+as JsonResponse encoded the per-row dicts before the other formats existed
+(stdlib json with its default separators and ASCII escapes), so existing
+clients get the same bytes; "rows" and "columns" use JSON_SERIALIZER:
+"orjson" (the default when it is installed) or "stdlib".
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+FORMATS = ("objects", "rows", "columns")
+
+
+# ==============================
+# ENCODERS
+# ==============================
+class StdlibEncoder:
+    name = "stdlib"
+
+    def dumps(self, data):
+        return json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+
+    def format_datetimes(self, values):
+        """DATE_FORMAT for a column of datetimes (isoformat is several times cheaper than strftime)."""
+        return [value.isoformat(" ", "minutes")[:16] for value in values]
+
+
+class OrjsonEncoder:
+    name = "orjson"
+
+    def dumps(self, data):
+        return orjson.dumps(data, default=DjangoJSONEncoder().default)
+
+    def format_datetimes(self, values):
+        # orjson writes the whole column as ISO 8601 in C; cut each down to DATE_FORMAT.
+        return [value[:10] + " " + value[11:16] for value in orjson.loads(orjson.dumps(values))]
+
+
+def _encoder():
+    name = getattr(settings, "JSON_SERIALIZER", "orjson" if orjson is not None else "stdlib")
+    if name == "orjson" and orjson is not None:
+        return OrjsonEncoder()
+    return StdlibEncoder()
+
+
+encoder = _encoder()
+
+
+def dumps_objects(data):
+    """`data` as JsonResponse(data, safe=False) encodes it."""
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def json_response(data, fmt="objects", status=200):
+    """A JSON response for `data` laid out as `fmt`; see the module docstring."""
+    body = dumps_objects(data) if fmt == "objects" else encoder.dumps(data)
+    return HttpResponse(body, content_type="application/json", status=status)
+
+
+def _transpose(rows, width):
+    return [list(column) for column in zip(*rows)] if rows else [[] for _ in range(width)]
+
+
+def render(fields, columns, fmt="objects"):
+    """Lay out parallel `columns` named by `fields` in one of FORMATS."""
+    if fmt == "rows":
+        return {"columns": list(fields), "rows": list(zip(*columns))}
+    if fmt == "columns":
+        return dict(zip(fields, columns))
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+# ==============================
+# PRODUCTION RECORDS
+# ==============================
+PREDICTION_COLUMNS = (
+    "id", "agent__email", "agent__name", "bauxite_mass", "caustic_soda_conc", "temperature",
+    "pressure", "ore_quality", "reaction_time", "predicted_aluminum", "predicted_byproduct",
+    "predicted_aluminum_std", "predicted_aluminum_low", "predicted_aluminum_high", "created_at",
+)
+
+
+def prediction_row(r):
+    return {
+        "id": r["id"],
+        "email": r["agent__email"] or "unknown",
+        "agent_name": r["agent__name"] or "Unknown",
+        "bauxite_mass": r["bauxite_mass"],
+        "caustic_soda_conc": r["caustic_soda_conc"],
+        "temperature": r["temperature"],
+        "pressure": r["pressure"],
+        "purity": r["ore_quality"],
+        "reaction_time": r["reaction_time"],
+        "predicted_yield": r["predicted_aluminum"],
+        "predicted_byproduct": r["predicted_byproduct"],
+        "predicted_yield_std": r["predicted_aluminum_std"],
+        "predicted_yield_low": r["predicted_aluminum_low"],
+        "predicted_yield_high": r["predicted_aluminum_high"],
+        "created_at": r["created_at"].strftime(DATE_FORMAT),
+    }
+
+
+# Output names of PREDICTION_COLUMNS, in the same order
+PREDICTION_FIELDS = (
+    "id", "email", "agent_name", "bauxite_mass", "caustic_soda_conc", "temperature",
+    "pressure", "purity", "reaction_time", "predicted_yield", "predicted_byproduct",
+    "predicted_yield_std", "predicted_yield_low", "predicted_yield_high", "created_at",
+)
+
+
+def prediction_columns(rows):
+    """values_list(*PREDICTION_COLUMNS) tuples -> columns in PREDICTION_FIELDS order, as prediction_row() fills them."""
+    columns = _transpose(rows, len(PREDICTION_FIELDS))
+    columns[1] = [email or "unknown" for email in columns[1]]
+    columns[2] = [name or "Unknown" for name in columns[2]]
+    columns[-1] = encoder.format_datetimes(columns[-1])
+    return columns
+
+
+# ==============================
+# BY-PRODUCTS
+# ==============================
+BYPRODUCT_COLUMNS = (
+    "id", "name", "quantity_kg", "percent_of_total", "status", "source_prediction_id",
+    "assigned_to_email", "assigned_to_name", "remarks", "created_at", "updated_at",
+)
+
+# Output key -> column on the joined ProductionRecord (and its agent)
+SOURCE_COLUMNS = {
+    "agent_email": "source_prediction__agent__email",
+    "bauxite_mass": "source_prediction__bauxite_mass",
+    "caustic_soda_conc": "source_prediction__caustic_soda_conc",
+    "temperature": "source_prediction__temperature",
+    "pressure": "source_prediction__pressure",
+    "purity": "source_prediction__ore_quality",
+    "reaction_time": "source_prediction__reaction_time",
+    "predicted_yield": "source_prediction__predicted_aluminum",
+    "predicted_byproduct": "source_prediction__predicted_byproduct",
+    "created_at": "source_prediction__created_at",
+}
+
+
+def byproduct_values(queryset, include_source=False, flat=False):
+    """Project a ByProduct queryset onto the columns byproduct_row() needs (tuples when flat)."""
+    columns = BYPRODUCT_COLUMNS + (tuple(SOURCE_COLUMNS.values()) if include_source else ())
+    return queryset.values_list(*columns) if flat else queryset.values(*columns)
+
+
+def byproduct_row(r, include_source=False):
+    data = {
+        "id": r["id"],
+        "name": r["name"],
+        "quantity_kg": r["quantity_kg"],
+        "percent_of_total": r["percent_of_total"],
+        "status": r["status"],
+        "source_prediction_id": r["source_prediction_id"],
+        "assigned_to_email": r["assigned_to_email"],
+        "assigned_to_name": r["assigned_to_name"],
+        "remarks": r["remarks"],
+        "created_at": r["created_at"].strftime(DATE_FORMAT),
+        "updated_at": r["updated_at"].strftime(DATE_FORMAT),
+    }
+    if include_source:
+        if r["source_prediction_id"] is None:
+            data["source_prediction"] = None
+        else:
+            source = {key: r[column] for key, column in SOURCE_COLUMNS.items()}
+            source["created_at"] = source["created_at"].strftime(DATE_FORMAT)
+            data["source_prediction"] = source
+    return data
+
+
+def byproduct_fields(include_source=False):
+    """Output names of byproduct_values()'s columns; source columns are "source_prediction.<key>"."""
+    source = tuple(f"source_prediction.{key}" for key in SOURCE_COLUMNS) if include_source else ()
+    return BYPRODUCT_COLUMNS + source
+
+
+def byproduct_columns(rows, include_source=False):
+    """values_list() tuples of byproduct_values()'s columns -> columns as byproduct_row() fills them."""
+    fields = byproduct_fields(include_source)
+    columns = _transpose(rows, len(fields))
+    for i, field in enumerate(fields):
+        if field in ("created_at", "updated_at"):
+            columns[i] = encoder.format_datetimes(columns[i])
+        elif field == "source_prediction.created_at":
+            # Null when there is no source prediction (LEFT JOIN)
+            present = [j for j, value in enumerate(columns[i]) if value is not None]
+            formatted = encoder.format_datetimes([columns[i][j] for j in present])
+            for j, value in zip(present, formatted):
+                columns[i][j] = value
+    return columns
+
+
+def byproduct_objects(columns, include_source=False):
+    """render(..., "objects") for byproduct_columns(), with the source nested as byproduct_row() does."""
+    objects = render(byproduct_fields(include_source), columns)
+    if include_source:
+        for obj in objects:
+            source = {key: obj.pop(f"source_prediction.{key}") for key in SOURCE_COLUMNS}
+            obj["source_prediction"] = source if obj["source_prediction_id"] is not None else None
+    return objects
@@ -0,0 +1,251 @@
+"""
+What-if parameter sweeps over the yield model.
+
+A sweep fixes some inputs, gives ranges for others and evaluates either the
+full Cartesian grid of those ranges or a Latin-hypercube sample of them. Rows
+are generated and predicted SWEEP_CHUNK_ROWS at a time, so memory stays
+bounded however many points are requested, and the sweep stops early (and
+says so) once SWEEP_TIME_LIMIT seconds have been spent. Each chunk updates a
+running top-k of the feasible points and a binned response surface over two
+of the swept inputs; nothing is written to the database.
+
+Request body:
+    {
+      "base": {"bauxite_mass": 300, ...},              inputs not swept
+      "ranges": {"temperature": {"min": 700, "max": 900, "steps": 21}, ...},
+      "method": "grid" | "lhs",   "samples": 100000,   "seed": 0,
+      "objective": "max" | "min",                      on predicted_yield
+      "constraints": {"predicted_byproduct": {"max": 15}},
+      "top": 10,
+      "surface": {"x": "temperature", "y": "reaction_time", "bins": 25}
+    }
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+
+from . import schema
+from .predictor import BYPRODUCT_RATIO, predict_matrix
+
+SWEEP_MAX_POINTS = getattr(settings, "SWEEP_MAX_POINTS", 1_000_000)
+SWEEP_CHUNK_ROWS = getattr(settings, "SWEEP_CHUNK_ROWS", 65536)
+SWEEP_TIME_LIMIT = getattr(settings, "SWEEP_TIME_LIMIT", 30.0)
+SWEEP_MAX_TOP = 100
+SWEEP_MAX_BINS = 100
+
+OUTPUTS = ("predicted_yield", "predicted_byproduct")
+
+
+def _number(value, what):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be a number")
+    if not np.isfinite(number):
+        raise ValueError(f"{what} must be finite")
+    return number
+
+
+class Sweep:
+    """A validated sweep request (see the module docstring for the format)."""
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("Expected a JSON object")
+
+        base, errors = schema.to_matrix([spec.get("base") or {}])
+        if errors:
+            raise ValueError(f"base: {errors[0]}")
+        self.base = base[0]
+
+        ranges = spec.get("ranges")
+        if not isinstance(ranges, dict) or not ranges:
+            raise ValueError("ranges must name at least one input to sweep")
+        self.columns, self.lows, self.highs, self.steps = [], [], [], []
+        for name, bounds in ranges.items():
+            if name not in schema.NAMES:
+                raise ValueError(f"Unknown input {name!r}")
+            if not isinstance(bounds, dict):
+                raise ValueError(f"ranges.{name} must be an object with min and max")
+            j = schema.NAMES.index(name)
+            low = _number(bounds.get("min"), f"ranges.{name}.min")
+            high = _number(bounds.get("max"), f"ranges.{name}.max")
+            if name in schema.PERCENT_INPUTS and 1 < high <= 100:
+                # A percentage range, as schema.normalize() reads base values; both bounds share the unit.
+                low, high = low / 100, high / 100
+            if not schema.LOW[j] <= low <= high <= schema.HIGH[j]:
+                raise ValueError(
+                    f"ranges.{name} must satisfy {schema.LOW[j]:g} <= min <= max <= {schema.HIGH[j]:g}"
+                )
+            self.columns.append(j)
+            self.lows.append(low)
+            self.highs.append(high)
+            self.steps.append(int(bounds.get("steps", 11)) if low < high else 1)
+
+        self.method = spec.get("method", "grid")
+        if self.method == "grid":
+            if not all(1 <= n <= SWEEP_MAX_POINTS for n in self.steps):
+                raise ValueError(f"steps must be between 1 and {SWEEP_MAX_POINTS:,}")
+            self.points = int(np.prod(self.steps, dtype=np.float64))
+        elif self.method == "lhs":
+            self.points = int(spec.get("samples", 10000))
+            if self.points < 1:
+                raise ValueError("samples must be at least 1")
+            self.seed = int(spec.get("seed", 0))
+        else:
+            raise ValueError("method must be 'grid' or 'lhs'")
+        if self.points > SWEEP_MAX_POINTS:
+            raise ValueError(f"{self.points:,} points requested; the limit is {SWEEP_MAX_POINTS:,}")
+        if self.method == "grid":
+            # Only once the grid is known to be within the limit.
+            self.axes = [np.linspace(lo, hi, n) for lo, hi, n in zip(self.lows, self.highs, self.steps)]
+
+        self.maximize = spec.get("objective", "max") != "min"
+        self.top = min(max(int(spec.get("top", 10)), 1), SWEEP_MAX_TOP)
+
+        self.constraints = []
+        for name, bounds in (spec.get("constraints") or {}).items():
+            if name not in OUTPUTS and name not in schema.NAMES:
+                raise ValueError(f"Unknown constraint {name!r}")
+            for side in ("min", "max"):
+                if side in bounds:
+                    self.constraints.append((name, side, _number(bounds[side], f"constraints.{name}.{side}")))
+
+        surface = spec.get("surface") or {}
+        swept = [schema.NAMES[j] for j in self.columns]
+        self.surface_axes = []
+        for axis in (surface.get("x", swept[0]), surface.get("y", swept[1] if len(swept) > 1 else None)):
+            if axis is None:
+                continue
+            if axis not in swept:
+                raise ValueError(f"surface axis {axis!r} is not one of the swept inputs")
+            self.surface_axes.append(swept.index(axis))
+        self.bins = min(max(int(surface.get("bins", 25)), 1), SWEEP_MAX_BINS)
+
+    # ------------------------------
+    # point generation
+    # ------------------------------
+    def chunks(self):
+        """Yield (n, 6) feature matrices covering every point, SWEEP_CHUNK_ROWS at a time."""
+        if self.method == "lhs":
+            rng = np.random.default_rng(self.seed)
+            strata = [rng.permutation(self.points) for _ in self.columns]
+
+        for start in range(0, self.points, SWEEP_CHUNK_ROWS):
+            stop = min(start + SWEEP_CHUNK_ROWS, self.points)
+            X = np.empty((stop - start, len(schema.NAMES)), dtype=np.float64)
+            X[:] = self.base
+            if self.method == "grid":
+                coords = np.unravel_index(np.arange(start, stop), self.steps)
+                for k, j in enumerate(self.columns):
+                    X[:, j] = self.axes[k][coords[k]]
+            else:
+                for k, j in enumerate(self.columns):
+                    u = (strata[k][start:stop] + rng.random(stop - start)) / self.points
+                    X[:, j] = self.lows[k] + u * (self.highs[k] - self.lows[k])
+            yield X
+
+    # ------------------------------
+    # evaluation
+    # ------------------------------
+    def run(self):
+        started = time.perf_counter()
+        shape = (self.bins,) * len(self.surface_axes)
+        total = np.zeros(shape)
+        count = np.zeros(shape, dtype=np.int64)
+        peak = np.full(shape, -np.inf)
+
+        best_X = np.empty((0, len(schema.NAMES)))
+        best_y = np.empty(0)
+        evaluated = feasible = 0
+        version = None
+        complete = True
+
+        for X in self.chunks():
+            if time.perf_counter() - started > SWEEP_TIME_LIMIT:
+                complete = False
+                break
+            y, version = predict_matrix(X)
+            evaluated += len(X)
+
+            ok = self._feasible(X, y)
+            feasible += int(ok.sum())
+            if self.surface_axes:
+                cells = self._cells(X[ok])
+                np.add.at(total, cells, y[ok])
+                np.add.at(count, cells, 1)
+                np.maximum.at(peak, cells, y[ok])
+
+            # Running top-k: keep the best of (previous best + this chunk).
+            best_X = np.concatenate([best_X, X[ok]])
+            best_y = np.concatenate([best_y, y[ok]])
+            if len(best_y) > self.top:
+                keep = np.argpartition(-best_y if self.maximize else best_y, self.top - 1)[:self.top]
+                best_X, best_y = best_X[keep], best_y[keep]
+
+        order = np.argsort(-best_y if self.maximize else best_y, kind="stable")
+        return {
+            "model_version": version,
+            "method": self.method,
+            "points": self.points,
+            "evaluated": evaluated,
+            "feasible": feasible,
+            "complete": complete,
+            "elapsed_ms": round(1000 * (time.perf_counter() - started), 1),
+            "best": [self._point(best_X[i], best_y[i]) for i in order],
+            "surface": self._surface(total, count, peak),
+        }
+
+    def _feasible(self, X, y):
+        ok = np.ones(len(X), dtype=bool)
+        for name, side, limit in self.constraints:
+            if name == "predicted_yield":
+                values = y
+            elif name == "predicted_byproduct":
+                values = y * BYPRODUCT_RATIO
+            else:
+                values = X[:, schema.NAMES.index(name)]
+            ok &= values >= limit if side == "min" else values <= limit
+        return ok
+
+    def _cells(self, X):
+        cells = []
+        for k in self.surface_axes:
+            low, high = self.lows[k], self.highs[k]
+            scaled = (X[:, self.columns[k]] - low) / (high - low) if high > low else np.zeros(len(X))
+            cells.append(np.minimum((scaled * self.bins).astype(np.int64), self.bins - 1))
+        return tuple(cells)
+
+    def _point(self, x, y):
+        point = {name: float(x[j]) for j, name in enumerate(schema.NAMES)}
+        point["predicted_yield"] = float(y)
+        point["predicted_byproduct"] = round(float(y) * BYPRODUCT_RATIO, 2)
+        return point
+
+    def _surface(self, total, count, peak):
+        if not self.surface_axes:
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+        peak = np.where(count > 0, peak, np.nan)
+
+        surface = {}
+        for label, k in zip(("x", "y"), self.surface_axes):
+            low, high = self.lows[k], self.highs[k]
+            width = (high - low) / self.bins
+            surface[label] = schema.NAMES[self.columns[k]]
+            surface[f"{label}_values"] = [low + width * (i + 0.5) for i in range(self.bins)]
+        surface["mean_yield"] = _nulls(mean)
+        surface["max_yield"] = _nulls(peak)
+        surface["count"] = count.tolist()
+        return surface
+
+
+def _nulls(values):
+    """Nested lists with NaN (empty cells) as None, for JSON."""
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def run_sweep(spec):
+    return Sweep(spec).run()
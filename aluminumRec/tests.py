@@ -1,3 +1,1320 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import importlib
+import io
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from inspect import unwrap
+from unittest import mock, skipIf
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps
+from django.core.cache import caches
+from django.contrib.auth import hashers
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from sklearn.ensemble import RandomForestRegressor
+
+from . import (
+    auth, batching, events, exports, forest, hashing, imports, lookup, prediction_cache, query_plans, reports, rollups,
+    schema, serializers, sweep, training, views,
+)
+from .models import (
+    AluminumUser, ByProduct, ByProductStatusRollup, ImportCheckpoint, ProductionRecord, ProductionRollup, TableVersion,
+)
+from .predictor import predict_yield, predict_yield_batch
+from .production import save_predictions
+from .registry import registry
+from .serializers import (
+    DATE_FORMAT, PREDICTION_COLUMNS, PREDICTION_FIELDS, byproduct_row, byproduct_values, prediction_row,
+)
+
+
+def _agent(i=0, approved=True):
+    return AluminumUser.objects.create(
+        name=f"Agent {i}", email=f"agent{i}@plant.test", password="-", role="agent", is_approved=approved,
+    )
+
+
+def _record(agent, **values):
+    fields = dict(
+        bauxite_mass=300, caustic_soda_conc=40, temperature=800, pressure=5, ore_quality=0.9,
+        reaction_time=5, predicted_aluminum=30, predicted_byproduct=15.6,
+    )
+    fields.update(values)
+    return ProductionRecord(agent=agent, **fields)
+
+
+class ModelMixin:
+    """Serve a small model published to a temporary artifact directory (the real artifacts are not in git)."""
+
+    VERSION = "20260101000000"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        for name, value in (("directory", directory.name), ("reload_interval", 3600), ("_current", None)):
+            patcher = mock.patch.object(registry, name, value)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        cls.publish(cls.VERSION)
+        # No listener fires for a first load; results of another class's model must not be served.
+        prediction_cache.cache.clear()
+
+    @staticmethod
+    def publish(version, seed=42):
+        """Train and publish `version`, then swap it in as the registry would."""
+        X, y = training.synthetic_dataset(n=500, seed=seed)
+        model = training.fit(X, y, n_estimators=10, n_jobs=1)
+        training.publish(model, version, {"features": schema.describe()}, directory=registry.directory)
+        return registry.reload()
+
+
+def _call(view, path):
+    """GET an async view without its decorators (so without the ETag lookup)."""
+    return async_to_sync(unwrap(view))(RequestFactory().get(path))
+
+
+# ==============================
+# INPUT SCHEMA
+# ==============================
+class SchemaTests(SimpleTestCase):
+    RUN = {"bauxite_mass": 300, "caustic_soda_conc": 45, "temperature": 800, "pressure": 5, "reaction_time": 5}
+
+    def _purity(self, value):
+        return schema.parse_run({**self.RUN, "purity": value})[schema.NAMES.index("purity")]
+
+    def test_purity_accepts_fractions_and_percentages(self):
+        self.assertEqual(self._purity(0.85), 0.85)
+        self.assertEqual(self._purity(1), 1.0)
+        self.assertAlmostEqual(self._purity(85), 0.85)
+        self.assertAlmostEqual(self._purity("92.5"), 0.925)
+        self.assertEqual(self._purity(100), 1.0)
+
+    def test_purity_out_of_range(self):
+        for value in (-0.1, 100.5, float("nan")):
+            with self.subTest(value=value), self.assertRaisesMessage(ValueError, "purity"):
+                self._purity(value)
+
+    def test_batch_matrix_normalizes_percentages(self):
+        X, errors = schema.to_matrix([{**self.RUN, "purity": 90}, {**self.RUN, "purity": 0.9}, {"purity": 250}])
+        j = schema.NAMES.index("purity")
+        self.assertAlmostEqual(X[0, j], X[1, j])
+        self.assertEqual(list(errors), [2])
+
+    def test_sweep_accepts_percentage_ranges(self):
+        spec = {"base": self.RUN, "ranges": {"purity": {"min": 80, "max": 95, "steps": 4}}}
+        swept = sweep.Sweep(spec)
+        self.assertAlmostEqual(swept.lows[0], 0.8)
+        self.assertAlmostEqual(swept.highs[0], 0.95)
+        spec["ranges"]["purity"] = {"min": 0.8, "max": 0.95}
+        self.assertEqual((swept.lows, swept.highs), (sweep.Sweep(spec).lows, sweep.Sweep(spec).highs))
+
+
+class SweepLimitTests(SimpleTestCase):
+    RUN = SchemaTests.RUN
+
+    def test_oversized_grids_are_refused_before_allocating(self):
+        for ranges in (
+            {"temperature": {"min": 700, "max": 900, "steps": 1_000_000_000}},
+            {name: {"min": 1, "max": 2, "steps": 1000} for name in ("temperature", "pressure", "reaction_time")},
+        ):
+            with self.subTest(ranges=ranges), mock.patch.object(sweep.np, "linspace") as linspace:
+                with self.assertRaises(ValueError):
+                    sweep.Sweep({"base": self.RUN, "ranges": ranges})
+                linspace.assert_not_called()
+
+    def test_view_answers_400(self):
+        spec = {"base": self.RUN, "ranges": {"temperature": {"min": 700, "max": 900, "steps": 1_000_000_000}}}
+        response = self.client.post("/predict_production/sweep/", spec, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("steps", response.json()["error"])
+
+
+class PurityMigrationTests(TestCase):
+    """Rows stored as percentages before purity was normalized become fractions, rollups included."""
+
+    def test_percentages_become_fractions(self):
+        agent = _agent()
+        save_predictions([_record(agent, ore_quality=value) for value in (85, 0.9, 100, 1)])
+        migration = importlib.import_module("aluminumRec.migrations.0016_ore_quality_fraction")
+
+        migration.percent_to_fraction(apps, None)
+        values = sorted(ProductionRecord.objects.values_list("ore_quality", flat=True))
+        self.assertEqual(values, [0.85, 0.9, 1.0, 1.0])
+        self.assertAlmostEqual(ProductionRollup.objects.get(period="all").sum_ore_quality, 3.75)
+        incremental = _rollup_state()
+        rollups.rebuild()
+        self.assertEqual(incremental, _rollup_state())
+
+        migration.fraction_to_percent(apps, None)
+        values = sorted(ProductionRecord.objects.values_list("ore_quality", flat=True))
+        self.assertEqual(values, [85, 90, 100, 100])
+        self.assertAlmostEqual(ProductionRollup.objects.get(period="agent", key=str(agent.pk)).sum_ore_quality, 375)
+
+
+# ==============================
+# BATCH PREDICTIONS
+# ==============================
+class BatchPredictionTests(ModelMixin, TestCase):
+    RUN = {"bauxite_mass": 300, "caustic_soda_conc": 45, "temperature": 800, "pressure": 5, "purity": 0.9,
+           "reaction_time": 5, "email": "agent0@plant.test"}
+
+    def setUp(self):
+        auth.principals.clear()
+        self.agent = _agent()
+
+    def test_invalid_runs_are_reported_per_index(self):
+        runs = [self.RUN, {**self.RUN, "temperature": 5000}, "not a run", {**self.RUN, "purity": 85}]
+        response = self.client.post("/predict_production/batch/", runs, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data["created"], 2)
+        self.assertEqual([e["index"] for e in data["errors"]], [1, 2])
+        self.assertIn("temperature", data["errors"][0]["error"])
+        self.assertEqual([r["status"] for r in data["results"]], ["success", "error", "error", "success"])
+        self.assertEqual(data["results"][1]["error"], data["errors"][0]["error"])
+
+        # Only the valid runs are saved, each with its by-product, in request order.
+        saved = ProductionRecord.objects.order_by("id")
+        self.assertEqual([r.id for r in saved], [data["results"][0]["id"], data["results"][3]["id"]])
+        self.assertEqual([r.ore_quality for r in saved], [0.9, 0.85])
+        self.assertTrue(all(r.agent_id == self.agent.id for r in saved))
+        self.assertEqual(ByProduct.objects.filter(source_prediction__in=saved).count(), 2)
+
+        exact = predict_yield_batch([schema.parse_run(runs[0]), schema.parse_run(runs[3])])
+        self.assertEqual([data["results"][i]["predicted_yield"] for i in (0, 3)], exact["predicted_yield"])
+
+    def test_all_invalid_saves_nothing(self):
+        response = self.client.post("/predict_production/batch/", [{"purity": 250}], content_type="application/json")
+        data = response.json()
+        self.assertEqual((data["created"], len(data["errors"])), (0, 1))
+        self.assertFalse(ProductionRecord.objects.exists())
+
+
+# ==============================
+# UNCERTAINTY
+# ==============================
+class UncertaintyTests(ModelMixin, TestCase):
+    """Per-tree std and interval: computed from the trees, stored with the record and returned."""
+
+    RUNS = [
+        {"bauxite_mass": 300, "caustic_soda_conc": 45, "temperature": 800, "pressure": 5, "purity": 0.9,
+         "reaction_time": 5},
+        {"bauxite_mass": 150, "caustic_soda_conc": 58, "temperature": 710, "pressure": 9, "purity": 0.72,
+         "reaction_time": 3.5},
+    ]
+    FIELDS = ("predicted_yield_std", "predicted_yield_low", "predicted_yield_high")
+
+    def setUp(self):
+        self.estimator = registry.get().load_estimator()
+
+    def assertSpread(self, run, result):
+        X = np.array([schema.parse_run(run)])
+        per_tree = np.stack([tree.predict(X) for tree in self.estimator.estimators_])[:, 0]
+        low, high = np.quantile(per_tree, (0.05, 0.95))
+        self.assertAlmostEqual(result["predicted_yield"], per_tree.mean(), places=9)
+        self.assertAlmostEqual(result["predicted_yield_std"], per_tree.std(), places=9)
+        self.assertAlmostEqual(result["predicted_yield_low"], low, places=9)
+        self.assertAlmostEqual(result["predicted_yield_high"], high, places=9)
+        self.assertGreater(result["predicted_yield_std"], 0)
+        self.assertLessEqual(result["predicted_yield_low"], result["predicted_yield"])
+        self.assertLessEqual(result["predicted_yield"], result["predicted_yield_high"])
+
+    def assertStored(self, record_id, result):
+        record = ProductionRecord.objects.get(pk=record_id)
+        stored = (record.predicted_aluminum_std, record.predicted_aluminum_low, record.predicted_aluminum_high)
+        self.assertEqual(stored, tuple(result[field] for field in self.FIELDS))
+
+    def test_single_prediction(self):
+        for run in self.RUNS:
+            with self.subTest(run=run):
+                data = self.client.post(
+                    "/predict_production/", {**run, "uncertainty": True}, content_type="application/json"
+                ).json()
+                self.assertSpread(run, data)
+                self.assertEqual(data["interval"], [0.05, 0.95])
+                self.assertStored(ProductionRecord.objects.latest("id").pk, data)
+
+    def test_batch_prediction(self):
+        data = self.client.post(
+            "/predict_production/batch/?uncertainty=1", self.RUNS, content_type="application/json"
+        ).json()
+        for run, result in zip(self.RUNS, data["results"]):
+            self.assertSpread(run, result)
+            self.assertStored(result["id"], result)
+
+    def test_stored_without_asking_and_listed(self):
+        data = self.client.post("/predict_production/", self.RUNS[0], content_type="application/json").json()
+        self.assertNotIn("predicted_yield_std", data)
+
+        listed = self.client.get("/agent-predictions/?limit=1").json()["results"][0]
+        self.assertSpread(self.RUNS[0], listed)
+        self.assertStored(listed["id"], listed)
+
+
+# ==============================
+# APPROXIMATE PREDICTIONS
+# ==============================
+class ApproxPredictionTests(ModelMixin, TestCase):
+    """approx=true answers inside the lookup grid within its reported error, and exactly outside it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name, value in (("enabled", True), ("points", 4), ("_current", None)):
+            patcher = mock.patch.object(lookup.tables, name, value)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        cls.table = lookup.tables.build(registry.get())
+
+    def _batch(self, X):
+        runs = [dict(zip(schema.NAMES, row)) for row in X.tolist()]
+        response = self.client.post("/predict_production/batch/?approx=1", runs, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_within_reported_error_inside_the_grid(self):
+        X = self.table.lows + np.random.default_rng(3).random((50, 6)) * (self.table.highs - self.table.lows)
+        data = self._batch(X)
+        self.assertTrue(data["approximate"])
+        self.assertEqual(data["approx_error"], self.table.error)
+        self.assertEqual(data["created"], 0)
+        self.assertFalse(ProductionRecord.objects.exists())
+
+        exact = np.array(predict_yield_batch(X)["predicted_yield"])
+        approx = np.array([r["predicted_yield"] for r in data["results"]])
+        self.assertTrue(all(r["approximate"] for r in data["results"]))
+        self.assertLessEqual(np.abs(approx - exact).max(), data["approx_error"]["max"])
+
+    def test_outside_the_grid_is_exact(self):
+        inside = (self.table.lows + self.table.highs) / 2
+        beyond = inside.copy()
+        j = schema.NAMES.index("temperature")
+        beyond[j] = self.table.highs[j] + 5
+        data = self._batch(np.array([inside, beyond]))
+        self.assertEqual([r["approximate"] for r in data["results"]], [True, False])
+        self.assertEqual(data["results"][1]["predicted_yield"], predict_yield_batch([beyond])["predicted_yield"][0])
+
+        single = self.client.post(
+            "/predict_production/", {**dict(zip(schema.NAMES, beyond.tolist())), "approx": True},
+            content_type="application/json",
+        ).json()
+        self.assertFalse(single["approximate"])
+        self.assertNotIn("approx_error", single)
+        self.assertEqual(single["predicted_yield"], data["results"][1]["predicted_yield"])
+
+    def test_exact_until_the_table_exists(self):
+        with mock.patch.object(lookup.tables, "enabled", False):
+            data = self._batch(self.table.lows[None, :])
+        self.assertFalse(data["approximate"])
+        self.assertNotIn("approx_error", data)
+
+
+# ==============================
+# MICRO-BATCHING
+# ==============================
+class MicroBatcherTests(ModelMixin, SimpleTestCase):
+    """Concurrent single-row predictions share one model call; each caller gets its own row back."""
+
+    RUNS = [(300.0 + 10 * i, 45.0, 760.0 + 20 * i, 5.0, 0.9, 5.0) for i in range(8)]
+
+    def setUp(self):
+        self.calls = []
+
+        def predict_batch(rows):
+            self.calls.append(list(rows))
+            return predict_yield_batch(rows, uncertainty=True)
+
+        # A long window, so the batch is dispatched by reaching max_rows rather than by timing.
+        self.batcher = batching.MicroBatcher(predict_batch, window_ms=5000, max_rows=len(self.RUNS))
+        patcher = mock.patch.object(batching, "batcher", self.batcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expected(self):
+        return [predict_yield(*run, uncertainty=True) for run in self.RUNS]
+
+    def test_concurrent_submits_share_one_call(self):
+        results = [None] * len(self.RUNS)
+        start = threading.Barrier(len(self.RUNS))
+
+        def caller(i):
+            start.wait()
+            results[i] = self.batcher.submit(self.RUNS[i])
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(len(self.RUNS))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertCountEqual(self.calls[0], self.RUNS)
+        self.assertEqual(results, self.expected())
+        stats = self.batcher.stats()
+        self.assertEqual((stats["batches"], stats["rows"]), (1, len(self.RUNS)))
+        self.assertEqual(stats["batch_size_histogram"], {len(self.RUNS): 1})
+
+    @override_settings(PREDICTION_MICROBATCH=True, PREDICTION_CACHE=False)
+    def test_concurrent_async_requests_share_one_call(self):
+        async def requests():
+            return await asyncio.gather(*(prediction_cache.apredict(*run) for run in self.RUNS))
+
+        self.assertEqual(list(async_to_sync(requests)()), self.expected())
+        self.assertEqual(len(self.calls), 1)
+
+    def test_a_failed_call_answers_every_caller(self):
+        self.batcher.predict_batch = mock.Mock(side_effect=RuntimeError("forest unavailable"))
+        self.batcher.max_rows = 2
+        futures = [self.batcher.enqueue(run) for run in self.RUNS[:2]]
+        self.assertEqual([f.result(10) for f in futures], [{"error": "forest unavailable"}] * 2)
+
+    @override_settings(PREDICTION_MICROBATCH=False, PREDICTION_CACHE=False)
+    def test_disabled_predicts_directly(self):
+        with mock.patch.object(self.batcher, "enqueue", wraps=self.batcher.enqueue) as enqueue:
+            self.assertEqual([batching.predict(*run) for run in self.RUNS[:2]], self.expected()[:2])
+
+            async def request():
+                return await prediction_cache.apredict(*self.RUNS[2])
+
+            self.assertEqual(async_to_sync(request)(), self.expected()[2])
+        enqueue.assert_not_called()
+        self.assertEqual(self.calls, [])
+
+    @override_settings(PREDICTION_MICROBATCH=True)
+    def test_enabled_routes_through_the_batcher(self):
+        self.batcher.max_rows = 1
+        self.assertEqual(batching.predict(*self.RUNS[0]), self.expected()[0])
+        self.assertEqual(self.calls, [[self.RUNS[0]]])
+
+
+# ==============================
+# PREDICTION CACHE
+# ==============================
+def _shared_caches(backend, location=""):
+    return {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "predictions": {"BACKEND": backend, "LOCATION": location},
+    }
+
+
+class PredictionCacheTests(ModelMixin, SimpleTestCase):
+    """The local LRU and the shared second level, with the locmem and file backends."""
+
+    RUN = (300.0, 45.0, 800.0, 5.0, 0.9, 5.0)
+    OTHER = (420.0, 50.0, 850.0, 3.0, 0.8, 4.0)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backends = {
+            "locmem": _shared_caches("django.core.cache.backends.locmem.LocMemCache", "predictions"),
+            "file": _shared_caches("django.core.cache.backends.filebased.FileBasedCache", directory.name),
+        }
+        patcher = mock.patch.object(prediction_cache.cache, "alias", "predictions")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def each_backend(self):
+        """Run the calling test's body once per shared backend, from an empty cache."""
+        for name, backend in self.backends.items():
+            with self.subTest(backend=name), override_settings(PREDICTION_CACHE=True, CACHES=backend):
+                caches["predictions"].clear()
+                prediction_cache.cache.clear()
+                prediction_cache.cache.hits = prediction_cache.cache.shared_hits = prediction_cache.cache.misses = 0
+                yield
+
+    def counts(self):
+        stats = prediction_cache.cache.stats()
+        return stats["hits"], stats["shared_hits"], stats["misses"]
+
+    def test_repeat_request_is_a_hit(self):
+        for _ in self.each_backend():
+            first = prediction_cache.predict_batch([self.RUN])
+            self.assertEqual(self.counts(), (0, 0, 1))
+            self.assertEqual(prediction_cache.predict_batch([self.RUN]), first)
+            self.assertEqual(self.counts(), (1, 0, 1))
+
+            # Another worker (its own, empty LRU) finds the entry in the shared backend.
+            prediction_cache.cache.clear()
+            self.assertEqual(prediction_cache.predict_batch([self.RUN]), first)
+            self.assertEqual(self.counts(), (1, 1, 1))
+
+    def test_quantized_inputs_share_an_entry(self):
+        for _ in self.each_backend():
+            nearby = (self.RUN[0] + 0.001, self.RUN[1], self.RUN[2] + 0.004, *self.RUN[3:])
+            key = prediction_cache.cache.key(self.VERSION, self.RUN)
+            self.assertEqual(prediction_cache.cache.key(self.VERSION, nearby), key)
+
+            first = prediction_cache.predict_batch([self.RUN])
+            self.assertEqual(prediction_cache.predict_batch([nearby]), first)
+            self.assertEqual(self.counts(), (1, 0, 1))
+            further = (self.RUN[0] + 0.1, *self.RUN[1:])
+            prediction_cache.predict_batch([further])
+            self.assertEqual(self.counts(), (1, 0, 2))
+
+    def test_new_model_version_invalidates(self):
+        for i, _ in enumerate(self.each_backend()):
+            old = prediction_cache.predict_batch([self.RUN])
+            loaded = self.publish(f"2026010200000{i}", seed=7 + i)
+            # The swap emptied the LRU, and shared entries are keyed by version.
+            self.assertEqual(prediction_cache.cache.stats()["entries"], 0)
+            new = prediction_cache.predict_batch([self.RUN])
+            self.assertEqual(self.counts(), (0, 0, 2))
+            self.assertEqual(new["model_version"], loaded.version)
+            self.assertNotEqual(new["predicted_yield"], old["predicted_yield"])
+
+    def test_batch_with_hits_and_misses(self):
+        for _ in self.each_backend():
+            prediction_cache.predict_batch([self.RUN])
+            batch = prediction_cache.predict_batch([self.OTHER, self.RUN])
+            self.assertEqual(self.counts(), (1, 0, 2))
+            exact = predict_yield_batch([self.OTHER, self.RUN], uncertainty=True)
+            self.assertEqual(batch, exact)
+
+
+# ==============================
+# AGENT PREDICTIONS
+# ==============================
+class KeysetPaginationTests(TestCase):
+    URL = "/agent-predictions/?limit=3"
+
+    def setUp(self):
+        self.agent = _agent()
+        start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        # Two pairs share a timestamp, so the id tiebreak is exercised across page boundaries.
+        times = [start + timedelta(minutes=i // 2 if i < 4 else i) for i in range(10)]
+        save_predictions([_record(self.agent, bauxite_mass=300 + i) for i in range(10)], created_at=times)
+
+    def _expected(self):
+        return list(ProductionRecord.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def _page(self, cursor=None):
+        response = self.client.get(self.URL + (f"&cursor={cursor}" if cursor else ""))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [row["id"] for row in data["results"]], data["next_cursor"]
+
+    def test_cursor_round_trip(self):
+        seen, cursor = [], None
+        while True:
+            ids, cursor = self._page(cursor)
+            self.assertLessEqual(len(ids), 3)
+            seen += ids
+            if cursor is None:
+                break
+        self.assertEqual(seen, self._expected())
+
+    def test_pages_are_stable_when_rows_are_inserted(self):
+        expected = self._expected()
+        first, cursor = self._page()
+        save_predictions([_record(self.agent, bauxite_mass=900 + i) for i in range(5)])  # newer than every page
+
+        seen = first
+        while cursor:
+            ids, cursor = self._page(cursor)
+            seen += ids
+        self.assertEqual(seen, expected)
+
+        # A fresh first page starts at the new rows.
+        self.assertEqual(self._page()[0], self._expected()[:3])
+
+    def test_malformed_cursor_is_rejected(self):
+        def encode(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode()
+
+        for cursor in ("abc", encode("no separator"), encode("not-a-date|5"), encode("2026-03-01T00:00:00|x")):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"{self.URL}&cursor={cursor}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+
+# ==============================
+# PASSWORD HASHING
+# ==============================
+class PasswordHashingTests(TestCase):
+    LOGIN = {"email": "agent0@plant.test", "password": "correct horse"}
+
+    def setUp(self):
+        self.user = _agent()
+        self.user.password = hashers.make_password(self.LOGIN["password"])
+        self.user.save()
+
+    def _login(self):
+        return self.client.post("/login/", self.LOGIN, content_type="application/json")
+
+    def test_full_pool_answers_429(self):
+        pool = hashing.HashPool(workers=1, max_pending=1)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        busy = threading.Thread(target=pool.submit, args=(release.wait,))
+        busy.start()
+        while pool.stats()["pending"] < 1:
+            time.sleep(0.001)
+
+        with mock.patch.object(hashing, "pool", pool):
+            response = self._login()
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response["Retry-After"], str(hashing.RETRY_AFTER))
+            register = {"name": "New", "email": "new@plant.test", "password": "secret123"}
+            self.assertEqual(self.client.post("/register/", register, content_type="application/json").status_code, 429)
+            self.assertEqual(pool.stats()["rejected"], 2)
+
+            release.set()
+            busy.join()
+            self.assertEqual(self._login().status_code, 200)
+        self.assertFalse(AluminumUser.objects.filter(email="new@plant.test").exists())
+
+    def test_login_upgrades_a_legacy_hash(self):
+        legacy = hashers.make_password(self.LOGIN["password"], hasher="pbkdf2_sha1")
+        AluminumUser.objects.filter(pk=self.user.pk).update(password=legacy)
+
+        self.assertEqual(self._login().status_code, 200)
+        upgraded = AluminumUser.objects.get(pk=self.user.pk).password
+        self.assertTrue(upgraded.startswith("scrypt$"), upgraded)
+        self.assertTrue(hashers.check_password(self.LOGIN["password"], upgraded))
+
+        # The new hash is current, so the next login leaves it alone.
+        self.assertEqual(self._login().status_code, 200)
+        self.assertEqual(AluminumUser.objects.get(pk=self.user.pk).password, upgraded)
+
+    def test_wrong_password_is_not_rehashed(self):
+        legacy = hashers.make_password(self.LOGIN["password"], hasher="pbkdf2_sha1")
+        AluminumUser.objects.filter(pk=self.user.pk).update(password=legacy)
+        response = self.client.post("/login/", {**self.LOGIN, "password": "wrong"}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(AluminumUser.objects.get(pk=self.user.pk).password, legacy)
+
+
+# ==============================
+# ACCESS TOKENS
+# ==============================
+class AccessTokenTests(ModelMixin, TestCase):
+    RUN = BatchPredictionTests.RUN
+
+    def setUp(self):
+        auth.principals.clear()
+        self.holder = _agent(1)
+        self.other = _agent(0)  # the agent RUN names by email
+        self.token = auth.issue_token(self.holder)
+
+    def _predict(self, token, path="/predict_production/", body=None):
+        return self.client.post(
+            path, body or self.RUN, content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def test_login_token_attributes_predictions_to_its_holder(self):
+        self.holder.password = hashers.make_password("secret123")
+        self.holder.save()
+        login = self.client.post("/login/", {"email": self.holder.email, "password": "secret123"},
+                                 content_type="application/json").json()
+        self.assertEqual(auth.read_token(RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {login['token']}")),
+                         (self.holder.id, "agent"))
+
+        self.assertEqual(self._predict(login["token"]).status_code, 200)
+        self.assertEqual(self._predict(login["token"], "/predict_production/batch/", [self.RUN]).status_code, 200)
+        self.assertEqual(list(ProductionRecord.objects.values_list("agent_id", flat=True)), [self.holder.id] * 2)
+
+    def test_bad_tokens_answer_401(self):
+        payload, timestamp, signature = self.token.rsplit(":", 2)
+        other_payload = auth.issue_token(self.other).split(":")[0]
+        cases = {
+            "tampered signature": f"{payload}:{timestamp}:{signature[:-1]}{'B' if signature.endswith('A') else 'A'}",
+            "swapped payload": f"{other_payload}:{timestamp}:{signature}",
+            "wrong salt": auth.signing.dumps({"id": self.holder.id, "role": "agent"}, salt="another salt"),
+            "garbage": "not-a-token",
+        }
+        for name, token in cases.items():
+            for path, body in (("/predict_production/", None), ("/predict_production/batch/", [self.RUN])):
+                with self.subTest(name, path=path):
+                    response = self._predict(token, path, body)
+                    self.assertEqual(response.status_code, 401)
+                    self.assertIn("Bearer", response["WWW-Authenticate"])
+
+        with mock.patch.object(auth, "TOKEN_TTL", -1):
+            response = self._predict(self.token)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("expired", response.json()["error"])
+
+        self.holder.is_approved = False
+        self.holder.save()
+        auth.principals.clear()
+        self.assertEqual(self._predict(self.token).status_code, 401)
+
+        self.assertFalse(ProductionRecord.objects.exists())
+
+    def test_authenticated_requests_make_no_user_query(self):
+        self._predict(self.token)  # fills the principal cache
+        for path, body in (("/predict_production/", None), ("/predict_production/batch/", [self.RUN])):
+            with self.subTest(path=path), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self._predict(self.token, path, body).status_code, 200)
+            users = [q["sql"] for q in queries if AluminumUser._meta.db_table in q["sql"]]
+            self.assertEqual(users, [])
+        self.assertEqual(ProductionRecord.objects.filter(agent=self.holder).count(), 3)
+
+        # Without a token the email lookup is cached the same way.
+        self.client.post("/predict_production/", self.RUN, content_type="application/json")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/predict_production/", self.RUN, content_type="application/json")
+        self.assertFalse([q for q in queries if AluminumUser._meta.db_table in q["sql"]])
+
+
+# ==============================
+# DASHBOARD COUNTS
+# ==============================
+class DashboardCountQueryTests(TestCase):
+    """Each count endpoint is one aggregate query however many rows it covers."""
+
+    def setUp(self):
+        agents = [_agent(i, approved=i % 3 != 0) for i in range(6)]
+        AluminumUser.objects.create(name="Scrap", email="scrap@plant.test", password="-", role="scrap_team")
+        save_predictions([_record(agents[i % 6], bauxite_mass=300 + i) for i in range(30)])
+
+    def test_users_count_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/users-count/")
+        data = response.json()
+        self.assertEqual(data["agents"], 4)
+        self.assertEqual(data["by_role"]["agent"], {"approved": 4, "pending": 2})
+        self.assertEqual(data["by_role"]["scrap_team"], {"approved": 0, "pending": 1})
+
+    def test_byproduct_summary_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = _call(views.byproduct_summary, "/byproducts/summary/")
+        self.assertEqual(response.status_code, 200)
+
+        # Served through the URL, the version lookup behind its ETag is the only addition.
+        with self.assertNumQueries(2):
+            response = self.client.get("/byproducts/summary/")
+        data = response.json()
+        self.assertEqual(data["counts"]["received"], 30)
+        self.assertAlmostEqual(data["total_quantity_kg"], sum(ByProduct.objects.values_list("quantity_kg", flat=True)))
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/byproducts/summary/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_admin_summary_query_count(self):
+        # Approved users, the all-time rollup row and the recent records (agents joined).
+        with self.assertNumQueries(3):
+            response = _call(views.admin_summary, "/admin-summary/")
+        self.assertEqual(response.status_code, 200)
+
+        save_predictions([_record(AluminumUser.objects.first(), bauxite_mass=500 + i) for i in range(30)])
+        with self.assertNumQueries(4):
+            response = self.client.get("/admin-summary/")
+        data = response.json()
+        self.assertEqual(data["total_users"], 4)
+        self.assertEqual(data["total_predictions"], 60)
+        self.assertEqual(len(data["recent_records"]), 20)
+
+
+# ==============================
+# BY-PRODUCTS
+# ==============================
+class ByProductQueryTests(TestCase):
+    """The by-product endpoints cost the same queries for 1 row as for N, with or without the source."""
+
+    # byproducts: the ETag version lookup plus the list. last-processed: one probe per processed status.
+    ENDPOINTS = (("/byproducts/", 2), ("/byproducts/last/", 1), ("/byproducts/last-processed/", 2))
+
+    def setUp(self):
+        self.agent = _agent()
+
+    def _seed(self, n):
+        byproducts = save_predictions([_record(self.agent, bauxite_mass=300 + i) for i in range(n)])
+        ByProduct.objects.filter(pk__in=[b.pk for b in byproducts[::2]]).update(status="used")
+        ByProduct.objects.filter(pk__in=[b.pk for b in byproducts[1::2]]).update(status="in_process")
+
+    def _check(self, rows):
+        for path, queries in self.ENDPOINTS:
+            for query in ("", "?include=source"):
+                with self.subTest(path=path + query, rows=rows), self.assertNumQueries(queries):
+                    data = self.client.get(path + query).json()
+                if path == "/byproducts/":
+                    self.assertEqual(len(data), rows)
+                    data = data[0]
+                self.assertIsNotNone(data["source_prediction_id"])
+                if query:
+                    self.assertEqual(data["source_prediction"]["agent_email"], self.agent.email)
+                else:
+                    self.assertNotIn("source_prediction", data)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self._seed(1)
+        self._check(1)
+        self._seed(49)
+        self._check(50)
+
+
+# ==============================
+# LIST FORMATS
+# ==============================
+# Export column -> agent-predictions field, for the numeric columns
+EXPORTED_NUMBERS = {
+    "bauxite_mass": "bauxite_mass", "caustic_soda_conc": "caustic_soda_conc", "temperature": "temperature",
+    "pressure": "pressure", "purity": "purity", "reaction_time": "reaction_time",
+    "predicted_aluminum": "predicted_yield", "predicted_byproduct": "predicted_byproduct",
+    "predicted_aluminum_std": "predicted_yield_std", "predicted_aluminum_low": "predicted_yield_low",
+    "predicted_aluminum_high": "predicted_yield_high",
+}
+
+
+class ListFormatTests(TestCase):
+    """Every list and export format carries the same rows; "objects" bodies are the per-row JsonResponse bytes."""
+
+    def setUp(self):
+        agent = AluminumUser.objects.create(
+            name="Agent Ünal", email="unal@plant.test", password="-", role="agent", is_approved=True,
+        )
+        records = save_predictions([
+            _record(agent, bauxite_mass=312.5, predicted_aluminum_std=1e-05, predicted_aluminum_low=29.99,
+                    predicted_aluminum_high=30.01),
+            _record(None, bauxite_mass=287.25),
+        ])
+        ProductionRecord.objects.filter(pk=records[0].source_prediction_id).update(
+            created_at=datetime(2026, 3, 4, 5, 6, 7, 891011, tzinfo=dt_timezone.utc)
+        )
+        ByProduct.objects.create(quantity_kg=12.5, percent_of_total=3.25, remarks="Manual entry – no run")
+
+    def each_encoder(self):
+        """Run the calling test's body once per installed JSON encoder."""
+        encoders = [serializers.StdlibEncoder()]
+        if serializers.orjson is not None:
+            encoders.append(serializers.OrjsonEncoder())
+        for encoder in encoders:
+            with self.subTest(encoder=encoder.name), mock.patch.object(serializers, "encoder", encoder):
+                yield
+
+    def _get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_objects_are_the_per_row_output(self):
+        # What the views serialized before the column path: .values() dicts, one row at a time.
+        predictions = [
+            prediction_row(r)
+            for r in ProductionRecord.objects.order_by("-created_at", "-id").values(*PREDICTION_COLUMNS)
+        ]
+        self.assertIn("\\u00dc", json.dumps(predictions))
+        self.assertIn("1e-05", json.dumps(predictions))
+        for _ in self.each_encoder():
+            self.assertEqual(
+                self._get("/agent-predictions/?limit=50"),
+                JsonResponse({"results": predictions, "next_cursor": None}).content,
+            )
+            self.assertEqual(
+                self._get("/agent-predictions/"), ("[" + ",".join(json.dumps(r) for r in predictions) + "]").encode()
+            )
+            self.assertEqual(
+                self._get("/agent-predictions/?stream=ndjson"), "".join(json.dumps(r) + "\n" for r in predictions).encode()
+            )
+            for include_source in (False, True):
+                items = byproduct_values(ByProduct.objects.order_by("-created_at"), include_source)
+                expected = JsonResponse([byproduct_row(r, include_source) for r in items], safe=False).content
+                self.assertEqual(self._get("/byproducts/?include=source" if include_source else "/byproducts/"), expected)
+
+    def test_columnar_formats_hold_the_objects(self):
+        def from_rows(data):
+            return [dict(zip(data["columns"], row)) for row in data["rows"]]
+
+        def from_columns(data):
+            return [dict(zip(data, row)) for row in zip(*data.values())]
+
+        for _ in self.each_encoder():
+            objects = json.loads(self._get("/agent-predictions/?limit=50"))["results"]
+            rows = json.loads(self._get("/agent-predictions/?limit=50&format=rows"))["results"]
+            columns = json.loads(self._get("/agent-predictions/?limit=50&format=columns"))["results"]
+            self.assertEqual(from_rows(rows), objects)
+            self.assertEqual(from_columns(columns), objects)
+            self.assertEqual(from_rows(json.loads(self._get("/agent-predictions/?format=rows"))), objects)
+
+            objects = json.loads(self._get("/byproducts/"))
+            self.assertEqual(from_rows(json.loads(self._get("/byproducts/?format=rows"))), objects)
+            self.assertEqual(from_columns(json.loads(self._get("/byproducts/?format=columns"))), objects)
+
+    def test_decimal_none_and_datetime_values(self):
+        # values_list() tuples as a backend returning Decimal (and NULL uncertainty) would give them
+        created = datetime(2026, 3, 4, 5, 6, 7, 891011, tzinfo=dt_timezone.utc)
+        rows = [
+            (2, None, None, Decimal("312.50"), 40.0, 800.0, 5.0, 0.9, 5.0, Decimal("30.125"), 15.6, None, None, None,
+             created),
+            (1, "unal@plant.test", "Agent Ünal", 287.25, 40.0, 800.0, 5.0, 0.9, 5.0, 30.0, 15.6, 1e-05, 29.99, 30.01,
+             created - timedelta(days=400)),
+        ]
+        predictions = [prediction_row(dict(zip(PREDICTION_COLUMNS, r))) for r in rows]
+        expected = JsonResponse(predictions, safe=False).content
+        self.assertEqual(predictions[0]["created_at"], "2026-03-04 05:06")
+
+        for _ in self.each_encoder():
+            columns = serializers.prediction_columns(rows)
+            self.assertEqual(serializers.dumps_objects(serializers.render(PREDICTION_FIELDS, columns)), expected)
+            for fmt in ("rows", "columns"):
+                body = serializers.encoder.dumps(serializers.render(PREDICTION_FIELDS, columns, fmt))
+                data = json.loads(body)
+                values = data["rows"] if fmt == "rows" else list(zip(*data.values()))
+                self.assertEqual([dict(zip(PREDICTION_FIELDS, v)) for v in values], json.loads(expected))
+
+    def _check_export(self, exported, parse_created_at):
+        objects = {r["id"]: r for r in json.loads(self._get("/agent-predictions/?limit=50"))["results"]}
+        self.assertEqual(sorted(int(row["id"]) for row in exported), sorted(objects))
+        for row in exported:
+            obj = objects[int(row["id"])]
+            for column, field in EXPORTED_NUMBERS.items():
+                value = row[column]
+                self.assertEqual(None if value in (None, "") else float(value), obj[field], column)
+            self.assertEqual(row["agent_email"] or "unknown", obj["email"])
+            self.assertEqual(parse_created_at(row["created_at"]).strftime(DATE_FORMAT), obj["created_at"])
+
+    def test_csv_export_holds_the_same_rows(self):
+        body = self._get("/export/production/?format=csv").decode()
+        self._check_export(list(csv.DictReader(io.StringIO(body))), datetime.fromisoformat)
+
+    @skipIf(exports.pa is None, "pyarrow is not installed")
+    def test_parquet_export_holds_the_same_rows(self):
+        table = exports.pq.read_table(io.BytesIO(self._get("/export/production/?format=parquet")))
+        self._check_export(table.to_pylist(), lambda value: value)
+
+
+# ==============================
+# EVENTS
+# ==============================
+def _sse_fields(chunk):
+    """An SSE message as {"id", "event", "data"} (data decoded from JSON)."""
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    fields["id"] = int(fields["id"])
+    fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+class EventTests(TestCase):
+    """Committed changes reach connected streams, and a reconnect replays what it missed."""
+
+    def setUp(self):
+        self.agent = _agent()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backends = {
+            "memory": lambda size: events.MemoryBackend(size=size),
+            "sqlite": lambda size: events.SQLiteBackend(f"{directory.name}/events-{size}.sqlite3", size=size),
+        }
+
+    def each_hub(self, size=100):
+        """Run the calling test's body once per event backend, with a fresh hub."""
+        for name, backend in self.backends.items():
+            with self.subTest(backend=name), mock.patch.object(
+                events, "hub", events.Hub(backend(size), poll_interval=0.01)
+            ):
+                yield events.hub
+
+    def _update(self, byproduct, status):
+        published = events.hub.backend.latest_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f"/byproducts/update-status/{byproduct.pk}/", json.dumps({"status": status}),
+                content_type="application/json",
+            )
+            # Nothing is published until the transaction commits.
+            self.assertEqual(events.hub.backend.latest_id(), published)
+
+    async def _stream(self, last_id=None):
+        """The event stream's chunks, as a client connecting with `last_id` would read them."""
+        headers = {"HTTP_LAST_EVENT_ID": str(last_id)} if last_id is not None else {}
+        response = await unwrap(views.byproduct_events)(RequestFactory().get("/byproducts/events/", **headers))
+        return aiter(response.streaming_content)
+
+    def test_committed_update_reaches_subscriber(self):
+        for _ in self.each_hub():
+            byproduct = save_predictions([_record(self.agent)])[0]
+            async def listen():
+                chunks = await self._stream()
+                # The stream subscribes before it sends its retry line.
+                self.assertEqual(await anext(chunks), b"retry: 2000\n\n")
+                await sync_to_async(self._update)(byproduct, "used")
+                try:
+                    return await asyncio.wait_for(anext(chunks), 5)
+                finally:
+                    await chunks.aclose()
+
+            event = _sse_fields(async_to_sync(listen)())
+            self.assertEqual(event["event"], "byproduct.status")
+            self.assertEqual(event["data"]["id"], byproduct.pk)
+            self.assertEqual((event["data"]["old_status"], event["data"]["status"]), ("received", "used"))
+
+    def test_reconnect_replays_missed_events(self):
+        for hub in self.each_hub(size=3):
+            byproduct = save_predictions([_record(self.agent)])[0]
+            for status in ("in_process", "used", "received"):
+                self._update(byproduct, status)
+            seen = hub.since(0)[0][0].id
+
+            async def reconnect(last_id):
+                chunks = await self._stream(last_id)
+                replayed = []
+                async for chunk in chunks:
+                    if chunk == b"retry: 2000\n\n":
+                        break
+                    replayed.append(chunk)
+                await chunks.aclose()
+                return replayed
+
+            replayed = [_sse_fields(chunk) for chunk in async_to_sync(reconnect)(seen)]
+            self.assertEqual([e["id"] for e in replayed], [seen + 1, seen + 2])
+            self.assertEqual([e["data"]["status"] for e in replayed], ["used", "received"])
+
+            # Older than the buffer reaches back: told to resync, then given what is left.
+            for status in ("used", "in_process"):
+                self._update(byproduct, status)
+            replayed = async_to_sync(reconnect)(seen)
+            self.assertEqual(replayed[0], b"event: resync\ndata: {}\n\n")
+            self.assertEqual([_sse_fields(chunk)["id"] for chunk in replayed[1:]], [seen + 2, seen + 3, seen + 4])
+
+
+# ==============================
+# CONDITIONAL GET
+# ==============================
+class ConditionalGetTests(TestCase):
+    """List endpoints answer 304 while their tables are unchanged, and a new ETag after any write to them."""
+
+    # path: the tables its ETag is derived from
+    ENDPOINTS = {
+        "/byproducts/": {"byproducts", "users"},
+        "/byproducts/summary/": {"byproducts"},
+        "/agent-predictions/?limit=10": {"production", "users"},
+        "/admin-summary/": {"users", "production"},
+    }
+
+    def setUp(self):
+        self.agents = [_agent(i, approved=i > 0) for i in range(2)]
+        self.byproducts = save_predictions([_record(self.agents[1], bauxite_mass=300 + i) for i in range(5)])
+
+    def _versions(self):
+        return dict(TableVersion.objects.values_list("table", "version"))
+
+    def _etags(self):
+        etags = {}
+        for path in self.ENDPOINTS:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertIn("no-cache", response["Cache-Control"])
+            etags[path] = response["ETag"]
+        return etags
+
+    def test_matching_if_none_match_is_304(self):
+        for path, etag in self._etags().items():
+            # Only the version lookup runs; the view and its serialization are skipped.
+            with self.subTest(path=path), self.assertNumQueries(1):
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+            self.assertEqual(response.content, b"")
+
+        # The query string is part of the ETag.
+        etag = self.client.get("/byproducts/?status=used")["ETag"]
+        self.assertEqual(self.client.get("/byproducts/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_writes_bump_versions_and_etags(self):
+        writes = (
+            ("save predictions", {"production", "byproducts"},
+             lambda: save_predictions([_record(self.agents[1], bauxite_mass=400)])),
+            ("update by-product", {"byproducts"},
+             lambda: self.client.post(f"/byproducts/update-status/{self.byproducts[0].pk}/", '{"status": "used"}',
+                                      content_type="application/json")),
+            ("approve user", {"users"}, lambda: self.client.post(f"/approve-user/{self.agents[0].pk}/")),
+            ("reject user", {"users", "production"}, lambda: self.client.post(f"/reject-user/{self.agents[0].pk}/")),
+        )
+        for name, tables, write in writes:
+            with self.subTest(write=name):
+                before, etags = self._versions(), self._etags()
+                write()
+                after = self._versions()
+                self.assertEqual({t for t in after if after[t] != before.get(t)}, tables)
+                for t in tables:
+                    self.assertEqual(after[t], before.get(t, 0) + 1)
+
+                for path, etag in etags.items():
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                    if self.ENDPOINTS[path] & tables:
+                        self.assertEqual(response.status_code, 200, path)
+                        self.assertNotEqual(response["ETag"], etag)
+                    else:
+                        self.assertEqual(response.status_code, 304, path)
+
+
+# ==============================
+# ROLLUPS
+# ==============================
+def _rollup_state():
+    production = {
+        (r.period, r.key): (r.count, round(r.sum_bauxite_mass, 6), round(r.sum_predicted_aluminum, 6))
+        for r in ProductionRollup.objects.all()
+    }
+    byproducts = {r.status: (r.count, round(r.quantity_kg, 6)) for r in ByProductStatusRollup.objects.all()}
+    return production, byproducts
+
+
+class RollupTests(TestCase):
+    """Incremental maintenance, rebuild() and the migration backfill must all agree."""
+
+    def setUp(self):
+        self.agents = [_agent(i) for i in range(3)]
+        byproducts = save_predictions([_record(self.agents[i % 3], bauxite_mass=300 + i) for i in range(12)])
+        self.client.post(
+            f"/byproducts/update-status/{byproducts[0].pk}/", '{"status": "used"}', content_type="application/json"
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = _rollup_state()
+        rollups.rebuild()
+        self.assertEqual(incremental, _rollup_state())
+
+    def test_incremental_matches_rebuild(self):
+        self.assertMatchesRebuild()
+
+    def test_rejected_agent_moves_to_no_agent_bucket(self):
+        self.client.post(f"/reject-user/{self.agents[1].pk}/")
+        self.assertFalse(ProductionRollup.objects.filter(period="agent", key=str(self.agents[1].pk)).exists())
+        self.assertEqual(ProductionRollup.objects.get(period="agent", key=rollups.NO_AGENT).count, 4)
+        self.assertMatchesRebuild()
+
+    def test_migration_backfills_existing_history(self):
+        expected = _rollup_state()
+        ProductionRollup.objects.all().delete()
+        ByProductStatusRollup.objects.all().delete()
+        migration = importlib.import_module("aluminumRec.migrations.0011_productionrollup_byproductstatusrollup")
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(_rollup_state(), expected)
+
+
+# ==============================
+# IMPORTS
+# ==============================
+class ImportResumeTests(ModelMixin, TestCase):
+    """A resumed import, however many workers resume it, stores every row exactly once."""
+
+    ROWS = 10
+
+    def setUp(self):
+        _agent()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/runs.csv"
+        with open(self.path, "w") as f:
+            f.write("bauxite_mass,caustic_soda_conc,temperature,pressure,purity,reaction_time,email\n")
+            for i in range(self.ROWS):
+                f.write(f"{300 + i},40,800,5,{85 if i % 2 else 0.85},5,agent0@plant.test\n")
+
+    def assertImportedOnce(self):
+        masses = sorted(ProductionRecord.objects.values_list("bauxite_mass", flat=True))
+        self.assertEqual(masses, [300 + i for i in range(self.ROWS)])
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.rows_done, checkpoint.rows_imported), (self.ROWS, self.ROWS))
+        self.assertTrue(checkpoint.finished)
+
+    def test_resume_after_a_crash(self):
+        def crash(checkpoint):
+            raise RuntimeError("worker died")
+
+        with self.assertRaises(RuntimeError):
+            imports.import_runs(self.path, chunk_size=3, progress=crash)
+        self.assertEqual(ImportCheckpoint.objects.get().rows_done, 3)
+        self.assertEqual(ProductionRecord.objects.count(), 3)
+
+        imports.import_runs(self.path, chunk_size=3)
+        self.assertImportedOnce()
+
+    def test_concurrent_resume_skips_committed_chunks(self):
+        other = []
+
+        def second_worker(checkpoint):
+            # Another worker resumes the same file (with other chunk boundaries) while this one is mid-file.
+            if not other:
+                other.append(imports.import_runs(self.path, chunk_size=4))
+
+        imports.import_runs(self.path, chunk_size=3, progress=second_worker)
+        self.assertImportedOnce()
+
+    def test_overlapping_chunks_are_split(self):
+        def stop(checkpoint):
+            raise RuntimeError("worker died")
+
+        def second_worker(checkpoint):
+            if checkpoint.rows_done == 3:
+                # Commits rows 3..6 and dies, so this worker's chunk 6..8 is one row done.
+                with self.assertRaises(RuntimeError):
+                    imports.import_runs(self.path, chunk_size=4, progress=stop)
+
+        imports.import_runs(self.path, chunk_size=3, progress=second_worker)
+        self.assertImportedOnce()
+
+
+# ==============================
+# REPORTS
+# ==============================
+class ReportTests(TestCase):
+    URL = "/download-report/?email=a@plant.test&bauxite_mass=300"
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(reports, "REPORT_DIR", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_download_waits_for_the_pdf(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+    @mock.patch.object(views, "REPORT_SYNC_WAIT", 0)
+    def test_failed_render_is_reported_to_pollers(self):
+        started = []
+
+        def fail(path, lines):
+            started.append(path)
+            raise RuntimeError("renderer broke")
+
+        with mock.patch.object(reports, "render_prediction", fail):
+            response = self._poll()
+            self.assertEqual(response.status_code, 500)
+            self.assertIn("renderer broke", response.json()["error"])
+
+            # The failure is kept for the next polls instead of rendering again.
+            self.assertEqual(self.client.get(self.URL).status_code, 500)
+            self.assertEqual(len(started), 1)
+
+            # Once it has expired, the next request renders again.
+            with mock.patch.object(reports, "REPORT_FAILURE_TTL", -1):
+                self.client.get(self.URL)
+            self.assertEqual(self._poll().status_code, 500)
+            self.assertEqual(len(started), 2)
+
+    def _poll(self):
+        """GET until the render has finished, as a client following Retry-After would."""
+        for _ in range(100):
+            response = self.client.get(self.URL)
+            if response.status_code != 202:
+                return response
+            self.assertEqual(response["Location"], "http://testserver" + self.URL)
+            time.sleep(0.02)
+        self.fail("report still pending")
+
+
+# ==============================
+# QUERY PLANS
+# ==============================
+class QueryPlanTests(TestCase):
+    """Every dashboard query shape is served from an index: no sort step, no scan for lookups."""
+
+    @classmethod
+    def setUpTestData(cls):
+        query_plans.seed(2000)
+
+    def test_query_shapes_use_indexes(self):
+        for name, queryset, lookup in query_plans.query_shapes():
+            with self.subTest(name):
+                plan = query_plans.explain(queryset)
+                self.assertEqual(query_plans.problems(plan, queryset, lookup), [], plan)
+
+    def test_query_shapes_are_what_the_views_run(self):
+        shapes = {name: queryset.query.sql_with_params()[0] for name, queryset, _ in query_plans.query_shapes()}
+        email = AluminumUser.objects.filter(role="agent").first().email
+        cursor = self.client.get("/agent-predictions/?limit=1").json()["next_cursor"]
+        reset = RequestFactory().post("/reset-password/", '{"token": "x"}', content_type="application/json")
+        requests = (
+            (lambda: self.client.get("/admin-summary/"), ["admin_summary.totals", "admin_summary.recent"]),
+            (lambda: self.client.get("/production-rollups/?period=day"), ["production_rollups"]),
+            (lambda: self.client.get("/agent-predictions/?limit=100"), ["agent_predictions.page"]),
+            (lambda: self.client.get(f"/agent-predictions/?limit=100&cursor={cursor}"), ["agent_predictions.keyset"]),
+            (lambda: self.client.get(f"/agent-predictions/?limit=100&email={email}"), ["agent_predictions.agent"]),
+            (lambda: self.client.get("/agent-predictions/?limit=100&since=2026-01-01&until=2026-01-31"),
+             ["agent_predictions.range"]),
+            (lambda: self.client.get("/byproducts/"), ["byproducts.all"]),
+            (lambda: self.client.get("/byproducts/?include=source"), ["byproducts.source"]),
+            (lambda: self.client.get("/byproducts/?status=received"), ["byproducts.status"]),
+            (lambda: self.client.get("/byproducts/last/"), ["last_byproduct"]),
+            (lambda: self.client.get("/byproducts/last-processed/"),
+             ["last_processed_byproduct.in_process", "last_processed_byproduct.used"]),
+            (lambda: self.client.get("/byproducts/summary/"), ["byproduct_summary"]),
+            (lambda: self.client.get("/pending-users/"), ["pending_users"]),
+            (lambda: self.client.get("/users-count/"), ["users_count"]),
+            (lambda: self.client.get("/recent-approved-users/"), ["recent_approved_users"]),
+            (lambda: views.reset_password(reset), ["reset_password.token"]),
+        )
+
+        checked = set()
+        for request, names in requests:
+            executed = []
+
+            def record(execute, sql, params, many, context):
+                executed.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record):
+                request()
+            for name in names:
+                with self.subTest(name):
+                    self.assertIn(shapes[name], executed)
+            checked.update(names)
+        # admin_summary.users is run as a COUNT over its queryset.
+        self.assertEqual(checked, set(shapes) - {"admin_summary.users"})
+
+
+# ==============================
+# COMPILED FOREST
+# ==============================
+class CompiledForestTests(SimpleTestCase):
+    """The flat-array forest must reproduce sklearn's predictions bit for bit."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        X = rng.uniform(0, 1, (500, 6))
+        y = 40 * X[:, 4] + 10 * np.sin(6 * X[:, 2]) + rng.normal(0, 1, 500)
+        cls.model = RandomForestRegressor(n_estimators=25, max_depth=10, random_state=0).fit(X, y)
+        cls.X = rng.uniform(-0.2, 1.2, (2000, 6))  # includes values outside the training range
+
+    def _check(self, use_numba):
+        compiled = forest.CompiledForest.from_model(self.model, use_numba=use_numba)
+        self.assertEqual(compiled.use_numba, use_numba)
+        self.assertTrue(np.array_equal(compiled.predict(self.X), self.model.predict(self.X)))
+
+    def test_numpy_matches_sklearn(self):
+        self._check(use_numba=False)
+
+    @skipIf(forest.numba is None, "numba is not installed")
+    def test_numba_matches_sklearn(self):
+        self._check(use_numba=True)
+
+
+# ==============================
+# TRAINING
+# ==============================
+class HistoryTrainingTests(TestCase):
+    """History training must fit measured yields, never the model's own predictions."""
+
+    def test_requires_a_target(self):
+        with self.assertRaisesMessage(CommandError, "--target"):
+            call_command("train_model", "--source", "history")
+
+    def test_refuses_predictions_and_inputs(self):
+        for target in ("predicted_aluminum", "predicted_byproduct", "ore_quality", "measured_yield"):
+            with self.subTest(target=target), self.assertRaises(CommandError):
+                call_command("train_model", "--source", "history", "--target", target)
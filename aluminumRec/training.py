@@ -0,0 +1,257 @@
+"""
+Training pipeline behind `manage.py train_model`.
+
+A run builds a feature matrix (the original synthetic dataset, or the
+ProductionRecord history read in keyset chunks straight into a float32
+array), fits the forest on all cores, optionally growing the current model
+with warm_start instead of starting over, scores it on a holdout split and
+publishes a new version next to the old ones in the registry's directory:
+
+    artifacts/aluminum_yield_meta-<version>.json    schema, metrics, checksums
+    artifacts/aluminum_yield_forest-<version>.pkl   flat tree arrays + schema
+    artifacts/aluminum_yield_model-<version>.pkl    sklearn estimator
+
+Serving is never disturbed: every file is written under a temporary name and
+renamed into place, metadata first, so the registry only ever sees complete,
+checksummed versions and keeps serving the previous one until then.
+
+History training needs a column of measured yields to fit (the `target`).
+ProductionRecord has none yet: predicted_aluminum is the served model's own
+output, and fitting it would only teach the new model to copy the old one, so
+it is refused until such a column exists.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.core.exceptions import FieldDoesNotExist
+from sklearn.ensemble import RandomForestRegressor
+
+from . import schema
+from .forest import CompiledForest, export_forest
+from .models import ProductionRecord
+from .registry import forest_path_for, meta_path_for, model_path_for, registry
+
+# ProductionRecord field for each schema column
+HISTORY_FIELDS = {"purity": "ore_quality"}
+HISTORY_CHUNK_SIZE = 50000
+
+N_ESTIMATORS = 200
+RANDOM_STATE = 42
+
+
+# ==============================
+# DATASETS
+# ==============================
+def synthetic_dataset(n=2500, seed=42):
+    """The simulated aluminum extraction dataset the first model was trained on."""
+    np.random.seed(seed)
+    data = pd.DataFrame({
+        "bauxite_mass": np.random.uniform(100, 500, n),
+        "caustic_soda_conc": np.random.uniform(30, 60, n),
+        "temperature": np.random.uniform(700, 900, n),
+        "pressure": np.random.uniform(1, 10, n),
+        "reaction_time": np.random.uniform(3, 7, n),
+        "purity": np.random.uniform(0.7, 1.0, n)
+    })
+
+    # yield roughly increases with purity, temperature and caustic concentration
+    data["yield_kg"] = (
+        0.02 * data["bauxite_mass"]
+        + 0.3 * data["caustic_soda_conc"]
+        + 0.05 * (data["temperature"] - 700)
+        + 0.5 * np.exp(-((data["reaction_time"] - 5)**2)/2)
+        + 5 * data["purity"]
+        - 0.2 * data["pressure"]
+        + np.random.normal(0, 10, n)
+    )
+
+    return data[list(schema.NAMES)].to_numpy(dtype=np.float32), data["yield_kg"].to_numpy()
+
+
+def history_target(name):
+    """
+    Check that `name` is a ProductionRecord column of measured yields that
+    history training may fit; raises ValueError otherwise.
+    """
+    features = {HISTORY_FIELDS.get(n, n) for n in schema.NAMES}
+    try:
+        field = ProductionRecord._meta.get_field(name)
+    except FieldDoesNotExist:
+        raise ValueError(f"ProductionRecord has no field {name!r}")
+    if name.startswith("predicted_") or name in features or field.get_internal_type() != "FloatField":
+        raise ValueError(
+            f"{name!r} is not a measured yield; training on the model's own predictions "
+            f"or on an input would only reproduce the current model"
+        )
+    return name
+
+
+def history_dataset(target, since=None, chunk_size=HISTORY_CHUNK_SIZE):
+    """
+    ProductionRecord history as (X float32, y float64) with y taken from the
+    measured-yield column `target` (see history_target()), read in bounded
+    keyset chunks on id and copied into preallocated arrays. Records without
+    a measurement are skipped.
+    """
+    qs = ProductionRecord.objects.filter(**{f"{history_target(target)}__isnull": False}).order_by("id")
+    if since is not None:
+        qs = qs.filter(created_at__gte=since)
+
+    # Records saved while reading are left for the next run.
+    n = qs.count()
+    lookups = [HISTORY_FIELDS.get(name, name) for name in schema.NAMES]
+    qs = qs.values_list("id", *lookups, target)
+
+    X = np.empty((n, len(schema.NAMES)), dtype=np.float32)
+    y = np.empty(n, dtype=np.float64)
+    filled = 0
+    last_id = 0
+    while filled < n:
+        rows = list(qs.filter(id__gt=last_id)[:min(chunk_size, n - filled)])
+        if not rows:
+            break
+        block = np.asarray(rows, dtype=np.float64)
+        X[filled:filled + len(block)] = block[:, 1:-1]
+        y[filled:filled + len(block)] = block[:, -1]
+        filled += len(block)
+        last_id = rows[-1][0]
+
+    return X[:filled], y[:filled]
+
+
+# ==============================
+# TRAINING
+# ==============================
+def fit(X, y, n_estimators=N_ESTIMATORS, n_jobs=-1, max_samples=None, base_model=None, random_state=RANDOM_STATE):
+    """
+    Fit a new forest, or grow `base_model` by `n_estimators` more trees
+    (warm_start keeps the existing trees and fits only the new ones).
+    """
+    if base_model is not None:
+        model = base_model
+        model.set_params(
+            warm_start=True,
+            n_estimators=len(model.estimators_) + n_estimators,
+            n_jobs=n_jobs,
+            max_samples=max_samples,
+        )
+    else:
+        model = RandomForestRegressor(
+            n_estimators=n_estimators, n_jobs=n_jobs, max_samples=max_samples, random_state=random_state
+        )
+    model.fit(X, y)
+    # Served predictions are single-threaded; keep the pickled estimator that way too.
+    model.set_params(n_jobs=None, warm_start=False)
+    return model
+
+
+def split(X, y, holdout, seed=RANDOM_STATE):
+    """Random train / holdout split (holdout is a fraction; 0 scores on the training rows)."""
+    if not holdout:
+        return X, y, X, y
+    order = np.random.default_rng(seed).permutation(len(X))
+    cut = len(X) - max(1, int(len(X) * holdout))
+    train, test = order[:cut], order[cut:]
+    return X[train], y[train], X[test], y[test]
+
+
+def evaluate(forest, X, y):
+    predicted = forest.predict(X)
+    error = predicted - y
+    total = float(((y - y.mean()) ** 2).sum())
+    return {
+        "rows": int(len(y)),
+        "r2": 1 - float((error ** 2).sum()) / total if total else 0.0,
+        "mae": float(np.abs(error).mean()),
+        "rmse": float(np.sqrt((error ** 2).mean())),
+    }
+
+
+# ==============================
+# ARTIFACTS
+# ==============================
+def new_version():
+    return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def publish(model, version, metadata, directory=None):
+    """
+    Write the model, its forest export and metadata for `version`. Checksums
+    are taken from the temporary files, the metadata is renamed into place
+    first and the forest (which makes the version visible) last but one.
+    """
+    directory = directory or registry.directory
+    os.makedirs(directory, exist_ok=True)
+    model_path = model_path_for(version, directory)
+    forest_path = forest_path_for(version, directory)
+    meta_path = meta_path_for(version, directory)
+    if any(os.path.exists(p) for p in (model_path, forest_path, meta_path)):
+        raise FileExistsError(f"Model version {version} already exists")
+
+    tmp = {path: f"{path}.tmp" for path in (model_path, forest_path, meta_path)}
+    try:
+        joblib.dump(dict(export_forest(model), schema=metadata["features"]), tmp[forest_path])
+        joblib.dump(model, tmp[model_path])
+        metadata = dict(
+            metadata,
+            version=version,
+            sha256={
+                os.path.basename(forest_path): file_sha256(tmp[forest_path]),
+                os.path.basename(model_path): file_sha256(tmp[model_path]),
+            },
+        )
+        with open(tmp[meta_path], "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        for path in (meta_path, forest_path, model_path):
+            os.replace(tmp[path], path)
+    finally:
+        for path in tmp.values():
+            if os.path.exists(path):
+                os.remove(path)
+    return metadata
+
+
+def train(X, y, source, n_estimators=N_ESTIMATORS, n_jobs=-1, max_samples=None, holdout=0.1,
+          base=None, directory=None):
+    """
+    Fit, score and publish one version; `base` is a LoadedModel to warm-start
+    from. Returns the metadata that was written.
+    """
+    X_train, y_train, X_test, y_test = split(X, y, holdout)
+
+    started = time.perf_counter()
+    model = fit(
+        X_train, y_train, n_estimators=n_estimators, n_jobs=n_jobs, max_samples=max_samples,
+        base_model=base.load_estimator() if base is not None else None,
+    )
+    seconds = time.perf_counter() - started
+
+    metrics = evaluate(CompiledForest.from_model(model), X_test, y_test)
+    metrics["split"] = "holdout" if holdout else "train"
+
+    return publish(model, new_version(), {
+        "features": schema.describe(),
+        "source": source,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "training_rows": int(len(X_train)),
+        "training_seconds": round(seconds, 3),
+        "n_estimators": len(model.estimators_),
+        "max_samples": max_samples,
+        "warm_start_from": base.version if base is not None else None,
+        "metrics": metrics,
+    }, directory=directory)
@@ -15,10 +15,14 @@ urlpatterns = [
 
     # ---------------- PREDICTION ----------------
     path("predict_production/", views.predict_production, name="predict_production"),
+    path("predict_production/batch/", views.predict_production_batch, name="predict_production_batch"),
+    path("predict_production/sweep/", views.predict_sweep, name="predict_sweep"),
+    path("prediction-stats/", views.prediction_stats, name="prediction_stats"),
     path("agent-predictions/", views.agent_predictions, name="agent_predictions"),
 
     # ---------------- ADMIN ----------------
     path("admin-summary/", views.admin_summary, name="admin_summary"),
+    path("production-rollups/", views.production_rollups, name="production_rollups"),
     path("users-count/", views.users_count, name="users_count"),
     path("recent-approved-users/", views.recent_approved_users, name="recent_approved_users"),
     path("reject-user/<int:user_id>/", views.reject_user, name="reject_user"),
@@ -31,7 +35,15 @@ urlpatterns = [
     path("byproducts/summary/", views.byproduct_summary, name="byproduct_summary"),
 
     path("byproducts/last-processed/", views.last_processed_byproduct, name="last_processed_byproduct"),
+    path("byproducts/events/", views.byproduct_events, name="byproduct_events"),
 
     # ---------------- PDF DOWNLOAD ----------------
     path("download-report/", views.download_report, name="download_report"),
+    path("reports/summary/", views.summary_report, name="summary_report"),
+    path("reports/<int:record_id>/", views.prediction_report, name="prediction_report"),
+
+    # ---------------- EXPORT / IMPORT ----------------
+    path("export/production/", views.export_production, name="export_production"),
+    path("import-runs/", views.import_runs, name="import_runs"),
+    path("import-runs/<int:import_id>/", views.import_status, name="import_status"),
 ]
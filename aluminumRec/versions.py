@@ -0,0 +1,122 @@
+"""
+Conditional GET for the dashboard list and summary endpoints.
+
+Every write path bumps the TableVersion row of each table it changes ("users",
+"production", "byproducts"), inside its own transaction, next to the rollup
+updates. An endpoint decorated with @conditional(*tables) reads those rows in
+one indexed query and derives:
+
+    ETag           a hash of the path, the query string and the versions
+    Last-Modified  the latest changed_at among the tables
+
+A request whose If-None-Match / If-Modified-Since still matches is answered
+304 before the view runs, so an unchanged dashboard costs that one query and
+no serialization. Fresh responses get the validators, Cache-Control: no-cache
+(so browsers revalidate instead of guessing a freshness lifetime), and are
+compressed when they are large: brotli when the client accepts it and the
+brotli package is installed, gzip otherwise (streaming responses included).
+
+Writes made outside these paths (e.g. the Django admin) don't bump versions;
+run `bump()` or wait for the next ordinary write to invalidate.
+"""
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.db.models import F
+from django.middleware.gzip import GZipMiddleware
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import TableVersion
+
+try:
+    import brotli
+except ImportError:  # optional, responses are gzipped without it
+    brotli = None
+
+COMPRESS_MIN_BYTES = getattr(settings, "RESPONSE_COMPRESS_MIN_BYTES", 1024)
+
+_gzip = GZipMiddleware(lambda request: None)
+
+
+def bump(*tables):
+    """Mark `tables` as changed; call inside the transaction that changes them."""
+    now = timezone.now()
+    updated = TableVersion.objects.filter(table__in=tables).update(version=F("version") + 1, changed_at=now)
+    if updated < len(tables):
+        for table in tables:
+            TableVersion.objects.get_or_create(table=table, defaults={"version": 1, "changed_at": now})
+
+
+def _query(tables):
+    return TableVersion.objects.filter(table__in=tables).values_list("table", "version", "changed_at")
+
+
+def _validators(request, rows):
+    """(etag, last_modified timestamp) for a request given its tables' version rows."""
+    key = [request.path, request.META.get("QUERY_STRING", "")]
+    key += [f"{table}:{version}" for table, version, _ in sorted(rows)]
+    etag = 'W/"%s"' % hashlib.sha1("|".join(key).encode()).hexdigest()[:20]
+    last_modified = max((changed_at for _, _, changed_at in rows), default=None)
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _finish(request, response, etag, last_modified):
+    if response.status_code != 200:
+        return response
+    response.headers.setdefault("ETag", etag)
+    if last_modified:
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+    patch_cache_control(response, no_cache=True)
+    return compress(request, response)
+
+
+def compress(request, response):
+    """brotli or gzip for bodies of at least COMPRESS_MIN_BYTES the client accepts."""
+    if response.has_header("Content-Encoding"):
+        return response
+    if not response.streaming and len(response.content) < COMPRESS_MIN_BYTES:
+        return response
+    accepts = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    if brotli is not None and not response.streaming and "br" in accepts:
+        patch_vary_headers(response, ("Accept-Encoding",))
+        response.content = brotli.compress(response.content)
+        response.headers["Content-Length"] = str(len(response.content))
+        response.headers["Content-Encoding"] = "br"
+        return response
+    return _gzip.process_response(request, response)
+
+
+def conditional(*tables):
+    """
+    Answer GET / HEAD with 304 while `tables` are unchanged; see the module
+    docstring. Works on sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = _validators(request, [row async for row in _query(tables)])
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    return _finish(request, await view(request, *args, **kwargs), etag, last_modified)
+                response.headers["ETag"] = etag
+                return response
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return view(request, *args, **kwargs)
+                etag, last_modified = _validators(request, list(_query(tables)))
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    return _finish(request, view(request, *args, **kwargs), etag, last_modified)
+                response.headers["ETag"] = etag
+                return response
+        return inner
+    return decorator
@@ -1,16 +1,49 @@
-from django.http import JsonResponse, HttpResponse
+from asgiref.sync import sync_to_async
+from concurrent.futures import TimeoutError as FutureTimeout
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import timedelta, datetime
-from reportlab.pdfgen import canvas
-from django.db.models import Sum, Q
+from django.db import transaction
+from django.db.models import Count, Max
+import asyncio
+import base64
+import binascii
 import json
 import pandas as pd
 
-from .models import AluminumUser, ProductionRecord, ByProduct
-from .predictor import predict_yield
+from .models import AluminumUser, ProductionRecord, ByProduct, ImportCheckpoint
+from . import (
+    auth, events, exports, hashing, imports, lookup, queries, reports, rollups, schema, serializers, sweep, versions,
+)
+from .production import build_record, save_predictions
+from .serializers import PREDICTION_COLUMNS, PREDICTION_FIELDS, byproduct_row, byproduct_values, json_response
+from .batching import batcher
+from .predictor import interval as prediction_interval, row as prediction_result_row
+from .prediction_cache import apredict, apredict_approx, cache as prediction_cache, predict_batch as predict_yield_batch
+
+
+async def _alist(queryset):
+    """Evaluate a queryset through the async ORM."""
+    return [row async for row in queryset]
+
+
+def _overloaded():
+    """429 for a request turned away because the password-hashing pool is full."""
+    response = JsonResponse({"error": "Server busy, please retry shortly"}, status=429)
+    response["Retry-After"] = str(hashing.RETRY_AFTER)
+    return response
+
+
+def _unauthorized(error):
+    """401 for a request whose bearer token doesn't verify (auth.InvalidToken)."""
+    response = JsonResponse({"error": str(error)}, status=401)
+    response["WWW-Authenticate"] = 'Bearer error="invalid_token"'
+    return response
 
 
 # =============================================================
@@ -41,13 +74,17 @@ def register(request):
             AluminumUser.objects.create(
                 name=name,
                 email=email,
-                password=make_password(password),
+                password=hashing.pool.make_password(password),
                 role=role,
                 is_approved=False,
             )
+            versions.bump("users")
+            auth.principals.clear()
 
             return JsonResponse({"message": "Registered successfully. Waiting for admin approval."}, status=201)
 
+        except hashing.Overloaded:
+            return _overloaded()
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
@@ -69,8 +106,13 @@ def login(request):
             if not user:
                 return JsonResponse({"error": "User not found"}, status=404)
 
-            if not check_password(password, user.password):
+            # Hashed in the bounded pool; a correct password stored with an
+            # old hasher or cost comes back re-hashed with the preferred one.
+            is_correct, rehashed = hashing.pool.check_password(password, user.password)
+            if not is_correct:
                 return JsonResponse({"error": "Invalid password"}, status=401)
+            if rehashed is not None:
+                AluminumUser.objects.filter(pk=user.pk, password=user.password).update(password=rehashed)
 
             if not user.is_approved:
                 return JsonResponse({"error": "Your account is awaiting admin approval."}, status=403)
@@ -83,9 +125,14 @@ def login(request):
 
             return JsonResponse({
                 "message": f"{user.role.capitalize()} login successful",
-                "redirect": redirect_map[user.role]
+                "redirect": redirect_map[user.role],
+                "token": auth.issue_token(user),
+                "role": user.role,
+                "expires_in": auth.TOKEN_TTL,
             }, status=200)
 
+        except hashing.Overloaded:
+            return _overloaded()
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
@@ -98,7 +145,7 @@ def login(request):
 @csrf_exempt
 @require_http_methods(["GET"])
 def pending_users(request):
-    users = list(AluminumUser.objects.filter(is_approved=False).values("id", "name", "email", "role"))
+    users = list(queries.pending_users())
     return JsonResponse(users, safe=False)
 
 
@@ -109,6 +156,8 @@ def approve_user(request, user_id):
         user = AluminumUser.objects.get(id=user_id)
         user.is_approved = True
         user.save()
+        versions.bump("users")
+        auth.principals.clear()
         return JsonResponse({"message": f"{user.name} approved successfully"})
     except AluminumUser.DoesNotExist:
         return JsonResponse({"error": "User not found"}, status=404)
@@ -144,19 +193,22 @@ def reset_password(request):
             token = data.get('token')
             new_password = data.get('new_password')
 
-            user = AluminumUser.objects.filter(reset_token=token).first()
+            user = queries.user_by_reset_token(token).first()
             if not user:
                 return JsonResponse({"error": "Invalid token"}, status=400)
 
             if timezone.now() - user.token_created_at > timedelta(minutes=10):
                 return JsonResponse({"error": "Token expired"}, status=403)
 
-            user.password = make_password(new_password)
+            user.password = hashing.pool.make_password(new_password)
             user.reset_token = None
             user.token_created_at = None
             user.save()
+            auth.principals.clear()
 
             return JsonResponse({"message": "Password reset successful"})
+        except hashing.Overloaded:
+            return _overloaded()
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
@@ -166,92 +218,221 @@ def reset_password(request):
 # =============================================================
 # ================== ML PREDICTION SAVE ========================
 # =============================================================
+def _flag(request, name, data=None):
+    """?name=1 / ?name=true, or "name": true in the JSON body."""
+    flag = request.GET.get(name, "")
+    return flag.lower() in ("1", "true") or (isinstance(data, dict) and data.get(name) is True)
+
+
+def _wants_uncertainty(request, data=None):
+    return _flag(request, "uncertainty", data)
+
+
+def _spread(record):
+    """Per-tree spread of a saved prediction, as returned when uncertainty is requested."""
+    return {
+        "predicted_yield_std": record.predicted_aluminum_std,
+        "predicted_yield_low": record.predicted_aluminum_low,
+        "predicted_yield_high": record.predicted_aluminum_high,
+        "interval": list(prediction_interval()),
+    }
+
+
+def _approx_results(result):
+    """
+    Per-run results of an approx=true prediction, and the fields describing the
+    approximation. Each run says whether it was interpolated: rows outside the
+    lookup grid are predicted exactly.
+    """
+    exact = set(result.get("exact_rows", ()))
+    results = [
+        {
+            "predicted_yield": predicted_yield,
+            "predicted_byproduct": predicted_byproduct,
+            "model_version": result["model_version"],
+            "approximate": result["approximate"] and i not in exact,
+            "status": "success",
+        }
+        for i, (predicted_yield, predicted_byproduct) in enumerate(
+            zip(result["predicted_yield"], result["predicted_byproduct"])
+        )
+    ]
+    approximation = {"approximate": result["approximate"]}
+    if result["approximate"]:
+        approximation["approx_error"] = result["approx_error"]
+    return results, approximation
+
+
 @csrf_exempt
-def predict_production(request):
+async def predict_production(request):
     """
     Accepts POST JSON with:
     {
       email, bauxite_mass, caustic_soda_conc, temperature, pressure, purity, reaction_time
     }
     Creates a ProductionRecord and also creates a new ByProduct row for every prediction.
+    With "uncertainty": true (or ?uncertainty=1) the response also carries the
+    spread of the individual trees' predictions (std and interval quantiles).
+    With "approx": true (or ?approx=1) the prediction is interpolated from the
+    model's lookup table (see aluminumRec/lookup.py) and returned as a preview
+    without saving anything.
     """
     if request.method == "POST":
         try:
             data = json.loads(request.body)
             email = data.get("email")
-
-            # Validate required numeric fields — if missing will raise ValueError
-            bauxite_mass = float(data.get("bauxite_mass", 0))
-            caustic_soda_conc = float(data.get("caustic_soda_conc", 0))
-            temperature = float(data.get("temperature", 0))
-            pressure = float(data.get("pressure", 0))
-            purity = float(data.get("purity", 0))
-            reaction_time = float(data.get("reaction_time", 1.0))
-
-            # Run ML model
-            result = predict_yield(
-                bauxite_mass,
-                caustic_soda_conc,
-                temperature,
-                pressure,
-                purity,
-                reaction_time
-            )
+            try:
+                run = schema.parse_run(data)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+            if _flag(request, "approx", data) and not _wants_uncertainty(request, data):
+                result = await apredict_approx([run])
+                if "error" in result:
+                    return JsonResponse(result, status=500)
+                results, response = _approx_results(result)
+                response.update(results[0])
+                if not response["approximate"]:
+                    response.pop("approx_error", None)
+                return JsonResponse(response)
+
+            # The token holder, or the agent named by email (may be None if not found)
+            user = await auth.arequest_agent(request, email)
+
+            # Run ML model (on the prediction pool, off the event loop)
+            result = await apredict(*run)
 
             if "error" in result:
                 return JsonResponse(result, status=500)
 
-            # Find agent (may be None if not found)
-            user = AluminumUser.objects.filter(email=email, role="agent").first()
-
             # Create production record (even if user is None, we record it)
-            record = ProductionRecord.objects.create(
-                agent=user,
-                bauxite_mass=bauxite_mass,
-                caustic_soda_conc=caustic_soda_conc,
-                temperature=temperature,
-                pressure=pressure,
-                ore_quality=purity,
-                reaction_time=reaction_time,
-                predicted_aluminum=result["predicted_yield"],
-                predicted_byproduct=result["predicted_byproduct"],
-            )
-
-            # ALWAYS create a NEW ByProduct row for every prediction
-            # This preserves history and allows Scrap Team to see all predictions.
-            ByProduct.objects.create(
-                name="Red Mud",
-                quantity_kg=(result["predicted_byproduct"] / 100.0) * bauxite_mass if bauxite_mass else result["predicted_byproduct"],
-                percent_of_total=result["predicted_byproduct"],
-                status="received",
-                source_prediction=record,
-                assigned_to_email="",
-                assigned_to_name="",
-                remarks="Auto-created from agent prediction"
-            )
+            record = build_record(user, run, result)
+            await sync_to_async(save_predictions)([record])
 
             # Return prediction to frontend (percent values plus status)
-            return JsonResponse({
+            response = {
                 "predicted_yield": result["predicted_yield"],
                 "predicted_byproduct": result["predicted_byproduct"],
                 "status": "success"
-            })
+            }
+            if _wants_uncertainty(request, data):
+                response.update(_spread(record))
+            return JsonResponse(response)
 
+        except auth.InvalidToken as e:
+            return _unauthorized(e)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "Invalid request"}, status=400)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def predict_production_batch(request):
+    """
+    Accepts POST JSON array of runs, each shaped like a predict_production body.
+    Valid runs are predicted with one model call and saved together; invalid
+    runs are reported per index and skipped. ?uncertainty=1 adds each run's
+    per-tree spread to its result. ?approx=1 interpolates the predictions
+    from the lookup table and saves nothing (see predict_production).
+    """
+    try:
+        runs = json.loads(request.body)
+        if not isinstance(runs, list):
+            return JsonResponse({"error": "Expected a JSON array of runs"}, status=400)
+
+        X, invalid = schema.to_matrix(runs)
+        parsed = [(index, data.get("email"), X[index]) for index, data in enumerate(runs) if index not in invalid]
+        errors = [{"index": index, "error": message} for index, message in sorted(invalid.items())]
+
+        results = [None] * len(runs)
+        if parsed and _flag(request, "approx") and not _wants_uncertainty(request):
+            prediction = lookup.predict_approx(X[[index for index, _, _ in parsed]])
+            if "error" in prediction:
+                return JsonResponse(prediction, status=500)
+            approx_results, approximation = _approx_results(prediction)
+            for (index, _, _), result in zip(parsed, approx_results):
+                results[index] = result
+            for err in errors:
+                results[err["index"]] = {"status": "error", "error": err["error"]}
+            return JsonResponse({"results": results, "errors": errors, "created": 0, **approximation})
+
+        if parsed:
+            agents = auth.request_agents(request, [email for _, email, _ in parsed])
+
+            prediction = predict_yield_batch(X[[index for index, _, _ in parsed]])
+            if "error" in prediction:
+                return JsonResponse(prediction, status=500)
+
+            records = [
+                build_record(agents.get(email), run.tolist(), prediction_result_row(prediction, i))
+                for i, (_, email, run) in enumerate(parsed)
+            ]
+
+            save_predictions(records)
+
+            uncertainty = _wants_uncertainty(request)
+            for (index, _, _), record in zip(parsed, records):
+                results[index] = {
+                    "id": record.id,
+                    "predicted_yield": record.predicted_aluminum,
+                    "predicted_byproduct": record.predicted_byproduct,
+                    "model_version": record.model_version,
+                    "status": "success",
+                }
+                if uncertainty:
+                    results[index].update(_spread(record))
+
+        for err in errors:
+            results[err["index"]] = {"status": "error", "error": err["error"]}
+
+        return JsonResponse({
+            "results": results,
+            "errors": errors,
+            "created": len(parsed),
+        })
+
+    except auth.InvalidToken as e:
+        return _unauthorized(e)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def predict_sweep(request):
+    """
+    What-if sweep: evaluates a grid or Latin-hypercube sample of input ranges
+    and returns the best feasible settings plus a binned response surface.
+    Nothing is saved. See aluminumRec/sweep.py for the request format.
+    """
+    try:
+        spec = json.loads(request.body)
+        return JsonResponse(sweep.run_sweep(spec))
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def prediction_stats(request):
+    return JsonResponse({"microbatch": batcher.stats(), "cache": prediction_cache.stats()})
+
+
 # =============================================================
 # ====================== ADMIN SUMMARY ========================
 # =============================================================
 @csrf_exempt
-def admin_summary(request):
-    total_users = AluminumUser.objects.filter(is_approved=True).count()
-    total_predictions = ProductionRecord.objects.count()
-
-    records = ProductionRecord.objects.select_related("agent").order_by("-created_at")[:20]
+@versions.conditional("users", "production")
+async def admin_summary(request):
+    total_users, totals, records = await asyncio.gather(
+        queries.approved_users().acount(),
+        rollups.aproduction_totals(),
+        _alist(queries.recent_records()),
+    )
 
     data = [
         {
@@ -269,16 +450,31 @@ def admin_summary(request):
 
     return JsonResponse({
         "total_users": total_users,
-        "total_predictions": total_predictions,
+        "total_predictions": totals["count"],
+        "averages": {field: totals[f"mean_{field}"] for field in rollups.ROLLUP_FIELDS},
         "recent_records": data
     })
 
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def production_rollups(request):
+    """Per-day or per-agent prediction totals and means (?period=day|agent)."""
+    period = request.GET.get("period", "day")
+    if period not in ("day", "agent"):
+        return JsonResponse({"error": "period must be 'day' or 'agent'"}, status=400)
+    return JsonResponse({"period": period, "buckets": rollups.production_buckets(period)})
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def reject_user(request, user_id):
     try:
         user = AluminumUser.objects.get(id=user_id)
-        user.delete()   # Remove user completely
+        with transaction.atomic():
+            user.delete()   # Remove user completely (their records keep agent=NULL)
+            rollups.agent_removed(user_id)
+            versions.bump("users", "production")
+        auth.principals.clear()
         return JsonResponse({"message": "User rejected and deleted"})
     except AluminumUser.DoesNotExist:
         return JsonResponse({"error": "User not found"}, status=404)
@@ -287,45 +483,169 @@ def reject_user(request, user_id):
 # ======================== USER COUNT =========================
 # =============================================================
 @csrf_exempt
-def users_count(request):
-    total = AluminumUser.objects.filter(is_approved=True).count()
-    agents = AluminumUser.objects.filter(is_approved=True, role="agent").count()
-    scrap_team = AluminumUser.objects.filter(is_approved=True, role="scrap_team").count()
-    admins = AluminumUser.objects.filter(is_approved=True, role="admin").count()
+async def users_count(request):
+    by_role = {role: {"approved": 0, "pending": 0} for role, _ in AluminumUser.ROLE_CHOICES}
+    async for row in queries.users_by_role():
+        by_role[row["role"]] = {"approved": row["approved"], "pending": row["pending"]}
 
     return JsonResponse({
-        "total": total,
-        "agents": agents,
-        "scrap_team": scrap_team,
-        "admins": admins,
+        "total": sum(r["approved"] for r in by_role.values()),
+        "agents": by_role["agent"]["approved"],
+        "scrap_team": by_role["scrap_team"]["approved"],
+        "admins": by_role["admin"]["approved"],
+        "by_role": by_role,
     })
 
 
 # =============================================================
 # ===================== AGENT PREDICTIONS ======================
 # =============================================================
-@csrf_exempt
-def agent_predictions(request):
-    records = ProductionRecord.objects.select_related("agent").order_by("-created_at")
+PREDICTION_PAGE_SIZE = 100
+PREDICTION_MAX_PAGE_SIZE = 1000
+PREDICTION_STREAM_CHUNK = 2000
+
+
+def _encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+    return datetime.fromisoformat(created_at), int(pk)
+
+
+def _parse_when(value, end_of_day=False):
+    """Accept an ISO datetime or a plain date (a date `until` covers the whole day)."""
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        when = datetime.combine(day + timedelta(days=1) if end_of_day else day, datetime.min.time())
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def _prediction_pages(qs, size, cursor=None):
+    """Yield keyset pages of value rows; each query is bounded by `size`."""
+    while True:
+        page = list((queries.after_cursor(qs, cursor) if cursor else qs)[:size])
+        if page:
+            yield page
+        if len(page) < size:
+            return
+        cursor = (page[-1][-1], page[-1][0])  # created_at, id
+
+
+async def _aprediction_pages(qs, size, cursor=None):
+    """_prediction_pages() for the async ORM."""
+    while True:
+        page = await _alist((queries.after_cursor(qs, cursor) if cursor else qs)[:size])
+        if page:
+            yield page
+        if len(page) < size:
+            return
+        cursor = (page[-1][-1], page[-1][0])  # created_at, id
+
+
+def _list_format(request):
+    fmt = request.GET.get("format", "objects")
+    if fmt not in serializers.FORMATS:
+        raise ValueError(f"format must be one of {', '.join(serializers.FORMATS)}")
+    return fmt
+
+
+def _encode_page(page, fmt, ndjson, first):
+    columns = serializers.prediction_columns(page)
+    if ndjson:
+        objects = serializers.render(PREDICTION_FIELDS, columns)
+        return b"".join(serializers.dumps_objects(obj) + b"\n" for obj in objects)
+    # The page's items without the enclosing brackets, to splice into one array
+    if fmt == "objects":
+        chunk = b",".join(serializers.dumps_objects(obj) for obj in serializers.render(PREDICTION_FIELDS, columns))
+    else:
+        chunk = serializers.encoder.dumps(list(zip(*columns)))[1:-1]
+    return chunk if first else b"," + chunk
 
-    data = [
-        {
-            "email": r.agent.email if r.agent else "unknown",
-            "agent_name": r.agent.name if r.agent else "Unknown",
-            "bauxite_mass": r.bauxite_mass,
-            "caustic_soda_conc": r.caustic_soda_conc,
-            "temperature": r.temperature,
-            "pressure": r.pressure,
-            "purity": r.ore_quality,
-            "reaction_time": r.reaction_time,
-            "predicted_yield": r.predicted_aluminum,
-            "predicted_byproduct": r.predicted_byproduct,
-            "created_at": r.created_at.strftime("%Y-%m-%d %H:%M"),
-        }
-        for r in records
-    ]
 
-    return JsonResponse(data, safe=False)
+@csrf_exempt
+@require_http_methods(["GET"])
+@versions.conditional("production", "users")
+async def agent_predictions(request):
+    """
+    GET params (all optional):
+      email         only this agent's records
+      since, until  ISO date/datetime bounds on created_at
+      limit, cursor one keyset page: {"results", "next_cursor"}
+      stream        "ndjson" for one JSON object per line; otherwise a JSON array
+      format        "objects" (default), "rows" or "columns"; see serializers.py
+
+    Without limit/cursor the full history is streamed in bounded chunks, so
+    memory stays flat however large the table is. The stream is an async
+    iterator under ASGI and a plain one under WSGI, since each server would
+    otherwise buffer the other kind whole. "columns" can't be streamed and
+    needs limit/cursor.
+    """
+    try:
+        since, until = request.GET.get("since"), request.GET.get("until")
+        qs = queries.predictions(
+            email=request.GET.get("email"),
+            since=_parse_when(since) if since else None,
+            until=_parse_when(until, end_of_day=True) if until else None,
+        )
+
+        cursor = request.GET.get("cursor")
+        cursor = _decode_cursor(cursor) if cursor else None
+        limit = request.GET.get("limit")
+        fmt = _list_format(request)
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if limit or cursor:
+        try:
+            limit = min(max(int(limit or PREDICTION_PAGE_SIZE), 1), PREDICTION_MAX_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({"error": "Invalid limit"}, status=400)
+
+        # Fetch one extra row to know whether another page exists.
+        rows = await _alist((queries.after_cursor(qs, cursor) if cursor else qs)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return json_response({
+            "results": serializers.render(PREDICTION_FIELDS, serializers.prediction_columns(rows), fmt),
+            "next_cursor": _encode_cursor(rows[-1][-1], rows[-1][0]) if has_more else None,
+        }, fmt)
+
+    ndjson = request.GET.get("stream") == "ndjson"
+    if fmt == "columns":
+        return JsonResponse({"error": "format=columns needs limit/cursor"}, status=400)
+    if ndjson and fmt != "objects":
+        return JsonResponse({"error": "stream=ndjson only returns objects"}, status=400)
+    if ndjson:
+        head, tail = b"", b""
+    elif fmt == "rows":
+        head, tail = b'{"columns":' + serializers.encoder.dumps(PREDICTION_FIELDS) + b',"rows":[', b"]}"
+    else:
+        head, tail = b"[", b"]"
+
+    if isinstance(request, ASGIRequest):
+        async def body():
+            yield head
+            first = True
+            async for page in _aprediction_pages(qs, PREDICTION_STREAM_CHUNK):
+                yield _encode_page(page, fmt, ndjson, first)
+                first = False
+            yield tail
+    else:
+        def body():
+            yield head
+            for i, page in enumerate(_prediction_pages(qs, PREDICTION_STREAM_CHUNK)):
+                yield _encode_page(page, fmt, ndjson, i == 0)
+            yield tail
+
+    return StreamingHttpResponse(body(), content_type="application/x-ndjson" if ndjson else "application/json")
 
 
 # =============================================================
@@ -334,118 +654,224 @@ def agent_predictions(request):
 @csrf_exempt
 @require_http_methods(["GET"])
 def recent_approved_users(request):
-    users = list(
-        AluminumUser.objects.filter(is_approved=True)
-        .order_by("-id")
-        .values("id", "name", "email", "role")[:5]
-    )
+    users = list(queries.recent_approved_users())
     return JsonResponse(users, safe=False)
 
 
 # =============================================================
 # ====================== PDF DOWNLOAD =========================
 # =============================================================
+REPORT_RETRY_AFTER = 1
+REPORT_SYNC_WAIT = getattr(settings, "REPORT_SYNC_WAIT", 10)
+
+
+def _report_response(request, path, future, filename, wait=0):
+    """
+    Serve a stored report, waiting up to `wait` seconds for the render pool,
+    or 202 while it is still on it. The 202 names the URL to poll (this one:
+    repeat requests join the same render).
+    """
+    if future is not None:
+        try:
+            future.exception(timeout=wait)
+        except FutureTimeout:
+            poll = request.build_absolute_uri()
+            response = JsonResponse({"status": "pending", "poll": poll}, status=202)
+            response["Retry-After"] = str(REPORT_RETRY_AFTER)
+            response["Location"] = poll
+            return response
+        if future.exception():
+            return JsonResponse({"error": str(future.exception())}, status=500)
+
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=filename, content_type="application/pdf")
+
+
 def download_report(request):
-    email = request.GET.get("email", "-")
-    bauxite_mass = request.GET.get("bauxite_mass", "-")
-    caustic_soda_conc = request.GET.get("caustic_soda_conc", "-")
-    temperature = request.GET.get("temperature", "-")
-    pressure = request.GET.get("pressure", "-")
-    purity = request.GET.get("purity", "-")
-    reaction_time = request.GET.get("reaction_time", "-")
-    predicted_yield = request.GET.get("predicted_yield", "-")
-    predicted_byproduct = request.GET.get("predicted_byproduct", "-")
-    aluminum_kg = request.GET.get("aluminum_kg", "-")
-    byproduct_kg = request.GET.get("byproduct_kg", "-")
-    byproduct_name = request.GET.get("byproduct_name", "Red Mud")
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="prediction_report.pdf"'
-
-    p = canvas.Canvas(response)
-
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, 800, "Aluminum Yield Prediction Report")
-
-    p.setFont("Helvetica", 12)
-    y = 770
-
-    def write(label, value):
-        nonlocal y
-        p.drawString(50, y, f"{label}: {value}")
-        y -= 22
-
-    write("User", email)
-    write("Bauxite Mass (kg)", bauxite_mass)
-    write("Caustic Soda Concentration (%)", caustic_soda_conc)
-    write("Temperature (°C)", temperature)
-    write("Pressure (atm)", pressure)
-    write("Purity (%)", purity)
-    write("Reaction Time (hrs)", reaction_time)
-
-    p.setFont("Helvetica-Bold", 12)
-    write("----- Prediction Results -----", "")
-    p.setFont("Helvetica", 12)
-
-    write("Predicted Aluminum Yield (%)", predicted_yield)
-    write("Predicted By-Product (%)", predicted_byproduct)
-    write("Aluminum Output (kg)", aluminum_kg)
-    write("By-Product Output (kg)", byproduct_kg)
-    write("By-Product Name", byproduct_name)
-
-    write("Generated At", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-
-    p.showPage()
-    p.save()
+    lines = reports.prediction_lines(
+        request.GET.get("email", "-"),
+        request.GET.get("bauxite_mass", "-"),
+        request.GET.get("caustic_soda_conc", "-"),
+        request.GET.get("temperature", "-"),
+        request.GET.get("pressure", "-"),
+        request.GET.get("purity", "-"),
+        request.GET.get("reaction_time", "-"),
+        request.GET.get("predicted_yield", "-"),
+        request.GET.get("predicted_byproduct", "-"),
+        request.GET.get("aluminum_kg", "-"),
+        request.GET.get("byproduct_kg", "-"),
+        request.GET.get("byproduct_name", "Red Mud"),
+    )
+    path, future = reports.submit(["params", lines], reports.render_prediction, lines)
+    # Plain download links expect the PDF itself; only a slow render falls back to 202.
+    return _report_response(request, path, future, "prediction_report.pdf", wait=REPORT_SYNC_WAIT)
+
+
+@require_http_methods(["GET"])
+def prediction_report(request, record_id):
+    """PDF for a stored ProductionRecord; 202 + Retry-After until it has been rendered."""
+    record = (
+        ProductionRecord.objects.filter(id=record_id)
+        .values(*PREDICTION_COLUMNS, "byproduct__name", "byproduct__quantity_kg")
+        .first()
+    )
+    if not record:
+        return JsonResponse({"error": "Record not found"}, status=404)
+
+    mass = record["bauxite_mass"]
+    byproduct_kg = record["byproduct__quantity_kg"]
+    lines = reports.prediction_lines(
+        record["agent__email"] or "-",
+        mass,
+        record["caustic_soda_conc"],
+        record["temperature"],
+        record["pressure"],
+        round(record["ore_quality"] * 100, 2),  # stored as a fraction, labelled "Purity (%)"
+        record["reaction_time"],
+        record["predicted_aluminum"],
+        record["predicted_byproduct"],
+        round(record["predicted_aluminum"] / 100.0 * mass, 2),
+        round(byproduct_kg, 2) if byproduct_kg is not None else "-",
+        record["byproduct__name"] or "Red Mud",
+    ) + [("Created At", record["created_at"].strftime("%Y-%m-%d %H:%M:%S"))]
+    path, future = reports.submit(["record", record_id, lines], reports.render_prediction, lines)
+    return _report_response(request, path, future, f"prediction_report_{record_id}.pdf")
+
+
+@require_http_methods(["GET"])
+def summary_report(request):
+    """
+    Multi-record PDF (?email=<agent>&day=YYYY-MM-DD, either or both). Records
+    are immutable, so the filter plus row count and newest id identify the content.
+    """
+    email = request.GET.get("email")
+    day = request.GET.get("day")
+    qs = ProductionRecord.objects.all()
+    if email:
+        qs = qs.filter(agent__email=email)
+    if day:
+        try:
+            start = _parse_when(day)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        qs = qs.filter(created_at__gte=start, created_at__lt=start + timedelta(days=1))
+    if not email and not day:
+        return JsonResponse({"error": "Pass email and/or day"}, status=400)
+
+    fingerprint = qs.aggregate(count=Count("id"), last=Max("id"))
+    title = "Production Report - " + " / ".join(v for v in (email, day) if v)
+    rows = qs.order_by("created_at", "id").values(*PREDICTION_COLUMNS).iterator(chunk_size=500)
+
+    path, future = reports.submit(["summary", email, day, fingerprint], reports.render_summary, title, rows)
+    return _report_response(request, path, future, "production_report.pdf")
+
+
+# =============================================================
+# ========================= EXPORTS ===========================
+# =============================================================
+@require_http_methods(["GET"])
+def export_production(request):
+    """Stream the full prediction history as ?format=csv (default), parquet or arrow."""
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(exports.FORMATS)}"}, status=400)
+    if fmt != "csv" and exports.pa is None:
+        return JsonResponse({"error": f"{fmt} export requires pyarrow"}, status=501)
+
+    content_type, extension = exports.FORMATS[fmt]
+    response = StreamingHttpResponse(exports.iter_export(fmt), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="production_history.{extension}"'
     return response
 
 
+# =============================================================
+# ========================= IMPORTS ===========================
+# =============================================================
+def _checkpoint_data(checkpoint):
+    return {
+        "import_id": checkpoint.id,
+        "filename": checkpoint.filename,
+        "rows_done": checkpoint.rows_done,
+        "rows_imported": checkpoint.rows_imported,
+        "rows_rejected": checkpoint.rows_rejected,
+        "errors": checkpoint.errors,
+        "finished": checkpoint.finished,
+    }
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def import_runs(request):
+    """
+    Multipart upload (field "file") of historical runs as CSV. The import runs
+    in the background; uploading the same file again resumes it.
+    """
+    uploaded = request.FILES.get("file")
+    if not uploaded:
+        return JsonResponse({"error": "Missing file"}, status=400)
+
+    status = request.POST.get("byproduct_status", "used")
+    if status not in dict(ByProduct.STATUS):
+        return JsonResponse({"error": "Invalid byproduct_status"}, status=400)
+
+    path, source = imports.store_upload(uploaded)
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source, defaults={"filename": uploaded.name})
+    if not checkpoint.finished:
+        imports.import_in_background(path, source, byproduct_status=status)
+
+    return JsonResponse(_checkpoint_data(checkpoint), status=200 if checkpoint.finished else 202)
+
+
+@require_http_methods(["GET"])
+def import_status(request, import_id):
+    checkpoint = ImportCheckpoint.objects.filter(id=import_id).first()
+    if not checkpoint:
+        return JsonResponse({"error": "Import not found"}, status=404)
+    return JsonResponse(_checkpoint_data(checkpoint))
+
+
 # =============================================================
 # ====================== SCRAP TEAM APIs =======================
 # =============================================================
+def _include_source(request):
+    return request.GET.get("include") == "source"
+
+
 @csrf_exempt
-def byproducts(request):
-    """Return all byproducts or by status."""
+@versions.conditional("byproducts", "users")
+async def byproducts(request):
+    """
+    Return all byproducts or by status (?include=source inlines the
+    prediction, ?format= as for agent_predictions).
+    """
     status = request.GET.get("status")
+    include_source = _include_source(request)
+    try:
+        fmt = _list_format(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
 
-    if status:
-        items = ByProduct.objects.filter(status=status).order_by("-created_at")
-    else:
-        items = ByProduct.objects.all().order_by("-created_at")
+    items = queries.byproducts(status)
 
-    data = [
-        {
-            "id": item.id,
-            "name": item.name,
-            "quantity_kg": item.quantity_kg,
-            "percent_of_total": item.percent_of_total,
-            "status": item.status,
-            "source_prediction_id": item.source_prediction.id if item.source_prediction else None,
-            "assigned_to_email": item.assigned_to_email,
-            "assigned_to_name": item.assigned_to_name,
-            "remarks": item.remarks,
-            "created_at": item.created_at.strftime("%Y-%m-%d %H:%M"),
-            "updated_at": item.updated_at.strftime("%Y-%m-%d %H:%M"),
-        }
-        for item in items
-    ]
+    # aiterator() can't run values_list() querysets off the event loop; fetch them whole instead.
+    rows = await _alist(byproduct_values(items, include_source, flat=True))
+    columns = serializers.byproduct_columns(rows, include_source)
 
-    return JsonResponse(data, safe=False)
+    if fmt == "objects":
+        return json_response(serializers.byproduct_objects(columns, include_source))
+    return json_response(serializers.render(serializers.byproduct_fields(include_source), columns, fmt), fmt)
 
 
 @csrf_exempt
-def byproduct_summary(request):
-    total_kg = ByProduct.objects.aggregate(total=Sum("quantity_kg"))["total"] or 0
-
-    counts = {
-        "received": ByProduct.objects.filter(status="received").count(),
-        "in_process": ByProduct.objects.filter(status="in_process").count(),
-        "used": ByProduct.objects.filter(status="used").count(),
-    }
+@versions.conditional("byproducts")
+async def byproduct_summary(request):
+    totals = await rollups.abyproduct_totals()
+    counts = {status: t["count"] for status, t in totals.items()}
+    kg = {status: t["quantity_kg"] for status, t in totals.items()}
 
     return JsonResponse({
-        "total_quantity_kg": total_kg,
-        "counts": counts
+        "total_quantity_kg": sum(kg.values()),
+        "counts": counts,
+        "kg_by_status": kg,
     })
 
 
@@ -456,12 +882,22 @@ def update_byproduct(request, bid):
         return JsonResponse({"error": "Invalid method"}, status=400)
 
     try:
-        item = ByProduct.objects.get(id=bid)
         body = json.loads(request.body)
-
-        item.status = body.get("status", item.status)
-        item.updated_at = timezone.now()
-        item.save()
+        status = body.get("status")
+        if status is not None and status not in dict(ByProduct.STATUS):
+            return JsonResponse({"error": "Invalid status"}, status=400)
+
+        with transaction.atomic():
+            item = ByProduct.objects.select_for_update().get(id=bid)
+            old_status = item.status
+
+            item.status = status or item.status
+            item.updated_at = timezone.now()
+            item.save()
+            rollups.record_status_change(item.quantity_kg, old_status, item.status)
+            versions.bump("byproducts")
+            if item.status != old_status:
+                events.byproduct_status_changed(item, old_status)
 
         return JsonResponse({"message": "Updated"})
 
@@ -469,39 +905,80 @@ def update_byproduct(request, bid):
         return JsonResponse({"error": "Not found"}, status=404)
 
 
+EVENT_HEARTBEAT = 15
+
+
+def _sse(event):
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def byproduct_events(request):
+    """
+    Server-sent events for new by-products and status changes (see
+    aluminumRec/events.py), replacing polling of byproducts/last/ and
+    byproducts/last-processed/. Reconnects resume after Last-Event-ID (or
+    ?last_event_id=); a comment line is sent every EVENT_HEARTBEAT seconds
+    to keep idle connections open. Needs the ASGI server.
+    """
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid Last-Event-ID"}, status=400)
+
+    async def stream():
+        # Subscribe before reading the backlog so nothing falls in between.
+        sub = events.hub.subscribe()
+        try:
+            sent = last_id
+            if last_id is not None:
+                backlog, complete = await sync_to_async(events.hub.since)(last_id)
+                if not complete:
+                    yield "event: resync\ndata: {}\n\n"
+                for event in backlog:
+                    yield _sse(event)
+                    sent = event.id
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    event = await sub.get(EVENT_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                if sent is None or event.id > sent:
+                    yield _sse(event)
+                    sent = event.id
+        finally:
+            sub.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # NEW: return latest created byproduct
 @csrf_exempt
 def last_byproduct(request):
-    item = ByProduct.objects.order_by("-created_at").first()
+    include_source = _include_source(request)
+    item = byproduct_values(queries.latest_byproduct(), include_source).first()
     if not item:
         return JsonResponse({}, status=200)
-    data = {
-        "id": item.id,
-        "name": item.name,
-        "quantity_kg": item.quantity_kg,
-        "percent_of_total": item.percent_of_total,
-        "status": item.status,
-        "created_at": item.created_at.strftime("%Y-%m-%d %H:%M"),
-        "updated_at": item.updated_at.strftime("%Y-%m-%d %H:%M"),
-        "source_prediction_id": item.source_prediction.id if item.source_prediction else None,
-    }
-    return JsonResponse(data)
+    return JsonResponse(byproduct_row(item, include_source))
 
 
 # NEW: return last processed (in_process or used)
 @csrf_exempt
 def last_processed_byproduct(request):
-    item = ByProduct.objects.filter(Q(status="in_process") | Q(status="used")).order_by("-updated_at").first()
+    include_source = _include_source(request)
+    latest = [
+        byproduct_values(queries.latest_with_status(s), include_source).first() for s in queries.PROCESSED_STATUSES
+    ]
+    item = max((r for r in latest if r), key=lambda r: r["updated_at"], default=None)
     if not item:
         return JsonResponse({}, status=200)
-    data = {
-        "id": item.id,
-        "name": item.name,
-        "quantity_kg": item.quantity_kg,
-        "percent_of_total": item.percent_of_total,
-        "status": item.status,
-        "created_at": item.created_at.strftime("%Y-%m-%d %H:%M"),
-        "updated_at": item.updated_at.strftime("%Y-%m-%d %H:%M"),
-        "source_prediction_id": item.source_prediction.id if item.source_prediction else None,
-    }
-    return JsonResponse(data)
+    return JsonResponse(byproduct_row(item, include_source))
@@ -115,6 +115,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# New and re-set passwords are hashed with the first hasher below; a correct
+# login whose stored hash uses another one (or other scrypt parameters) is
+# re-hashed on the spot. The others stay listed so existing hashes verify.
+PASSWORD_HASHERS = [
+    "aluminumRec.hashing.ScryptPasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+PASSWORD_SCRYPT_WORK_FACTOR = 2**14
+PASSWORD_SCRYPT_BLOCK_SIZE = 8
+PASSWORD_SCRYPT_PARALLELISM = 1
+
+# Access tokens issued at login (see aluminumRec/auth.py) and the per-process
+# cache of the users they stand for. With ACCESS_TOKEN_REQUIRED, predictions
+# are no longer attributed to the agent named by a request's "email" field.
+ACCESS_TOKEN_TTL = 12 * 3600
+ACCESS_TOKEN_REQUIRED = False
+PRINCIPAL_CACHE_TTL = 60
+PRINCIPAL_CACHE_SIZE = 1024
+
+# Hashing runs in a pool of PASSWORD_HASH_WORKERS threads (see
+# aluminumRec/hashing.py); once PASSWORD_HASH_MAX_PENDING hashes are running
+# or queued, login and register answer 429 with Retry-After.
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_MAX_PENDING = 32
+PASSWORD_HASH_RETRY_AFTER = 1
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -137,3 +166,91 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Prediction
+# Concurrent single-row predictions are coalesced into one model call over a
+# short window (see aluminumRec/batching.py).
+
+PREDICTION_MICROBATCH = True
+PREDICTION_BATCH_WINDOW_MS = 2
+PREDICTION_BATCH_MAX_ROWS = 64
+
+# Quantiles of the individual trees' predictions stored with every prediction
+# as predicted_aluminum_low / predicted_aluminum_high.
+PREDICTION_INTERVAL = (0.05, 0.95)
+
+# Set PREDICTION_PROCESS_WORKERS > 0 to run the forest in a pool of worker
+# processes fed through shared-memory slots (see aluminumRec/inference_pool.py).
+PREDICTION_PROCESS_WORKERS = 0
+PREDICTION_PROCESS_SLOT_ROWS = 4096
+
+# Set PREDICTION_LOOKUP to answer approx=true requests by interpolating a
+# float32 grid of forest predictions, built once per model version
+# (see aluminumRec/lookup.py). POINTS is a count per input, or a dict of them;
+# BOUNDS maps an input to (low, high) to override the span of its splits.
+PREDICTION_LOOKUP = False
+PREDICTION_LOOKUP_POINTS = 8
+PREDICTION_LOOKUP_BOUNDS = None
+PREDICTION_LOOKUP_CHECK_POINTS = 4096
+
+# What-if sweeps (POST predict_production/sweep/) evaluate at most
+# SWEEP_MAX_POINTS rows, SWEEP_CHUNK_ROWS per model call, and return partial
+# results once SWEEP_TIME_LIMIT seconds have been spent.
+SWEEP_MAX_POINTS = 1_000_000
+SWEEP_CHUNK_ROWS = 65536
+SWEEP_TIME_LIMIT = 30.0
+
+# Model artifacts are loaded lazily and re-checked for newer versions every
+# MODEL_RELOAD_INTERVAL seconds (see aluminumRec/registry.py).
+MODEL_MMAP_MODE = "r"
+MODEL_RELOAD_INTERVAL = 5
+
+# Repeat predictions are answered from a bounded LRU keyed on the inputs
+# snapped to these per-feature steps (see aluminumRec/prediction_cache.py).
+# Set PREDICTION_CACHE_ALIAS to a CACHES alias to share entries across workers.
+PREDICTION_CACHE = True
+PREDICTION_CACHE_SIZE = 4096
+PREDICTION_CACHE_TTL = 300
+PREDICTION_CACHE_QUANTA = {
+    "bauxite_mass": 0.01,
+    "caustic_soda_conc": 0.01,
+    "temperature": 0.01,
+    "pressure": 0.001,
+    "purity": 0.0001,
+    "reaction_time": 0.001,
+}
+PREDICTION_CACHE_ALIAS = None
+
+# Threads that async views (served under ASGI) hand predictions to.
+PREDICTION_ASYNC_WORKERS = 4
+
+# PDF reports are rendered by a background pool and stored by content hash
+# (see aluminumRec/reports.py).
+REPORT_DIR = BASE_DIR / "reports"
+REPORT_WORKERS = 2
+# download-report/ waits this long for a render before answering 202.
+REPORT_SYNC_WAIT = 10
+# Seconds a failed render is reported to pollers before it may be retried.
+REPORT_FAILURE_TTL = 60
+
+# By-product change feed (byproducts/events/, see aluminumRec/events.py).
+# "memory" serves a single process; with several workers use "sqlite" so
+# they share one event log on local disk.
+EVENT_BACKEND = "memory"
+EVENT_SQLITE_PATH = BASE_DIR / "events.sqlite3"
+EVENT_BUFFER = 10000
+EVENT_QUEUE_SIZE = 1000
+EVENT_POLL_INTERVAL = 0.25
+
+# Dashboard list and summary responses at least this large are compressed
+# (brotli if installed, else gzip; see aluminumRec/versions.py).
+RESPONSE_COMPRESS_MIN_BYTES = 1024
+
+# Encoder for the agent-predictions and byproducts lists in the "rows" and
+# "columns" formats: "orjson" (used when installed) or "stdlib". "objects"
+# keeps JsonResponse's encoding; see aluminumRec/serializers.py.
+JSON_SERIALIZER = "orjson"
+
+# Uploaded historical-run files, kept so interrupted imports can resume.
+IMPORT_DIR = BASE_DIR / "imports"